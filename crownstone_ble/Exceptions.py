@@ -21,6 +21,8 @@ class BleError(Enum):
     SETUP_FAILED                      = "SETUP_FAILED"
     NOT_IN_RECOVERY_MODE              = "NOT_IN_RECOVERY_MODE"
     RECOVERY_MODE_DISABLED            = "RECOVERY_MODE_DISABLED"
+    TOO_MANY_CONNECTIONS              = "TOO_MANY_CONNECTIONS"
+    INVALID_CAPTURE_FILE              = "INVALID_CAPTURE_FILE"
 
     NO_SCANS_RECEIVED                 = "NO_SCANS_RECEIVED"
     DIFFERENT_MODE_THAN_REQUIRED      = "DIFFERENT_MODE_THAN_REQUIRED"
\ No newline at end of file
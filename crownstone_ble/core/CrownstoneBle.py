@@ -1,4 +1,7 @@
+import json
 import logging
+import time
+from typing import List
 
 from crownstone_core.Enums import CrownstoneOperationMode
 
@@ -6,8 +9,21 @@ from crownstone_ble.core.ble_modules.DevHandler import DevHandler
 from crownstone_ble.core.ble_modules.MicroappHandler import MicroappHandler
 from crownstone_ble.core.container.ScanData import ScanData
 
-from crownstone_ble.core.ble_modules.BleHandler import BleHandler
+from crownstone_ble.core.CrownstoneConnection import CrownstoneConnection
+from crownstone_ble.core.ble_modules.BatchHandler import BatchHandler, DEFAULT_BATCH_CONCURRENCY
+from crownstone_ble.core.ble_modules.BleHandler import BleHandler, DEFAULT_MAX_CONNECTIONS
+from crownstone_ble.core.ble_modules.FilterSyncHandler import FilterSyncHandler, DEFAULT_PROPAGATION_TIMEOUT, DEFAULT_SYNC_CONCURRENCY
+from crownstone_ble.core.container.BatchResult import BatchResult
+from crownstone_ble.core.container.Diagnostics import Diagnostics
+from crownstone_ble.core.container.StateSnapshot import StateSnapshot
+from crownstone_ble.core.container.FilterSyncResult import FilterSyncResult
+from crownstone_ble.core.modules.AdvertisementCapture import AdvertisementRecorder, AdvertisementReplayer
+from crownstone_ble.core.modules.AdvertisementDecoder import AdvertisementDecoder, DEFAULT_DECODING_WORKERS, DEFAULT_DECODING_BATCH_SIZE, \
+    DEFAULT_DECODING_BATCH_INTERVAL, DEFAULT_MAX_PENDING_ADVERTISEMENTS
+from crownstone_ble.core.modules.AdvertisementStream import AdvertisementStream, OverflowPolicy, DEFAULT_STREAM_SIZE
+from crownstone_ble.core.modules.DataCoalescer import DataCoalescer, DEFAULT_COALESCE_INTERVAL, DEFAULT_POWER_THRESHOLD
 from crownstone_ble.core.modules.ModeChecker import ModeChecker
+from crownstone_ble.core.modules.ScanConsumer import ScanConsumer
 from crownstone_ble.topics.BleTopics import BleTopics
 from crownstone_core.Exceptions import CrownstoneError, CrownstoneBleException, CrownstoneException
 from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
@@ -28,8 +44,10 @@ _LOGGER = logging.getLogger(__name__)
 class CrownstoneBle:
     __version__ = "2.6.2-git"
     
-    def __init__(self, bleAdapterAddress: str = None):
-        # bleAdapterAddress is the MAC address of the adapter you want to use.
+    def __init__(self, bleAdapterAddress: str or list = None, maxConnections: int = DEFAULT_MAX_CONNECTIONS, backend=None):
+        # bleAdapterAddress is the MAC address of the adapter you want to use, or a list of addresses to use multiple adapters.
+        # maxConnections is the number of simultaneous connections per adapter, before the least recently used idle connection is closed.
+        # backend creates the Bluetooth clients and scanner, when None, bleak is used. Use a SimulatedBackend to run without hardware.
         self.settings = EncryptionSettings()
         self.control  = ControlHandler(self)
         self.setup    = SetupHandler(self)
@@ -37,7 +55,12 @@ class CrownstoneBle:
         self.debug    = DebugHandler(self)
         self.microapp = MicroappHandler(self.control)
         self._dev     = DevHandler(self)
-        self.ble      = BleHandler(self.settings, bleAdapterAddress)
+        self._batch   = BatchHandler(self)
+        self._filterSync = FilterSyncHandler(self)
+        self.ble      = BleHandler(self.settings, bleAdapterAddress, maxConnections, backend)
+        self.registry = self.ble.registry
+        self.coalescer = None
+        self.backgroundScanning = False
 
         self.defaultKeysOverridden = False
 
@@ -54,10 +77,15 @@ class CrownstoneBle:
         """
         Shut down the library nicely.
         """
+        self.disableDataCoalescing()
+        self.stopRecordingAdvertisements()
+        self.disableDecodingWorkers()
+        self.backgroundScanning = False
         await self.ble.shutDown()
     
     def setSettings(self, adminKey, memberKey, basicKey, serviceDataKey, localizationKey, meshApplicationKey, meshNetworkKey):
         self.settings.loadKeys(adminKey, memberKey, basicKey, serviceDataKey, localizationKey, meshApplicationKey, meshNetworkKey)
+        self.ble.updateConnectionSettings()
         self.defaultKeysOverridden = True
 
     def loadSettingsFromDictionary(self, data):
@@ -91,23 +119,38 @@ class CrownstoneBle:
         self.loadSettingsFromDictionary(data)
 
 
-    async def connect(self, address: str, timeout: int = 5, attempts: int = 3, ignoreEncryption=False):
+    async def connect(self, address: str, timeout: int = 5, attempts: int = 3, ignoreEncryption=False, setDefault: bool = True):
         """
         Connect to a Crownstone.
+        Connections to other Crownstones stay open, use getConnection() to send commands to a specific Crownstone.
+        The control, state, debug and microapp modules use the Crownstone of the last connect call.
 
         :param address:           MAC address of the Crownstone, in the format: 12:34:56:78:ab:cd
         :param timeout:           Time in seconds before giving up, for each connection attempt.
         :param attempts:          Number of connection attempts.
         :param ignoreEncryption:  True when encryption will not be used for this session.
+        :param setDefault:        True to make this the Crownstone used by the control, state, debug and microapp modules.
+                                  Use False when the connection is only used via getConnection(), like in concurrent jobs.
         """
         connected = await self.ble.is_connected(address)
         if connected:
             _LOGGER.info("Already connected")
+            if setDefault:
+                self.ble.defaultAddress = address
             return
 
-        await self.ble.connect(address, timeout=timeout, attempts=attempts)
+        await self.ble.connect(address, timeout=timeout, attempts=attempts, setDefault=setDefault)
         if not ignoreEncryption:
-            await self.control._getAndSetSessionNonce()
+            await self.getConnection(address).control._getAndSetSessionNonce()
+
+    def getConnection(self, address: str) -> CrownstoneConnection:
+        """
+        Get the modules bound to the connection with the given Crownstone.
+        Commands on connections with different Crownstones can be awaited concurrently.
+
+        :param address:           MAC address of a connected Crownstone.
+        """
+        return CrownstoneConnection(self, address)
 
     async def setupCrownstone(self, address, sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor):
         if not self.defaultKeysOverridden:
@@ -117,24 +160,305 @@ class CrownstoneBle:
 
         await self.setup.setup(address, sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor)
 
-    async def disconnect(self):
-        await self.ble.disconnect()
+    async def disconnect(self, address: str = None):
+        """
+        :param address:           MAC address of the Crownstone to disconnect from, when None, the last connected Crownstone is used.
+        """
+        await self.ble.disconnect(address)
+
+    async def disconnectAll(self):
+        await self.ble.disconnectAll()
+
+    async def batch(self, jobs: list, concurrency: int = DEFAULT_BATCH_CONCURRENCY, attempts: int = 2, useMesh: bool = True) -> List[BatchResult]:
+        """
+        Execute jobs on many Crownstones. Connects, executes the operation and disconnects for each job.
+
+        :param jobs:          List of (address, operation) tuples. The operation is either a serialized control packet,
+                              like ControlPacketsGenerator.getSwitchCommandPacket(100), or an async function that gets
+                              the CrownstoneConnection as argument.
+        :param concurrency:   Maximum number of jobs that are connected at the same time.
+        :param attempts:      Number of attempts per job.
+        :param useMesh:       When True, control packets for validated Crownstones are sent via the mesh,
+                              if we are connected to a Crownstone that can relay them.
+        :returns:             A BatchResult per job, in the same order as the jobs.
+        """
+        return await self._batch.execute(jobs, concurrency, attempts, useMesh)
+
+    async def syncFilters(self, addresses: List[str], filters: list, masterVersion: int = None, useMesh: bool = True, useCache: bool = True,
+                          propagationTimeout: float = DEFAULT_PROPAGATION_TIMEOUT, concurrency: int = DEFAULT_SYNC_CONCURRENCY,
+                          attempts: int = 2, windowSize: int = 1, progressCallback = None) -> List[FilterSyncResult]:
+        """
+        Make sure the given asset filters are set at all given Crownstones.
+        The filters are uploaded to one Crownstone, and the other Crownstones are verified after the filters propagated via the mesh.
+        Crownstones of which the last known summary already matches the filters are skipped.
+
+        :param addresses:            MAC addresses of the Crownstones to sync.
+        :param filters:              The filters that should be set at every Crownstone.
+        :param masterVersion:        The new master version. If None, the master version of the first uploaded Crownstone is increased by 1.
+        :param useMesh:              When False, the filters are uploaded to every Crownstone that doesn't have them.
+        :param useCache:             When False, every Crownstone is checked, regardless of its last known summary.
+        :param propagationTimeout:   Time in seconds to wait for the mesh, before uploading to a Crownstone directly.
+        :param concurrency:          Maximum number of Crownstones that are connected at the same time.
+        :param attempts:             Number of connection attempts per Crownstone.
+        :param windowSize:           Window size of the filter uploads, see ControlHandler.setFilters().
+        :param progressCallback:     Function (result: FilterSyncResult, doneCount: int, totalCount: int), called when a Crownstone is done.
+        :returns:                    A FilterSyncResult per address, in the same order as the addresses.
+        """
+        return await self._filterSync.sync(addresses, filters, masterVersion, useMesh, useCache, propagationTimeout, concurrency, attempts, windowSize, progressCallback)
+
+    async def collectDiagnostics(self, addresses: List[str], outputFile: str = None, concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+                                 attempts: int = 2, resultCallback = None) -> List[Diagnostics]:
+        """
+        Collect the diagnostics of many Crownstones, see DebugHandler.collectDiagnostics().
+
+        :param addresses:        MAC addresses of the Crownstones.
+        :param outputFile:       When given, the diagnostics of each Crownstone are appended to this file as soon as they
+                                 are collected, as a line of JSON (newline delimited JSON).
+        :param concurrency:      Maximum number of Crownstones that are connected at the same time.
+        :param attempts:         Number of connection attempts per Crownstone.
+        :param resultCallback:   Function (diagnostics: Diagnostics), called when a Crownstone is done.
+        :returns:                The Diagnostics per address, in the same order as the addresses.
+                                 When a Crownstone could not be reached, its errors contain "connection".
+        """
+        return await self._collect(addresses, lambda connection: connection.debug.collectDiagnostics(), Diagnostics,
+                                   outputFile, concurrency, attempts, resultCallback)
+
+    async def collectStates(self, addresses: List[str], stateTypes: list, outputFile: str = None, concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+                            attempts: int = 2, resultCallback = None) -> List[StateSnapshot]:
+        """
+        Get the given states of many Crownstones, see StateHandler.getStates().
+
+        :param addresses:        MAC addresses of the Crownstones.
+        :param stateTypes:       List of StateType to get from each Crownstone.
+        :param outputFile:       When given, the snapshot of each Crownstone is appended to this file as soon as it is
+                                 complete, as a line of JSON (newline delimited JSON).
+        :param concurrency:      Maximum number of Crownstones that are connected at the same time.
+        :param attempts:         Number of connection attempts per Crownstone.
+        :param resultCallback:   Function (snapshot: StateSnapshot), called when a Crownstone is done.
+        :returns:                The StateSnapshot per address, in the same order as the addresses.
+                                 When a Crownstone could not be reached, its errors contain "connection".
+        """
+        return await self._collect(addresses, lambda connection: connection.state.getStates(stateTypes), StateSnapshot,
+                                   outputFile, concurrency, attempts, resultCallback)
+
+    async def _collect(self, addresses: List[str], collect, containerClass, outputFile: str, concurrency: int, attempts: int, resultCallback) -> list:
+        """
+        Execute collect(connection) for each address, and stream the returned containers to the output file.
+        Crownstones that could not be reached get an empty containerClass(address), with a "connection" error.
+        """
+        output = open(outputFile, "a") if outputFile is not None else None
+        def handleResult(container):
+            if output is not None:
+                output.write(json.dumps(container.toDict()) + "\n")
+                output.flush()
+            if resultCallback is not None:
+                resultCallback(container)
+
+        async def collectAndHandle(connection: CrownstoneConnection):
+            container = await collect(connection)
+            handleResult(container)
+            return container
+
+        try:
+            batchResults = await self._batch.execute([(address, collectAndHandle) for address in addresses], concurrency, attempts, useMesh=False)
+            containers = []
+            for batchResult in batchResults:
+                if batchResult.success:
+                    containers.append(batchResult.result)
+                    continue
+                container = containerClass(batchResult.address)
+                container.errors["connection"] = str(batchResult.error)
+                handleResult(container)
+                containers.append(container)
+            return containers
+        finally:
+            if output is not None:
+                output.close()
+
+    def clearFilterSummaryCache(self, address: str = None):
+        """
+        Forget the last known filter summary of a Crownstone, or of all Crownstones when address is None.
+        """
+        self._filterSync.clearCache(address)
     
     async def startScanning(self, scanDuration=3):
         await self.ble.scan(scanDuration)
 
-    async def stopScanning(self):
-        await self.ble.stopScanning()
+    async def stopScanning(self, onlyOwnScan: bool = False):
+        """
+        Stop the scan of startScanning(), and stop the scanner right away.
+        :param onlyOwnScan:  When True, the scanner keeps running for other consumers, like advertisements().
+        """
+        self.ble.abortScan()
+        if onlyOwnScan:
+            await self.ble.stopScanningIfIdle()
+        else:
+            await self.ble.stopScanning()
+
+    def setScanLingerTime(self, lingerTime: float):
+        """
+        Keep the scanner running for lingerTime seconds after the last scan is done, so a next scan doesn't have to start it again.
+        :param lingerTime:  Time in seconds, 0 to stop the scanner right away, which is the default.
+        """
+        self.ble.scanLingerTime = lingerTime
+
+    async def startBackgroundScanning(self):
+        """
+        Keep scanning until stopBackgroundScanning() is called, so the device registry stays up to date.
+        Helpers like getMode() and getNearestCrownstone() can then answer from the registry, see their maxAge argument.
+        """
+        if not self.backgroundScanning:
+            self.backgroundScanning = True
+            await self.ble.addScanConsumer()
+
+    async def stopBackgroundScanning(self):
+        if self.backgroundScanning:
+            self.backgroundScanning = False
+            await self.ble.removeScanConsumer()
+
+
+    def startRecordingAdvertisements(self, filename: str):
+        """
+        Record all received Crownstone advertisements to a capture file, until stopRecordingAdvertisements() is called.
+        The file can be replayed with replayAdvertisements().
+        """
+        self.stopRecordingAdvertisements()
+        self.ble.scanDelegate.recorder = AdvertisementRecorder(filename)
+
+
+    def stopRecordingAdvertisements(self):
+        recorder = self.ble.scanDelegate.recorder
+        if recorder is not None:
+            self.ble.scanDelegate.recorder = None
+            recorder.close()
+
+
+    async def replayAdvertisements(self, filename: str, speed: float or None = 1.0) -> int:
+        """
+        Replay a capture file, as if the advertisements are received by the scanner.
+        The events are emitted on the usual topics, like BleTopics.advertisement.
+
+        :param filename:   Capture file, made with startRecordingAdvertisements().
+        :param speed:      1.0 to replay at the original pace, 10.0 to replay 10 times as fast, None to replay as fast as possible.
+        :returns:          The number of replayed advertisements.
+        :raises BleError.INVALID_CAPTURE_FILE: The file is not a capture file.
+        """
+        scanDelegate = self.ble.scanDelegate
+        def handleRecord(address, rssi, name, serviceData, serviceUUID):
+            # Like the scanned advertisements, the advertisements of an address share one normalized address.
+            scanDelegate.parsePayload(scanDelegate.normalizeAddress(address), rssi, name, serviceData, serviceUUID)
+        return await AdvertisementReplayer(filename).replay(handleRecord, speed)
+
+
+    def enableDataCoalescing(self, interval: float = DEFAULT_COALESCE_INTERVAL, powerThreshold: float = DEFAULT_POWER_THRESHOLD):
+        """
+        Emit the latest data per Crownstone on BleTopics.coalescedDataAvailable, instead of every new advertisement.
+        Data is emitted every interval, or right away when the switch state or power usage changed.
+
+        :param interval:         Time in seconds between emits of the latest data.
+        :param powerThreshold:   Minimal change in real power usage (W) that is emitted right away.
+        """
+        self.disableDataCoalescing()
+        # The last emitted data of a Crownstone expires together with its record in the registry.
+        self.coalescer = DataCoalescer(interval, powerThreshold, self.registry.recordTimeout)
+
+
+    def disableDataCoalescing(self):
+        """
+        Stop emitting on BleTopics.coalescedDataAvailable, pending data is emitted first.
+        """
+        if self.coalescer is not None:
+            self.coalescer.stop()
+            self.coalescer = None
+
+
+    def enableDecodingWorkers(self, workers: int = DEFAULT_DECODING_WORKERS, useProcesses: bool = False, batchSize: int = DEFAULT_DECODING_BATCH_SIZE,
+                              batchInterval: float = DEFAULT_DECODING_BATCH_INTERVAL, maxPending: int = DEFAULT_MAX_PENDING_ADVERTISEMENTS):
+        """
+        Decrypt and parse advertisements in batches in a pool of workers, instead of in the detection callback on the event loop.
+        The advertisements are emitted in the order they were received, in batches. See AdvertisementDecoder.
+
+        :param workers:         Number of worker threads or processes, 0 to decode the batches on the event loop.
+        :param useProcesses:    When True, a process pool is used, so the decryption runs in parallel with the event loop.
+        :param batchSize:       Maximum number of advertisements sent to a worker at once.
+        :param batchInterval:   Time in seconds a batch waits for more advertisements.
+        :param maxPending:      Maximum number of advertisements waiting to be emitted, new advertisements are dropped when reached.
+        """
+        self.disableDecodingWorkers()
+        scanDelegate = self.ble.scanDelegate
+        scanDelegate.decoder = AdvertisementDecoder(self.settings, scanDelegate.emitAdvertisement, scanDelegate.cacheDecodedAdvertisement,
+                                                    workers, useProcesses, batchSize, batchInterval, maxPending)
+
+
+    def disableDecodingWorkers(self):
+        """
+        Decode advertisements in the detection callback again. Advertisements that are still being decoded are emitted when done.
+        """
+        decoder = self.ble.scanDelegate.decoder
+        if decoder is not None:
+            self.ble.scanDelegate.decoder = None
+            decoder.stop()
+
+
+    def getDecodingStatistics(self) -> dict or None:
+        """
+        :returns: The queue depth and lag statistics of the decoding workers, see AdvertisementDecoder.getStatistics(), or None when not enabled.
+        """
+        decoder = self.ble.scanDelegate.decoder
+        if decoder is None:
+            return None
+        return decoder.getStatistics()
+
+
+    async def advertisements(self, filter=None, validated=True, maxQueueSize=DEFAULT_STREAM_SIZE, overflowPolicy=OverflowPolicy.DROP_OLDEST):
+        """
+        Scan, and iterate over the received advertisements:
+            async for scanData in ble.advertisements():
+
+        The scanner keeps running while there is at least one iterator.
+        Advertisements are queued until you get them, when the queue is full, the overflow policy determines which ones are dropped.
+
+        :param filter:            Function that gets a ScanData and returns True when it should be queued.
+        :param validated:         When True, only advertisements of Crownstones of your sphere, or in setup mode are queued.
+        :param maxQueueSize:      Maximum number of queued advertisements.
+        :param overflowPolicy:    OverflowPolicy: DROP_OLDEST, DROP_NEWEST, or COALESCE to keep only the latest per address.
+        """
+        topic = BleTopics.advertisement
+        if not validated:
+            topic = BleTopics.rawAdvertisement
+
+        stream = AdvertisementStream(topic, filter, maxQueueSize, overflowPolicy)
+        await self.ble.addScanConsumer()
+        try:
+            while True:
+                yield await stream.get()
+        finally:
+            stream.close()
+            await self.ble.removeScanConsumer()
 
 
     async def getCrownstonesByScanning(self, scanDuration=3):
         gatherer = Gatherer()
-        subscriptionIdAll = BleEventBus.subscribe(BleTopics.rawAdvertisement, lambda scanData: gatherer.handleAdvertisement(scanData))
-        await self.ble.scan(duration=scanDuration)
-        BleEventBus.unsubscribe(subscriptionIdAll)
+        consumer = ScanConsumer(BleTopics.rawAdvertisement, scanDuration)
+        await self.ble.runScanConsumer(consumer, gatherer.handleAdvertisement)
         return gatherer.getCollection()
 
 
+    async def waitForAdvertisement(self, predicate, scanDuration=3, validated=True) -> ScanData or None:
+        """
+        Scan until an advertisement is received for which the predicate returns True, or until scanDuration has passed.
+        The predicate is evaluated as soon as an advertisement is received, so this returns right away on a match.
+        :param predicate:      Function that gets the ScanData, and returns True when it's the advertisement we're looking for.
+        :param scanDuration:   Timeout in seconds.
+        :param validated:      When True, only advertisements of Crownstones that share our encryption keys or are in setup mode are evaluated.
+        :returns:              The ScanData of the first matching advertisement, or None on timeout.
+        """
+        topic = BleTopics.advertisement if validated else BleTopics.rawAdvertisement
+        consumer = ScanConsumer(topic, scanDuration, predicate)
+        await self.ble.runScanConsumer(consumer)
+        return consumer.result
+
+
     async def isCrownstoneInSetupMode(self, address: str, scanDuration=3, waitUntilInSetupMode=False) -> bool:
         _LOGGER.warning("isCrownstoneInSetupMode is deprecated. Will be removed in v3. Use either getMode or waitForMode instead.")
         """
@@ -148,10 +472,9 @@ class CrownstoneBle:
             We have not received any scans from this Crownstone, and can't say anything about it's state.
         """
         _LOGGER.debug(f"isCrownstoneInSetupMode address={address} scanDuration={scanDuration} waitUntilInSetupMode={waitUntilInSetupMode}")
-        checker = ModeChecker(address, CrownstoneOperationMode.SETUP, waitUntilInSetupMode)
-        subscriptionId = BleEventBus.subscribe(BleTopics.advertisement, checker.handleAdvertisement)
-        await self.ble.scan(duration=scanDuration)
-        BleEventBus.unsubscribe(subscriptionId)
+        consumer = ScanConsumer(BleTopics.advertisement, scanDuration)
+        checker = ModeChecker(address, CrownstoneOperationMode.SETUP, waitUntilInSetupMode, abortCallback=consumer.abort)
+        await self.ble.runScanConsumer(consumer, checker.handleAdvertisement)
         result = checker.getResult()
 
         if result is None:
@@ -173,10 +496,9 @@ class CrownstoneBle:
             We have not received any scans from this Crownstone, and can't say anything about it's state.
         """
         _LOGGER.debug(f"isCrownstoneInNormalMode address={address} scanDuration={scanDuration} waitUntilInRequiredMode={waitUntilInNormalMode}")
-        checker = ModeChecker(address, CrownstoneOperationMode.NORMAL, waitUntilInNormalMode)
-        subscriptionId = BleEventBus.subscribe(BleTopics.rawAdvertisement, lambda scanData: checker.handleAdvertisement(scanData))
-        await self.ble.scan(duration=scanDuration)
-        BleEventBus.unsubscribe(subscriptionId)
+        consumer = ScanConsumer(BleTopics.rawAdvertisement, scanDuration)
+        checker = ModeChecker(address, CrownstoneOperationMode.NORMAL, waitUntilInNormalMode, abortCallback=consumer.abort)
+        await self.ble.runScanConsumer(consumer, checker.handleAdvertisement)
         result = checker.getResult()
 
         if result is None:
@@ -186,20 +508,26 @@ class CrownstoneBle:
 
 
 
-    async def getMode(self, address, scanDuration=3) -> CrownstoneOperationMode:
+    async def getMode(self, address, scanDuration=3, maxAge: float = None) -> CrownstoneOperationMode:
         """
         Get the operation mode of the Crownstone with given MAC address.
         This will scan for advertisements, and return on the first useful advertisement from the given MAC address.
         :param address:                The MAC address of the Crownstone.
         :param scanDuration:           Timeout in seconds.
+        :param maxAge:                 When given, the mode of the device registry is returned without scanning,
+                                       if the last advertisement of the Crownstone is at most this many seconds old.
         :returns:                      The operation mode of the Crownstone.
         :raises BleError.NO_SCANS_RECEIVED: On timeout, no useful advertisements have been received.
         """
-        _LOGGER.debug(f"getMode address={address} scanDuration={scanDuration}")
-        checker = ModeChecker(address, None)
-        subscriptionId = BleEventBus.subscribe(BleTopics.rawAdvertisement, lambda scanData: checker.handleAdvertisement(scanData))
-        await self.ble.scan(duration=scanDuration)
-        BleEventBus.unsubscribe(subscriptionId)
+        _LOGGER.debug(f"getMode address={address} scanDuration={scanDuration} maxAge={maxAge}")
+        if maxAge is not None:
+            mode = self.registry.getMode(address, maxAge)
+            if mode is not None and mode != CrownstoneOperationMode.UNKNOWN:
+                return mode
+
+        consumer = ScanConsumer(BleTopics.rawAdvertisement, scanDuration)
+        checker = ModeChecker(address, None, abortCallback=consumer.abort)
+        await self.ble.runScanConsumer(consumer, checker.handleAdvertisement)
         result = checker.getResult()
 
         if result is None:
@@ -208,10 +536,11 @@ class CrownstoneBle:
         return result
 
 
-    async def waitForMode(self, address, requiredMode: CrownstoneOperationMode, scanDuration=5):
+    async def waitForMode(self, address, requiredMode: CrownstoneOperationMode, scanDuration=5, maxAge: float = None):
         """
         This will wait until it has received an advertisement from the Crownstone with the specified address. Once it has received an advertisement, it knows the mode. We will
         scan for the scanDuration amount of seconds or until the Crownstone is in the required mode.
+        When maxAge is given, and the device registry has an advertisement in the required mode of at most maxAge seconds old, it returns without scanning.
 
         It can throw the following CrownstoneBleException
         - BleError.NO_SCANS_RECEIVED
@@ -219,11 +548,13 @@ class CrownstoneBle:
         - BleError.DIFFERENT_MODE_THAN_REQUIRED
             During the {scanDuration} seconds of scanning, the Crownstone was not in the required mode.
         """
-        _LOGGER.debug(f"waitForMode address={address} requiredMode={requiredMode} scanDuration={scanDuration}")
-        checker = ModeChecker(address, requiredMode, True)
-        subscriptionId = BleEventBus.subscribe(BleTopics.rawAdvertisement, lambda scanData: checker.handleAdvertisement(scanData))
-        await self.ble.scan(duration=scanDuration)
-        BleEventBus.unsubscribe(subscriptionId)
+        _LOGGER.debug(f"waitForMode address={address} requiredMode={requiredMode} scanDuration={scanDuration} maxAge={maxAge}")
+        if maxAge is not None and self.registry.getMode(address, maxAge) == requiredMode:
+            return
+
+        consumer = ScanConsumer(BleTopics.rawAdvertisement, scanDuration)
+        checker = ModeChecker(address, requiredMode, True, abortCallback=consumer.abort)
+        await self.ble.runScanConsumer(consumer, checker.handleAdvertisement)
         result = checker.getResult()
 
         if result is None:
@@ -233,27 +564,39 @@ class CrownstoneBle:
 
 
 
-    async def getRssiAverage(self, address, scanDuration=3):
+    async def getRssiAverage(self, address, scanDuration=3, maxAge: float = None):
+        """
+        :param maxAge:   When given, the windowed RSSI average of the device registry is returned without scanning,
+                         if the last advertisement of the Crownstone is at most this many seconds old.
+        """
+        if maxAge is not None:
+            record = self.registry.get(address)
+            if record is not None and record.lastSeen >= time.time() - maxAge and record.rssiWindow:
+                return record.getRssiWindowAverage()
+
         checker = RssiChecker(address)
-        subscriptionId = BleEventBus.subscribe(BleTopics.rawAdvertisement, lambda scanData: checker.handleAdvertisement(scanData))
-        await self.ble.scan(duration=scanDuration)
-        BleEventBus.unsubscribe(subscriptionId)
+        consumer = ScanConsumer(BleTopics.rawAdvertisement, scanDuration)
+        await self.ble.runScanConsumer(consumer, checker.handleAdvertisement)
         return checker.getResult()
 
 
-    async def getNearestCrownstone(self, rssiAtLeast=-100, scanDuration=3, returnFirstAcceptable=False, addressesToExclude=None) -> ScanData or None:
-        return await self._getNearest(False, rssiAtLeast, scanDuration, returnFirstAcceptable, False, addressesToExclude)
+    async def getNearestCrownstone(self, rssiAtLeast=-100, scanDuration=3, returnFirstAcceptable=False, addressesToExclude=None, maxAge: float = None) -> ScanData or None:
+        return await self._getNearest(False, rssiAtLeast, scanDuration, returnFirstAcceptable, False, addressesToExclude, maxAge)
     
     
-    async def getNearestValidatedCrownstone(self, rssiAtLeast=-100, scanDuration=3, returnFirstAcceptable=False, addressesToExclude=None) -> ScanData or None:
-        return await self._getNearest(False, rssiAtLeast, scanDuration, returnFirstAcceptable, True, addressesToExclude)
+    async def getNearestValidatedCrownstone(self, rssiAtLeast=-100, scanDuration=3, returnFirstAcceptable=False, addressesToExclude=None, maxAge: float = None) -> ScanData or None:
+        return await self._getNearest(False, rssiAtLeast, scanDuration, returnFirstAcceptable, True, addressesToExclude, maxAge)
     
     
-    async def getNearestSetupCrownstone(self, rssiAtLeast=-100, scanDuration=3, returnFirstAcceptable=False, addressesToExclude=None) -> ScanData or None:
-        return await self._getNearest(True, rssiAtLeast, scanDuration, returnFirstAcceptable, True, addressesToExclude)
+    async def getNearestSetupCrownstone(self, rssiAtLeast=-100, scanDuration=3, returnFirstAcceptable=False, addressesToExclude=None, maxAge: float = None) -> ScanData or None:
+        return await self._getNearest(True, rssiAtLeast, scanDuration, returnFirstAcceptable, True, addressesToExclude, maxAge)
 
 
-    async def _getNearest(self, setup, rssiAtLeast, scanDuration, returnFirstAcceptable, validated, addressesToExclude) -> ScanData or None:
+    async def _getNearest(self, setup, rssiAtLeast, scanDuration, returnFirstAcceptable, validated, addressesToExclude, maxAge = None) -> ScanData or None:
+        """
+        When maxAge is given, the Crownstone with the strongest RSSI average in the device registry, of which the last
+        advertisement is at most maxAge seconds old, is returned without scanning. If there is none, we scan as usual.
+        """
         addressesToExcludeSet = set()
         if addressesToExclude is not None:
             for data in addressesToExclude:
@@ -268,16 +611,17 @@ class CrownstoneBle:
                 else:
                     addressesToExcludeSet.add(data.lower())
 
-        selector = NearestSelector(setup, rssiAtLeast, returnFirstAcceptable, addressesToExcludeSet)
+        if maxAge is not None:
+            record = self.registry.getNearest(setup, validated, rssiAtLeast, addressesToExcludeSet, maxAge)
+            if record is not None:
+                return record.scanData
 
         topic = BleTopics.advertisement
         if not validated:
             topic = BleTopics.rawAdvertisement
 
-        subscriptionId = BleEventBus.subscribe(topic, lambda scanData: selector.handleAdvertisement(scanData))
+        consumer = ScanConsumer(topic, scanDuration)
+        selector = NearestSelector(setup, rssiAtLeast, returnFirstAcceptable, addressesToExcludeSet, abortCallback=consumer.abort)
+        await self.ble.runScanConsumer(consumer, selector.handleAdvertisement)
 
-        await self.ble.scan(duration=scanDuration)
-    
-        BleEventBus.unsubscribe(subscriptionId)
-        
         return selector.getNearest()
@@ -0,0 +1,28 @@
+from crownstone_ble.core.ble_modules.ControlHandler import ControlHandler
+from crownstone_ble.core.ble_modules.DebugHandler import DebugHandler
+from crownstone_ble.core.ble_modules.MicroappHandler import MicroappHandler
+from crownstone_ble.core.ble_modules.StateHandler import StateHandler
+
+
+class CrownstoneConnection:
+    """
+    The control, state, debug and microapp modules, bound to the connection with a single Crownstone.
+
+    Get one via CrownstoneBle.getConnection(address), after connecting to that address.
+    Commands on connections with different Crownstones can be awaited concurrently.
+    """
+
+    def __init__(self, bluetoothCore, address: str):
+        self.address  = address
+        self.ble      = bluetoothCore.ble
+        self.settings = bluetoothCore.settings
+        self.control  = ControlHandler(self, address)
+        self.state    = StateHandler(self, address)
+        self.debug    = DebugHandler(self, address)
+        self.microapp = MicroappHandler(self.control)
+
+    async def isConnected(self) -> bool:
+        return await self.ble.is_connected(self.address) == True
+
+    async def disconnect(self):
+        await self.ble.disconnect(self.address)
@@ -0,0 +1,19 @@
+from bleak import BleakClient, BleakScanner
+
+
+class BleakBackend:
+    """
+    Creates the Bluetooth clients and scanner used by the BleHandler.
+
+    This is the default backend, which uses bleak to talk to the Bluetooth adapter.
+    Another backend, like the SimulatedBackend, should implement the same methods, and return objects with the same interface as bleak.
+    """
+
+    def createClient(self, address: str, bleAdapterAddress: str = None):
+        if bleAdapterAddress is None:
+            return BleakClient(address)
+        return BleakClient(address, adapter=bleAdapterAddress)
+
+    def createScanner(self, bleAdapterAddress: str = None):
+        # With adapter None, bleak uses the first adapter it finds.
+        return BleakScanner(adapter=bleAdapterAddress)
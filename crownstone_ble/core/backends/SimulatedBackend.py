@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import math
+import random
+from collections import deque
+
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from bleak.exc import BleakError
+from crownstone_core.protocol.Characteristics import CrownstoneCharacteristics, DeviceCharacteristics
+
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone, SERVICE_DATA_UUID
+
+_LOGGER = logging.getLogger(__name__)
+
+LAST_PACKET_INDEX = 0xFF
+DEFAULT_MTU = 23
+ATT_HEADER_SIZE = 3
+# A long write is split in prepare writes, with this overhead per write, and finished with an execute write.
+ATT_PREPARE_WRITE_HEADER_SIZE = 5
+
+
+class SimulatedBackend:
+    """
+    Backend that simulates Crownstones in the same process, so the library can be used without a Bluetooth adapter.
+
+    Use it like:
+        backend = SimulatedBackend(latency=0.02)
+        core = CrownstoneBle(backend=backend)
+        backend.addCrownstone(SimulatedCrownstone("aa:bb:cc:dd:ee:01", 1, core.settings))
+    """
+
+    def __init__(self, latency: float = 0.0, packetLoss: float = 0.0, notificationInterval: float = 0.0, advertisementInterval: float = 0.1, mtu: int = DEFAULT_MTU, meshPropagationDelay: float = None):
+        """
+        :param latency:                 Time in seconds each connect, read, write, and response takes.
+        :param packetLoss:              Chance [0, 1] that a read, write, notification, or advertisement is lost.
+        :param notificationInterval:    Time in seconds between the notifications of a multipart result.
+        :param advertisementInterval:   Time in seconds between advertisements of each Crownstone.
+        :param mtu:                     MTU of the connections, determines the size of the notifications, and which writes are long writes.
+        :param meshPropagationDelay:    Time in seconds after which committed asset filters are copied to the other Crownstones, like the mesh does.
+                                        When None, filters are not propagated.
+        """
+        self.latency = latency
+        self.packetLoss = packetLoss
+        self.notificationInterval = notificationInterval
+        self.advertisementInterval = advertisementInterval
+        self.mtu = mtu
+        self.meshPropagationDelay = meshPropagationDelay
+
+        # Lower case address as key, SimulatedCrownstone as value.
+        self.crownstones = {}
+
+        # Scanners that are started. Each advertisement is received by all of them, like by multiple adapters.
+        self.activeScanners = []
+        self.advertiseTask = None
+
+        # Statistics.
+        self.connectCount = 0
+        self.writeCount = 0
+        self.readCount = 0
+        self.notificationCount = 0
+        self.advertisementCount = 0
+        # Adapter address as key, number of connects as value.
+        self.adapterConnectCounts = {}
+
+
+    def addCrownstone(self, crownstone: SimulatedCrownstone):
+        self.crownstones[crownstone.address.lower()] = crownstone
+        crownstone.filtersCommittedCallback = self._propagateFilters
+
+
+    def getCrownstone(self, address: str) -> SimulatedCrownstone or None:
+        return self.crownstones.get(address.lower(), None)
+
+
+    def createClient(self, address: str, bleAdapterAddress: str = None):
+        return SimulatedClient(self, address, bleAdapterAddress)
+
+
+    def createScanner(self, bleAdapterAddress: str = None):
+        return SimulatedScanner(self, bleAdapterAddress)
+
+
+    def startScanner(self, scanner):
+        if scanner not in self.activeScanners:
+            self.activeScanners.append(scanner)
+        if self.advertiseTask is None:
+            self.advertiseTask = asyncio.ensure_future(self._advertise())
+
+
+    def stopScanner(self, scanner):
+        if scanner in self.activeScanners:
+            self.activeScanners.remove(scanner)
+        if not self.activeScanners and self.advertiseTask is not None:
+            self.advertiseTask.cancel()
+            self.advertiseTask = None
+
+
+    async def _advertise(self):
+        while True:
+            await asyncio.sleep(self.advertisementInterval)
+            for crownstone in list(self.crownstones.values()):
+                if self.isLost():
+                    continue
+                self.advertisementCount += 1
+                advertisementData = AdvertisementData(local_name=crownstone.name, service_data={SERVICE_DATA_UUID: crownstone.getServiceData()})
+                for scanner in list(self.activeScanners):
+                    rssi = crownstone.getRssi(scanner.bleAdapterAddress)
+                    if rssi is None or scanner.callback is None:
+                        continue
+                    device = BLEDevice(crownstone.address, crownstone.name, rssi=rssi)
+                    scanner.callback(device, advertisementData)
+
+
+    def _propagateFilters(self, source: SimulatedCrownstone):
+        if self.meshPropagationDelay is None:
+            return
+        def copyFilters():
+            for crownstone in self.crownstones.values():
+                if crownstone is not source:
+                    crownstone.copyFilters(source)
+        asyncio.get_event_loop().call_later(self.meshPropagationDelay, copyFilters)
+
+
+    def isLost(self) -> bool:
+        return self.packetLoss > 0 and random.random() < self.packetLoss
+
+
+    async def delay(self, operations: int = 1):
+        if self.latency > 0:
+            await asyncio.sleep(operations * self.latency)
+
+
+class SimulatedService:
+
+    def __init__(self, uuid: str, handle: int):
+        self.uuid = uuid
+        self.handle = handle
+
+
+class SimulatedCharacteristic:
+
+    def __init__(self, uuid: str, handle: int):
+        self.uuid = uuid
+        self.handle = handle
+
+
+class SimulatedServiceCollection:
+    """
+    The discovered services and characteristics, like the bleak service collection: with handle as key.
+    """
+
+    def __init__(self, crownstone: SimulatedCrownstone = None):
+        self.services = {}
+        self.characteristics = {}
+        if crownstone is None:
+            return
+        handle = 1
+        for serviceUuid, characteristicUuids in crownstone.getServices().items():
+            self.services[handle] = SimulatedService(serviceUuid, handle)
+            handle += 1
+            for characteristicUuid in characteristicUuids:
+                self.characteristics[handle] = SimulatedCharacteristic(characteristicUuid, handle)
+                handle += 1
+
+    def getHandle(self, characteristicUuid: str) -> int or None:
+        for handle, characteristic in self.characteristics.items():
+            if characteristic.uuid == characteristicUuid:
+                return handle
+        return None
+
+
+class SimulatedClient:
+    """
+    Connection with a SimulatedCrownstone, with the same interface as the BleakClient.
+    """
+
+    def __init__(self, backend: SimulatedBackend, address: str, bleAdapterAddress: str = None):
+        self.backend = backend
+        self.address = address
+        self.bleAdapterAddress = bleAdapterAddress
+        self.crownstone = None
+        self.connected = False
+        self.sessionSettings = None
+        self.services = SimulatedServiceCollection()
+        self.mtu_size = backend.mtu
+        self.disconnectedCallback = None
+        # Characteristic UUID as key, callback(handle, data) as value.
+        self.notificationCallbacks = {}
+        # Loop time until which earlier notifications are being sent, notifications are queued like at a real device.
+        self.notificationsBusyUntil = 0
+        # Queue of (loop time, callback, handle, data) tuples. They are delivered in order, timers with equal times are not.
+        self.notificationQueue = deque()
+        self.notificationTimer = None
+
+
+    def set_disconnected_callback(self, callback):
+        self.disconnectedCallback = callback
+
+
+    async def connect(self, timeout: float = 10.0, **kwargs) -> bool:
+        crownstone = self.backend.getCrownstone(self.address)
+        if crownstone is None or crownstone.getRssi(self.bleAdapterAddress) is None:
+            await asyncio.sleep(timeout)
+            raise BleakError(f"Device with address {self.address} was not found.")
+        await self.backend.delay()
+        if self.backend.isLost():
+            raise BleakError(f"Simulated connection failure to {self.address}.")
+
+        self.backend.connectCount += 1
+        self.backend.adapterConnectCounts[self.bleAdapterAddress] = self.backend.adapterConnectCounts.get(self.bleAdapterAddress, 0) + 1
+        self.crownstone = crownstone
+        self.sessionSettings = crownstone.createSession()
+        self.services = SimulatedServiceCollection(crownstone)
+        self.notificationCallbacks = {}
+        self.connected = True
+        return True
+
+
+    async def disconnect(self) -> bool:
+        self.connected = False
+        self.notificationCallbacks = {}
+        self.notificationQueue.clear()
+        if self.notificationTimer is not None:
+            self.notificationTimer.cancel()
+            self.notificationTimer = None
+        return True
+
+
+    async def is_connected(self) -> bool:
+        return self.connected
+
+
+    async def get_services(self) -> SimulatedServiceCollection:
+        self._checkConnected()
+        await self.backend.delay()
+        return self.services
+
+
+    async def start_notify(self, characteristicUuid: str, callback, **kwargs):
+        self._checkConnected()
+        await self.backend.delay()
+        self.notificationCallbacks[characteristicUuid] = callback
+
+
+    async def stop_notify(self, characteristicUuid: str):
+        self._checkConnected()
+        self.notificationCallbacks.pop(characteristicUuid, None)
+
+
+    async def read_gatt_char(self, characteristicUuid: str, **kwargs) -> bytearray:
+        self._checkConnected()
+        await self.backend.delay()
+        if self.backend.isLost():
+            raise BleakError(f"Simulated read failure of {characteristicUuid}.")
+        self.backend.readCount += 1
+        if characteristicUuid == CrownstoneCharacteristics.SessionData:
+            return self.crownstone.getSessionData(self.sessionSettings)
+        if characteristicUuid == DeviceCharacteristics.HardwareRevision:
+            return bytearray(self.crownstone.hardwareVersion, "utf-8")
+        if characteristicUuid == DeviceCharacteristics.FirmwareRevision:
+            return bytearray(self.crownstone.firmwareVersion, "utf-8")
+        raise BleakError(f"Characteristic {characteristicUuid} was not found!")
+
+
+    async def write_gatt_char(self, characteristicUuid: str, data, response: bool = False):
+        self._checkConnected()
+        await self.backend.delay(self._getWriteOperationCount(len(data)))
+        if self.backend.isLost():
+            raise BleakError(f"Simulated write failure of {characteristicUuid}.")
+        self.backend.writeCount += 1
+        if characteristicUuid != CrownstoneCharacteristics.Control:
+            raise BleakError(f"Characteristic {characteristicUuid} was not found!")
+
+        for result in self.crownstone.handleControl(data, self.sessionSettings):
+            self._notify(CrownstoneCharacteristics.Result, result)
+
+
+    def _getWriteOperationCount(self, size: int) -> int:
+        """
+        Writes that don't fit in the MTU are long writes, that take multiple round trips.
+        """
+        if size <= self.mtu_size - ATT_HEADER_SIZE:
+            return 1
+        return math.ceil(size / (self.mtu_size - ATT_PREPARE_WRITE_HEADER_SIZE)) + 1
+
+
+    def _notify(self, characteristicUuid: str, data):
+        """
+        Send data as multipart notifications: each notification starts with the part index, the last one with index 0xFF.
+        """
+        callback = self.notificationCallbacks.get(characteristicUuid, None)
+        if callback is None:
+            return
+        handle = self.services.getHandle(characteristicUuid)
+        partSize = self.mtu_size - 4
+        parts = [data[i:i + partSize] for i in range(0, len(data), partSize)]
+        loop = asyncio.get_event_loop()
+        startTime = max(loop.time() + self.backend.latency, self.notificationsBusyUntil)
+        self.notificationsBusyUntil = startTime + len(parts) * self.backend.notificationInterval
+        for i, part in enumerate(parts):
+            index = LAST_PACKET_INDEX if i == len(parts) - 1 else i
+            if self.backend.isLost():
+                continue
+            self.backend.notificationCount += 1
+            self.notificationQueue.append((startTime + i * self.backend.notificationInterval, callback, handle, bytearray([index]) + bytearray(part)))
+        if self.notificationTimer is None and self.notificationQueue:
+            self.notificationTimer = loop.call_at(self.notificationQueue[0][0], self._deliverNotifications)
+
+
+    def _deliverNotifications(self):
+        loop = asyncio.get_event_loop()
+        self.notificationTimer = None
+        while self.notificationQueue and self.notificationQueue[0][0] <= loop.time():
+            deliveryTime, callback, handle, data = self.notificationQueue.popleft()
+            if self.connected:
+                callback(handle, data)
+        if self.notificationQueue:
+            self.notificationTimer = loop.call_at(self.notificationQueue[0][0], self._deliverNotifications)
+
+
+    def _checkConnected(self):
+        if not self.connected:
+            raise BleakError("Not connected")
+
+
+class SimulatedScanner:
+    """
+    Scanner of an adapter, that receives the advertisements of the SimulatedCrownstones, with the same interface as the BleakScanner.
+    """
+
+    def __init__(self, backend: SimulatedBackend, bleAdapterAddress: str = None):
+        self.backend = backend
+        self.bleAdapterAddress = bleAdapterAddress
+        self.callback = None
+
+
+    def register_detection_callback(self, callback):
+        self.callback = callback
+
+
+    async def start(self):
+        self.backend.startScanner(self)
+
+
+    async def stop(self):
+        self.backend.stopScanner(self)
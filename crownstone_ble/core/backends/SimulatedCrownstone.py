@@ -0,0 +1,486 @@
+import copy
+import logging
+import math
+import random
+import time
+
+from crownstone_core.Constants import UserLevel
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+from crownstone_core.protocol.BluenetTypes import ControlType, ResultValue, DeviceType, StateType
+from crownstone_core.protocol.Characteristics import CrownstoneCharacteristics, DeviceCharacteristics
+from crownstone_core.protocol.Services import CSServices
+from crownstone_core.util.BufferReader import BufferReader
+from crownstone_core.util.BufferWriter import BufferWriter
+from crownstone_core.util.CRC import crc32, crc16ccitt
+from crownstone_core.util.Conversion import Conversion
+from crownstone_core.util.EncryptionHandler import EncryptionHandler, CHECKSUM, PACKET_NONCE_LENGTH
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_DATA_UUID = "0000c001-0000-1000-8000-00805f9b34fb"
+SIMULATED_PROTOCOL_VERSION = 5
+SERVICE_DATA_VALIDATION = 0xFA
+FILTER_SPACE = 512
+MICROAPP_MAX_APPS = 1
+MICROAPP_MAX_SIZE = 0x10000
+MICROAPP_MAX_CHUNK_SIZE = 256
+MICROAPP_HEADER_SIZE = 24
+MICROAPP_TEST_FAILED = 2
+MICROAPP_TEST_PASSED = 3
+SWITCH_HISTORY_SIZE = 10
+
+"""
+Class that simulates the firmware of a Crownstone in normal mode, for the SimulatedBackend.
+
+It implements:
+- The session data characteristic, with a new session nonce per connection.
+- The device information service: hardware and firmware revision.
+- The control characteristic, with the result as encrypted, multipart, notifications on the result characteristic.
+- Encrypted state advertisements, with a unique identifier that changes every second.
+
+Supported control commands: switch, get state (switch state, power usage, temperature, time, dimming allowed, switch locked, errors), get power samples, asset filters, mesh commands,
+microapp info, upload and validate, debug info (uptime, ADC restarts and channel swaps, switch history, bootloader version), and a few that only return success (like NO_OPERATION and DISCONNECT). Other commands result in UNKNOWN_TYPE.
+"""
+class SimulatedCrownstone:
+
+    def __init__(self, address: str, crownstoneId: int, settings: EncryptionSettings, rssi: int = -60, name: str = "CRWN", loadPower: float = 100.0):
+        """
+        :param address:        MAC address.
+        :param crownstoneId:   Crownstone ID, as advertised.
+        :param settings:       Encryption settings with the keys of the sphere, a copy is used.
+        :param rssi:           RSSI of the advertisements, see also adapterRssi.
+        :param name:           Advertised name.
+        :param loadPower:      Power usage (W) of the load when switched fully on.
+        """
+        self.address = address
+        self.crownstoneId = crownstoneId
+        self.settings = copy.copy(settings)
+        self.rssi = rssi
+        # Adapter address as key, RSSI at that adapter as value, None when out of range of that adapter.
+        # Adapters that are not in here receive the advertisements with the default rssi.
+        self.adapterRssi = {}
+        self.name = name
+        self.loadPower = loadPower
+        self.hardwareVersion = "10103000100"
+        self.firmwareVersion = "5.4.0"
+        self.bootTime = time.time()
+
+        self.switchState = 0
+        self.temperature = 30
+        self.accumulatedEnergy = 0
+        self.dimmingAllowed = False
+        self.switchLocked = False
+        self.errorBitmask = 0
+        self.adcRestarts = 0
+        self.adcChannelSwaps = 0
+        # List of (timestamp, switchCommand, switchState), the most recent last.
+        self.switchHistory = []
+
+        # Power samples: number of buffers per type, and samples per buffer.
+        self.powerSamplesBufferCount = 2
+        self.powerSamplesCount = 100
+
+        # Asset filters: filter ID as key, serialized filter as value.
+        self.filters = {}
+        self.filterMasterVersion = 0
+        self.filterMasterCrc = 0
+        # Called with this Crownstone as argument, after filter changes are committed.
+        self.filtersCommittedCallback = None
+
+        # Microapps: app index as key, bytearray of the uploaded binary as value.
+        self.microapps = {}
+        # App index as key, result of the checksum test of the validate command as value.
+        self.microappChecksumTests = {}
+
+        self.controlHandlers = {
+            ControlType.NO_OPERATION:                self._handleSuccess,
+            ControlType.DISCONNECT:                  self._handleSuccess,
+            ControlType.SWITCH:                      self._handleSwitch,
+            ControlType.GET_STATE:                   self._handleGetState,
+            ControlType.GET_POWER_SAMPLES:           self._handleGetPowerSamples,
+            ControlType.MESH_COMMAND:                self._handleSuccess,
+            ControlType.ASSET_FILTER_UPLOAD:         self._handleFilterUpload,
+            ControlType.ASSET_FILTER_REMOVE:         self._handleFilterRemove,
+            ControlType.ASSET_FILTER_COMMIT_CHANGES: self._handleFilterCommit,
+            ControlType.ASSET_FILTER_GET_SUMMARIES:  self._handleFilterGetSummaries,
+            ControlType.MICROAPP_GET_INFO:           self._handleMicroappGetInfo,
+            ControlType.MICROAPP_UPLOAD:             self._handleMicroappUpload,
+            ControlType.MICROAPP_VALIDATE:           self._handleMicroappValidate,
+            ControlType.GET_UPTIME:                  self._handleGetUptime,
+            ControlType.GET_ADC_RESTARTS:            self._handleGetAdcRestarts,
+            ControlType.GET_ADC_CHANNEL_SWAPS:       self._handleGetAdcChannelSwaps,
+            ControlType.GET_SWITCH_HISTORY:          self._handleGetSwitchHistory,
+            ControlType.GET_BOOTLOADER_VERSION:      self._handleGetBootloaderVersion,
+        }
+
+        self._advertisementCache = None
+
+
+    def getServices(self) -> dict:
+        """
+        :returns: Dict with service UUID as key, and a list of characteristic UUIDs as value.
+        """
+        return {
+            CSServices.DeviceInformation: [
+                DeviceCharacteristics.HardwareRevision,
+                DeviceCharacteristics.FirmwareRevision,
+            ],
+            CSServices.CrownstoneService: [
+                CrownstoneCharacteristics.SessionData,
+                CrownstoneCharacteristics.Control,
+                CrownstoneCharacteristics.Result,
+            ]
+        }
+
+
+    def createSession(self) -> EncryptionSettings:
+        """
+        Create the encryption settings of a new connection, with a random session nonce and validation key.
+        """
+        sessionSettings = copy.copy(self.settings)
+        sessionSettings.setSessionNonce([random.randint(0, 255) for i in range(0, 5)])
+        sessionSettings.setValidationKey([random.randint(0, 255) for i in range(0, 4)])
+        return sessionSettings
+
+
+    def getSessionData(self, sessionSettings: EncryptionSettings) -> bytearray:
+        data = Conversion.uint32_to_uint8_array(CHECKSUM) + [SIMULATED_PROTOCOL_VERSION] + list(sessionSettings.sessionNonce) + list(sessionSettings.validationKey) + [0, 0]
+        return bytearray(EncryptionHandler.encryptECB(data, self.settings.basicKey))
+
+
+    def handleControl(self, data, sessionSettings: EncryptionSettings) -> list:
+        """
+        Handle an encrypted control packet.
+        :returns: List of encrypted result packets, empty when the packet could not be decrypted.
+        """
+        try:
+            packet = EncryptionHandler.decrypt(list(data), sessionSettings)
+        except Exception as err:
+            _LOGGER.warning(f"Simulated {self.address} failed to decrypt control packet: {err}")
+            return []
+
+        reader = BufferReader(packet)
+        protocol = reader.getUInt8()
+        controlType = reader.getUInt16()
+        size = reader.getUInt16()
+        # The firmware reads the payload from the decrypted, zero padded, buffer. Some packets, like the get state packet, rely on that.
+        payload = reader.getBytes(min(size, reader.getRemainingByteCount()))
+        payload += [0] * (size - len(payload))
+
+        handler = None
+        if ControlType.has_value(controlType):
+            handler = self.controlHandlers.get(ControlType(controlType), None)
+        if handler is None:
+            results = [(ResultValue.UNKNOWN_TYPE, [])]
+        else:
+            # Handlers return a (resultCode, payload) tuple, or a list of them, like WAIT_FOR_SUCCESS followed by SUCCESS.
+            results = handler(payload)
+            if isinstance(results, tuple):
+                results = [results]
+
+        # The result is encrypted with the key of the user level of the command.
+        resultSettings = copy.copy(sessionSettings)
+        resultSettings.userLevel = UserLevel(data[PACKET_NONCE_LENGTH])
+
+        encryptedResults = []
+        for resultCode, resultPayload in results:
+            writer = BufferWriter()
+            writer.putUInt8(protocol)
+            writer.putUInt16(controlType)
+            writer.putUInt16(resultCode)
+            writer.putUInt16(len(resultPayload))
+            writer.putBytes(resultPayload)
+            encryptedResults.append(EncryptionHandler.encrypt(writer.getBuffer(), resultSettings))
+        return encryptedResults
+
+
+    def getRssi(self, bleAdapterAddress: str = None) -> int or None:
+        """
+        :returns: The RSSI at the given adapter, or None when out of range.
+        """
+        return self.adapterRssi.get(bleAdapterAddress, self.rssi)
+
+
+    def getServiceData(self) -> bytes:
+        """
+        Get the encrypted service data of the state advertisement.
+        It's only encrypted again when the state or unique identifier changed.
+        """
+        uniqueIdentifier = int(time.time()) & 0xFFFF
+        key = (uniqueIdentifier, self.switchState, self.temperature)
+        if self._advertisementCache is not None and self._advertisementCache[0] == key:
+            return self._advertisementCache[1]
+
+        writer = BufferWriter()
+        writer.putUInt8(0) # type: state
+        writer.putUInt8(self.crownstoneId)
+        writer.putUInt8(self.getRawSwitchState())
+        writer.putUInt8(0) # flags
+        writer.putInt8(self.temperature)
+        writer.putInt8(127) # power factor
+        writer.putInt16(int(self.getPowerUsage() * 8))
+        writer.putInt32(int(self.accumulatedEnergy / 64))
+        writer.putUInt16(uniqueIdentifier)
+        writer.putUInt8(0) # global flags
+        writer.putUInt8(SERVICE_DATA_VALIDATION)
+
+        serviceData = bytes([7, DeviceType.PLUG]) + bytes(EncryptionHandler.encryptECB(writer.getBuffer(), self.settings.serviceDataKey))
+        self._advertisementCache = (key, serviceData)
+        return serviceData
+
+
+    def getRawSwitchState(self) -> int:
+        if self.switchState >= 100:
+            return 0x80
+        return self.switchState
+
+
+    def getPowerUsage(self) -> float:
+        return self.loadPower * min(self.switchState, 100) / 100.0
+
+
+    def _handleSuccess(self, payload):
+        return ResultValue.SUCCESS, []
+
+
+    def _handleSwitch(self, payload):
+        if len(payload) != 1:
+            return ResultValue.WRONG_PAYLOAD_LENGTH, []
+        if payload[0] == self.switchState:
+            return ResultValue.SUCCESS_NO_CHANGE, []
+        self.switchState = payload[0]
+        self.switchHistory = self.switchHistory[-(SWITCH_HISTORY_SIZE - 1):] + [(time.time(), payload[0], self.getRawSwitchState())]
+        return ResultValue.SUCCESS, []
+
+
+    def _handleGetState(self, payload):
+        reader = BufferReader(payload)
+        stateType = reader.getUInt16()
+        stateId = reader.getUInt16()
+        persistenceMode = reader.getUInt8()
+
+        writer = BufferWriter()
+        if stateType == StateType.SWITCH_STATE:
+            writer.putUInt8(self.getRawSwitchState())
+        elif stateType == StateType.POWER_USAGE:
+            writer.putInt32(int(self.getPowerUsage() * 1000))
+        elif stateType == StateType.TEMPERATURE:
+            writer.putInt8(self.temperature)
+        elif stateType == StateType.TIME:
+            writer.putUInt32(int(time.time()))
+        elif stateType == StateType.PWM_ALLOWED:
+            writer.putUInt8(1 if self.dimmingAllowed else 0)
+        elif stateType == StateType.SWITCH_LOCKED:
+            writer.putUInt8(1 if self.switchLocked else 0)
+        elif stateType == StateType.ERROR_BITMASK:
+            writer.putUInt32(self.errorBitmask)
+        else:
+            return ResultValue.NOT_FOUND, []
+
+        result = BufferWriter()
+        result.putUInt16(stateType)
+        result.putUInt16(stateId)
+        result.putUInt8(persistenceMode)
+        result.putUInt8(0)
+        result.putBytes(writer.getBuffer())
+        return ResultValue.SUCCESS, result.getBuffer()
+
+
+    def _handleGetUptime(self, payload):
+        return ResultValue.SUCCESS, Conversion.uint32_to_uint8_array(int(time.time() - self.bootTime))
+
+
+    def _handleGetAdcRestarts(self, payload):
+        return ResultValue.SUCCESS, Conversion.uint32_to_uint8_array(self.adcRestarts) + Conversion.uint32_to_uint8_array(int(self.bootTime))
+
+
+    def _handleGetAdcChannelSwaps(self, payload):
+        return ResultValue.SUCCESS, Conversion.uint32_to_uint8_array(self.adcChannelSwaps) + Conversion.uint32_to_uint8_array(int(self.bootTime))
+
+
+    def _handleGetSwitchHistory(self, payload):
+        writer = BufferWriter()
+        writer.putUInt8(len(self.switchHistory))
+        for timestamp, switchCommand, switchState in self.switchHistory:
+            writer.putUInt32(int(timestamp))
+            writer.putUInt8(switchCommand)
+            writer.putUInt8(switchState)
+            writer.putUInt8(0) # source type and via mesh
+            writer.putUInt8(0) # source ID
+        return ResultValue.SUCCESS, writer.getBuffer()
+
+
+    def _handleGetBootloaderVersion(self, payload):
+        writer = BufferWriter()
+        writer.putUInt8(1)    # protocol
+        writer.putUInt16(1)   # dfu version
+        writer.putUInt8(2)    # major
+        writer.putUInt8(1)    # minor
+        writer.putUInt8(0)    # patch
+        writer.putUInt8(255)  # pre release version, 255 for a release
+        writer.putUInt8(2)    # build type: release
+        return ResultValue.SUCCESS, writer.getBuffer()
+
+
+    def _handleGetPowerSamples(self, payload):
+        if len(payload) != 2:
+            return ResultValue.WRONG_PAYLOAD_LENGTH, []
+        samplesType, index = payload
+        if index >= self.powerSamplesBufferCount:
+            return ResultValue.WRONG_PARAMETER, []
+
+        writer = BufferWriter()
+        writer.putUInt8(samplesType)
+        writer.putUInt8(index)
+        writer.putUInt16(self.powerSamplesCount)
+        writer.putUInt32(int(time.time()))
+        writer.putUInt16(0)   # delayUs
+        writer.putUInt16(200) # sampleIntervalUs
+        writer.putBytes([0, 0])
+        writer.putInt16(0)    # offset
+        writer.putFloat(1.0)  # multiplier
+        amplitude = 2000 * min(self.switchState, 100) / 100.0
+        for i in range(0, self.powerSamplesCount):
+            writer.putInt16(int(amplitude * math.sin(2 * math.pi * i / self.powerSamplesCount)))
+        return ResultValue.SUCCESS, writer.getBuffer()
+
+
+    def _handleFilterUpload(self, payload):
+        reader = BufferReader(payload)
+        reader.getUInt8() # protocol
+        filterId = reader.getUInt8()
+        chunkStartIndex = reader.getUInt16()
+        totalSize = reader.getUInt16()
+        chunkSize = reader.getUInt16()
+        chunk = reader.getBytes(chunkSize)
+        if chunkStartIndex + chunkSize > totalSize:
+            return ResultValue.WRONG_PARAMETER, []
+
+        filterData = self.filters.get(filterId, None)
+        if filterData is None or len(filterData) != totalSize:
+            if self._getUsedFilterSpace() - len(filterData or []) + totalSize > FILTER_SPACE:
+                return ResultValue.NO_SPACE, []
+            filterData = [0] * totalSize
+        filterData[chunkStartIndex:chunkStartIndex + chunkSize] = chunk
+        self.filters[filterId] = filterData
+        return ResultValue.SUCCESS, []
+
+
+    def _handleFilterRemove(self, payload):
+        if len(payload) != 2:
+            return ResultValue.WRONG_PAYLOAD_LENGTH, []
+        if self.filters.pop(payload[1], None) is None:
+            return ResultValue.SUCCESS_NO_CHANGE, []
+        return ResultValue.SUCCESS, []
+
+
+    def _handleFilterCommit(self, payload):
+        reader = BufferReader(payload)
+        reader.getUInt8() # protocol
+        masterVersion = reader.getUInt16()
+        masterCrc = reader.getUInt32()
+        if masterCrc != self._getMasterCrc():
+            return ResultValue.MISMATCH, []
+        self.filterMasterVersion = masterVersion
+        self.filterMasterCrc = masterCrc
+        if self.filtersCommittedCallback is not None:
+            self.filtersCommittedCallback(self)
+        return ResultValue.SUCCESS, []
+
+
+    def _handleFilterGetSummaries(self, payload):
+        writer = BufferWriter()
+        writer.putUInt8(0) # protocol
+        writer.putUInt16(self.filterMasterVersion)
+        writer.putUInt32(self.filterMasterCrc)
+        writer.putUInt16(FILTER_SPACE - self._getUsedFilterSpace())
+        for filterId in sorted(self.filters.keys()):
+            writer.putUInt8(filterId)
+            writer.putUInt32(crc32(self.filters[filterId]))
+        return ResultValue.SUCCESS, writer.getBuffer()
+
+
+    def _handleMicroappGetInfo(self, payload):
+        writer = BufferWriter()
+        writer.putUInt8(1) # protocol
+        writer.putUInt8(MICROAPP_MAX_APPS)
+        writer.putUInt16(MICROAPP_MAX_SIZE - 1)
+        writer.putUInt16(MICROAPP_MAX_CHUNK_SIZE)
+        writer.putUInt16(0) # max RAM usage
+        writer.putBytes([0, 1]) # SDK version
+        for index in range(0, MICROAPP_MAX_APPS):
+            # The status is read from the binary header: build version, sdk version, checksum, and checksum of the header.
+            header = bytes(self.microapps.get(index, bytearray())[0:12]).ljust(12, b"\x00")
+            reader = BufferReader(header)
+            sdkVersion = reader.getBytes(2)
+            reader.getUInt16() # size
+            checksum = reader.getUInt16()
+            checksumHeader = reader.getUInt16()
+            buildVersion = reader.getUInt32()
+            writer.putUInt32(buildVersion)
+            writer.putBytes(sdkVersion)
+            writer.putUInt16(checksum)
+            writer.putUInt16(checksumHeader)
+            checksumTest = self.microappChecksumTests.get(index, 0)
+            writer.putUInt8((1 if index in self.microapps else 0) | (checksumTest << 1)) # tests: has data, checksum
+            writer.putUInt8(0)
+            writer.putUInt8(0) # function trying
+            writer.putUInt8(0) # function failed
+            writer.putUInt32(0) # functions passed
+        return ResultValue.SUCCESS, writer.getBuffer()
+
+
+    def _handleMicroappUpload(self, payload):
+        reader = BufferReader(payload)
+        reader.getUInt8() # protocol
+        index = reader.getUInt8()
+        offset = reader.getUInt16()
+        chunk = reader.getRemainingBytes()
+        if index >= MICROAPP_MAX_APPS or len(chunk) > MICROAPP_MAX_CHUNK_SIZE or len(chunk) % 4 or offset + len(chunk) > MICROAPP_MAX_SIZE:
+            return ResultValue.WRONG_PARAMETER, []
+        binary = self.microapps.setdefault(index, bytearray())
+        if len(binary) < offset + len(chunk):
+            binary.extend([0xFF] * (offset + len(chunk) - len(binary)))
+        binary[offset:offset + len(chunk)] = bytes(chunk)
+        self.microappChecksumTests.pop(index, None)
+        # Like the firmware: the chunk is written to flash after the command is handled.
+        return [(ResultValue.WAIT_FOR_SUCCESS, []), (ResultValue.SUCCESS, [])]
+
+
+    def _handleMicroappValidate(self, payload):
+        index = payload[1]
+        binary = self.microapps.get(index, None)
+        if binary is None or len(binary) < MICROAPP_HEADER_SIZE:
+            return ResultValue.WRONG_PARAMETER, []
+        reader = BufferReader(binary[0:MICROAPP_HEADER_SIZE])
+        reader.getUInt16() # sdk version
+        size = reader.getUInt16()
+        checksum = reader.getUInt16()
+        if crc16ccitt(list(binary[MICROAPP_HEADER_SIZE:size])) != checksum:
+            self.microappChecksumTests[index] = MICROAPP_TEST_FAILED
+            return ResultValue.MISMATCH, []
+        self.microappChecksumTests[index] = MICROAPP_TEST_PASSED
+        return ResultValue.SUCCESS, []
+
+
+    def copyFilters(self, source):
+        """
+        Take over the filters of another SimulatedCrownstone, like the mesh does when the source has a higher master version.
+        """
+        if source.filterMasterVersion <= self.filterMasterVersion:
+            return
+        self.filters = {filterId: list(filterData) for filterId, filterData in source.filters.items()}
+        self.filterMasterVersion = source.filterMasterVersion
+        self.filterMasterCrc = source.filterMasterCrc
+
+
+    def _getUsedFilterSpace(self) -> int:
+        return sum(len(filterData) for filterData in self.filters.values())
+
+
+    def _getMasterCrc(self) -> int:
+        writer = BufferWriter()
+        for filterId in sorted(self.filters.keys()):
+            writer.putUInt8(filterId)
+            writer.putUInt32(crc32(self.filters[filterId]))
+        return crc32(writer.getBuffer())
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from typing import List
+
+from crownstone_core.Constants import UserLevel
+from crownstone_core.Exceptions import CrownstoneException, CrownstoneBleException
+
+from crownstone_ble.core.container.BatchResult import BatchResult
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BATCH_CONCURRENCY = 3
+
+
+class BatchHandler:
+    """
+    Executes jobs on many Crownstones.
+
+    Each job is a tuple (address, operation), where the operation is either:
+    - A serialized control packet, like ControlPacketsGenerator.getSwitchCommandPacket(100).
+      These can be delivered via the mesh.
+    - An async function that gets the CrownstoneConnection as argument, like: lambda connection: connection.state.getSwitchState()
+    """
+
+    def __init__(self, bluetoothCore):
+        self.core = bluetoothCore
+
+    async def execute(self, jobs: list, concurrency: int = DEFAULT_BATCH_CONCURRENCY, attempts: int = 2, useMesh: bool = True) -> List[BatchResult]:
+        """
+        :param jobs:          List of (address, operation) tuples.
+        :param concurrency:   Maximum number of jobs that are connected at the same time.
+        :param attempts:      Number of attempts per job.
+        :param useMesh:       When True, control packets for validated Crownstones are sent via the mesh,
+                              if we are connected to a Crownstone that can relay them.
+        :returns:             A BatchResult per job, in the same order as the jobs.
+        """
+        results = [BatchResult(address) for address, operation in jobs]
+        remaining = list(range(0, len(jobs)))
+
+        if useMesh:
+            remaining = await self._executeViaMesh(jobs, results, remaining)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        async def executeDirectly(index):
+            async with semaphore:
+                address, operation = jobs[index]
+                await self._executeJob(address, operation, results[index], attempts)
+
+        await asyncio.gather(*[executeDirectly(index) for index in remaining])
+        return results
+
+
+    async def _executeJob(self, address, operation, result: BatchResult, attempts: int):
+        wasConnected = await self.core.ble.is_connected(address) == True
+        while result.attempts < attempts and not result.success:
+            result.attempts += 1
+            try:
+                # Jobs run concurrently, so don't change the Crownstone that is used by default.
+                await self.core.connect(address, setDefault=False)
+                connection = self.core.getConnection(address)
+                if callable(operation):
+                    result.result = await operation(connection)
+                else:
+                    result.result = await connection.control._writeControlAndGetResult(operation)
+                result.success = True
+                result.error = None
+            except Exception as err:
+                # Keep errors per job, so one failing Crownstone doesn't abort the whole batch.
+                _LOGGER.info(f"Job for {address} failed at attempt {result.attempts}: {err}")
+                result.error = err
+                # Start the next attempt with a fresh connection.
+                await self._disconnect(address)
+
+        if result.success and not wasConnected:
+            await self._disconnect(address)
+
+
+    async def _disconnect(self, address):
+        try:
+            await self.core.ble.disconnect(address)
+        except Exception as err:
+            _LOGGER.debug(f"Failed to disconnect from {address}: {err}")
+
+
+    async def _getRelayAddress(self) -> str or None:
+        """
+        Get the address of a connected Crownstone of our sphere, in normal mode, that can relay commands over the mesh.
+        """
+        for address in reversed(self.core.ble.getConnectedAddresses()):
+            if self.core.ble.validator.getCrownstoneId(address) is None:
+                continue
+            if self.core.ble.getSettings(address).userLevel == UserLevel.setup:
+                continue
+            if await self.core.ble.is_connected(address):
+                return address
+        return None
+
+
+    async def _executeViaMesh(self, jobs: list, results: List[BatchResult], indices: List[int]) -> List[int]:
+        """
+        Send the control packets of the given jobs via the mesh, when possible.
+        Jobs with the same control packet are combined into a single mesh command.
+        :returns: Indices of the jobs that still have to be executed.
+        """
+        relayAddress = await self._getRelayAddress()
+        if relayAddress is None:
+            return indices
+
+        # Control packet as key, list of job indices as value.
+        meshGroups = {}
+        remaining = []
+        for index in indices:
+            address, operation = jobs[index]
+            crownstoneId = self.core.ble.validator.getCrownstoneId(address)
+            if callable(operation) or crownstoneId is None or address.lower() == relayAddress.lower():
+                remaining.append(index)
+            else:
+                meshGroups.setdefault(bytes(operation), []).append(index)
+
+        relay = self.core.getConnection(relayAddress)
+        for packet, groupIndices in meshGroups.items():
+            crownstoneIds = [self.core.ble.validator.getCrownstoneId(jobs[index][0]) for index in groupIndices]
+            _LOGGER.info(f"Send command via {relayAddress} over the mesh to {crownstoneIds}")
+            try:
+                await relay.control._sendViaMesh(bytearray(packet), crownstoneIds)
+            except (CrownstoneException, CrownstoneBleException) as err:
+                _LOGGER.info(f"Failed to send via the mesh, falling back to connections: {err}")
+                for index in groupIndices:
+                    results[index].error = err
+                remaining.extend(groupIndices)
+                continue
+
+            for index in groupIndices:
+                results[index].success = True
+                results[index].viaMesh = True
+                results[index].attempts = 1
+
+        remaining.sort()
+        return remaining
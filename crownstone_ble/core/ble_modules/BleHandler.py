@@ -1,8 +1,10 @@
 import asyncio
+import copy
+import functools
 import logging
+from collections import OrderedDict, deque
 
 import bleak.exc
-from bleak import BleakClient, BleakScanner
 
 from crownstone_core.Exceptions import CrownstoneBleException, CrownstoneError
 from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
@@ -11,9 +13,13 @@ from crownstone_core.util.EncryptionHandler import EncryptionHandler
 
 from crownstone_ble.Exceptions import BleError
 from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.backends.BleakBackend import BleakBackend
 
 from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import BleakScanDelegate
-from crownstone_ble.core.bluetooth_delegates.NotificationDelegate import NotificationDelegate
+from crownstone_ble.core.bluetooth_delegates.NotificationRouter import NotificationRouter
+from crownstone_ble.core.modules.AdapterSelector import AdapterSelector
+from crownstone_ble.core.modules.DeviceRegistry import DeviceRegistry
+from crownstone_ble.core.modules.ScanConsumer import ScanConsumer
 from crownstone_ble.core.modules.Validator import Validator
 from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
 
@@ -21,15 +27,36 @@ _LOGGER = logging.getLogger(__name__)
 
 CCCD_UUID = 0x2902
 
+# Maximum number of simultaneous connections per adapter, before the least recently used idle connection is closed.
+DEFAULT_MAX_CONNECTIONS = 5
+
+# Time in seconds the scanner keeps running after the last scan consumer is done, so the next one can reuse the scan.
+# By default the scanner is stopped right away, like it used to be.
+DEFAULT_SCAN_LINGER_TIME = 0
+
+# MTU of a connection when the backend doesn't report the negotiated MTU.
+DEFAULT_MTU = 23
+
+# Fields of the encryption settings that are shared by all connections, the other fields are session data of a connection.
+SHARED_SETTINGS_FIELDS = ["adminKey", "memberKey", "basicKey", "serviceDataKey", "localizationKey", "meshApplicationKey", "meshNetworkKey", "initializedKeys"]
+
 
 class ActiveClient:
 
-    def __init__(self, address, cleanupCallback, bleAdapterAddress):
+    def __init__(self, address, cleanupCallback, bleAdapterAddress, settings: EncryptionSettings, backend, adapterIndex: int = 0):
         self.address = address
-        if bleAdapterAddress is None:
-            self.client = BleakClient(address)
-        else:
-            self.client = BleakClient(address, adapter=bleAdapterAddress)
+
+        # The adapter this connection uses: its address, and its index in the adapter addresses of the BleHandler.
+        self.bleAdapterAddress = bleAdapterAddress
+        self.adapterIndex = adapterIndex
+
+        # Encryption settings of this connection: a copy of the keys, with the session data of this connection.
+        self.settings = settings
+
+        # Number of operations (like waiting for notifications) currently using this connection.
+        self.operationCount = 0
+
+        self.client = backend.createClient(address, bleAdapterAddress)
         self.cleanupCallback = cleanupCallback
         self.client.set_disconnected_callback(self.forcedDisconnect)
 
@@ -47,6 +74,10 @@ class ActiveClient:
         # Handle as key, UUID as value.
         self.notificationSubscriptions = {}
 
+        # Long-lived listeners that route the merged notifications to the active request.
+        # Characteristic UUID as key, NotificationRouter as value.
+        self.notificationRouters = {}
+
     def forcedDisconnect(self, data):
         BleEventBus.emit(SystemBleTopics.forcedDisconnect, self.address)
         self.cleanupCallback()
@@ -68,6 +99,13 @@ class ActiveClient:
             self.notificationSubscriptions[handle] = characteristicUuid
         self.notificationCallbacks[characteristicUuid] = callback
 
+    def getNotificationRouter(self, characteristicUuid: str) -> NotificationRouter:
+        router = self.notificationRouters.get(characteristicUuid, None)
+        if router is None:
+            router = NotificationRouter(self, characteristicUuid)
+            self.notificationRouters[characteristicUuid] = router
+        return router
+
     def unsubscribeNotifications(self, characteristicUuid: str):
         _LOGGER.debug(f"remove callback for notifications to uuid={characteristicUuid}")
         self.notificationCallbacks.pop(characteristicUuid, None)
@@ -84,40 +122,127 @@ class ActiveClient:
 
 class BleHandler:
 
-    def __init__(self, settings: EncryptionSettings, bleAdapterAddress: str=None):
-        # bleAdapterAddress is the MAC address of the adapter you want to use.
+    def __init__(self, settings: EncryptionSettings, bleAdapterAddress: str or list = None, maxConnections: int = DEFAULT_MAX_CONNECTIONS, backend=None):
+        # bleAdapterAddress is the MAC address of the adapter you want to use, or a list of addresses to use multiple adapters.
+        # maxConnections is the maximum number of connections per adapter.
+        # backend creates the clients and scanner, when None, the BleakBackend is used.
 
         self.settings = settings
-        self.bleAdapterAddress = bleAdapterAddress
-
-        # Connection
-        self.activeClient: ActiveClient or None = None
-
-        # Scanning
-        self.scanner = BleakScanner(adapter=bleAdapterAddress)
+        if isinstance(bleAdapterAddress, (list, tuple)):
+            self.bleAdapterAddresses = list(bleAdapterAddress)
+        else:
+            self.bleAdapterAddresses = [bleAdapterAddress]
+        if not self.bleAdapterAddresses:
+            raise CrownstoneBleException(CrownstoneError.INVALID_ADDRESS, "No adapter addresses given.")
+        self.bleAdapterAddress = self.bleAdapterAddresses[0]
+        self.adapterSelector = AdapterSelector(len(self.bleAdapterAddresses))
+        self.backend = backend if backend is not None else BleakBackend()
+
+        # Connections, with lower case address as key, and ActiveClient as value.
+        # Ordered from least recently used to most recently used.
+        self.clients = OrderedDict()
+        self.maxConnections = maxConnections
+
+        # Address of the last connect() call, used when no address is given.
+        self.defaultAddress = None
+
+        # Scanning, with a scanner per adapter.
+        self.scanners = [self.backend.createScanner(adapterAddress) for adapterAddress in self.bleAdapterAddresses]
         self.scanningActive = False
-        self.scanAborted = False
-        scanDelegate = BleakScanDelegate(self.settings)
-        self.scanner.register_detection_callback(scanDelegate.handleDiscovery)
+        # Events of the scans started with scan(), set by abortScan() to end them.
+        # They're created by each scan, so they belong to the event loop the scan runs in.
+        self.scanAbortedEvents = set()
+        # Number of consumers that keep the scanner running, like advertisement streams.
+        self.scanConsumerCount = 0
+        self.scanLingerTime = DEFAULT_SCAN_LINGER_TIME
+        self.scanLingerHandle = None
+        self.scanDelegate = BleakScanDelegate(self.settings)
+        if len(self.scanners) == 1:
+            self.scanners[0].register_detection_callback(self.scanDelegate.handleDiscovery)
+        else:
+            # The detections of all adapters are merged, duplicates are dropped before they're parsed.
+            for adapterIndex, scanner in enumerate(self.scanners):
+                scanner.register_detection_callback(functools.partial(self._handleAdapterDiscovery, adapterIndex))
 
         # Event bus
         self.subscriptionIds = []
-        self.validator = Validator()
+        self.registry = DeviceRegistry()
+        self.validator = Validator(self.registry)
         self.subscriptionIds.append(BleEventBus.subscribe(SystemBleTopics.abortScanning, lambda x: self.abortScan()))
 
-        # To be moved to active client or notification handler.
-        self.notificationLoopActive = False
+
+    @property
+    def activeClient(self) -> ActiveClient or None:
+        """
+        The client of the last connect() call.
+        """
+        return self._getClient()
 
 
     async def shutDown(self):
         for subscriptionId in self.subscriptionIds:
             BleEventBus.unsubscribe(subscriptionId)
-        await self.disconnect()
+        await self.disconnectAll()
         await self.stopScanning()
 
 
-    async def is_connected_guard(self):
-        connected = await self.is_connected()
+    def _getClient(self, address: str = None) -> ActiveClient or None:
+        """
+        Get the client of given address, and mark it as most recently used.
+        :param address: MAC address, when None, the address of the last connect() call is used.
+        """
+        if address is None:
+            address = self.defaultAddress
+        if address is None:
+            return None
+        key = address.lower()
+        client = self.clients.get(key, None)
+        if client is not None:
+            self.clients.move_to_end(key)
+        return client
+
+
+    def getSettings(self, address: str = None) -> EncryptionSettings:
+        """
+        Get the encryption settings, including the session data, of a connection.
+        :param address: MAC address, when None, the address of the last connect() call is used.
+        """
+        client = self._getClient(address)
+        if client is None:
+            raise CrownstoneBleException(CrownstoneError.NOT_CONNECTED, "Not connected.")
+        return client.settings
+
+
+    def getConnectedAddresses(self) -> list:
+        """
+        :returns: List of addresses we have a connection with, from least to most recently used.
+        """
+        return [client.address for client in self.clients.values()]
+
+
+    def getConnectionCounts(self) -> list:
+        """
+        :returns: List with the number of connections per adapter, in the order of the adapter addresses.
+        """
+        counts = [0] * len(self.bleAdapterAddresses)
+        for client in self.clients.values():
+            counts[client.adapterIndex] += 1
+        return counts
+
+
+    def getAdapterAddress(self, address: str = None) -> str or None:
+        """
+        :param address: MAC address of a connected device, when None, the address of the last connect() call is used.
+        :returns:       The address of the adapter the connection uses.
+        """
+        client = self._getClient(address)
+        if client is None:
+            raise CrownstoneBleException(CrownstoneError.NOT_CONNECTED, "Not connected.")
+        return client.bleAdapterAddress
+
+
+    async def is_connected_guard(self, address: str = None):
+        connected = await self.is_connected(address)
         if not connected:
             _LOGGER.debug(f"Could not perform action since the client is not connected!.")
             raise CrownstoneBleException("Not connected.")
@@ -127,70 +252,135 @@ class BleHandler:
         """
         Check if connected to a BLE device.
         :param address: When not None, check if connected to given address.
+                        When None, check if connected to the address of the last connect() call.
         :returns:       True when connected.
         """
-        if self.activeClient is None:
+        client = self._getClient(address)
+        if client is None:
             return False
-        if address is not None:
-            if self.activeClient.address.lower() != address.lower():
-                return False
-        connected = await self.activeClient.client.is_connected()
+        connected = await client.client.is_connected()
         if connected:
             return True
 
 
-    def resetClient(self):
-        self.activeClient = None
+    def resetClient(self, address: str = None):
+        if address is None:
+            address = self.defaultAddress
+        if address is None:
+            return
+        self.clients.pop(address.lower(), None)
+
+
+    def _createConnectionSettings(self) -> EncryptionSettings:
+        """
+        Copy the keys into new encryption settings, so each connection has its own session data.
+        """
+        connectionSettings = copy.copy(self.settings)
+        connectionSettings.invalidateSessionNonce()
+        connectionSettings.exitSetup()
+        return connectionSettings
 
 
-    async def connect(self, address, timeout: int = 5, attempts: int = 3) -> bool:
+    def updateConnectionSettings(self):
         """
-        @param address:   MAC address to connect to.
-        @param timeout:   Timeout in seconds.
-        @param attempts:  Number of connection attempts.
-        @return:          True on successful connect.
+        Copy the keys of the settings into the settings of the open connections, after they have been changed.
+        The session data is kept, and connections that are in setup mode keep using the setup key.
         """
-        # Always clean up cached setup key for a new connection.
-        self.settings.exitSetup()
+        for client in self.clients.values():
+            for field in SHARED_SETTINGS_FIELDS:
+                setattr(client.settings, field, getattr(self.settings, field))
+            if client.settings.setupKey is None:
+                client.settings.determineUserLevel()
+
 
+    async def _makeRoomForConnection(self, address: str) -> int:
+        """
+        Select the adapter to connect with, see AdapterSelector.
+        Disconnects the least recently used idle connection when the maximum number of connections is reached on all adapters.
+        :returns: The index of the adapter to connect with.
+        """
+        adapterIndex = self.adapterSelector.selectAdapter(address, self.getConnectionCounts(), self.maxConnections)
+        if adapterIndex is not None:
+            return adapterIndex
+        for key, client in self.clients.items():
+            if client.operationCount == 0:
+                _LOGGER.info(f"Maximum number of connections reached, disconnecting from least recently used {client.address}")
+                await self.disconnect(client.address)
+                return client.adapterIndex
+        raise CrownstoneBleException(BleError.TOO_MANY_CONNECTIONS, f"All {len(self.clients)} connections are in use.")
+
+
+    async def connect(self, address, timeout: int = 5, attempts: int = 3, setDefault: bool = True) -> bool:
+        """
+        Connect to a device. Existing connections to other devices are kept open, up to maxConnections.
+        @param address:     MAC address to connect to.
+        @param timeout:     Timeout in seconds.
+        @param attempts:    Number of connection attempts.
+        @param setDefault:  When True, the address is used when no address is given to other calls.
+                            Use False for connections that are addressed explicitly, like those of concurrent jobs.
+        @return:            True on successful connect.
+        """
         connected = await self.is_connected(address)
         if connected:
             _LOGGER.info("Already connected")
+            if setDefault:
+                self.defaultAddress = address
             return True
 
-        # TODO: Check if activeClient is already set.
-        self.activeClient = ActiveClient(address, lambda: self.resetClient(), self.bleAdapterAddress)
+        # Clean up a previous client of this address, that is no longer connected.
+        self.resetClient(address)
+        adapterIndex = await self._makeRoomForConnection(address)
+
+        adapterAddress = self.bleAdapterAddresses[adapterIndex]
+        client = ActiveClient(address, lambda: self.resetClient(address), adapterAddress, self._createConnectionSettings(), self.backend, adapterIndex)
+        self.clients[address.lower()] = client
 
-        _LOGGER.info(f"Connecting to {address}")
+        _LOGGER.info(f"Connecting to {address} via adapter {adapterAddress}")
         connected = False
-        for i in range(0, attempts):
-            connected = await self.connectAttempt(timeout)
-            if connected:
-                break
+        client.operationCount += 1
+        try:
+            for i in range(0, attempts):
+                connected = await self.connectAttempt(timeout, address)
+                if connected:
+                    break
+        finally:
+            client.operationCount -= 1
         if not connected:
+            self.resetClient(address)
             raise CrownstoneBleException(CrownstoneError.CONNECTION_FAILED)
 
-        _LOGGER.info(f"Connected")
-        serviceSet = await self.activeClient.client.get_services()
-        self.activeClient.services = {}
-        self.activeClient.characteristics = {}
-        for key, service in serviceSet.services.items():
-            self.activeClient.services[service.uuid] = key
-        for key, characteristic in serviceSet.characteristics.items():
-            self.activeClient.characteristics[characteristic.uuid] = characteristic.handle
+        _LOGGER.info(f"Connected to {address}")
+        serviceSet = await client.client.get_services()
+        client.services, client.characteristics = self._getServiceMaps(serviceSet)
 
-        self.activeClient.notificationCallbacks = {}
-        self.activeClient.notificationSubscriptions = {}
+        client.notificationCallbacks = {}
+        client.notificationSubscriptions = {}
+        client.notificationRouters = {}
 
+        if setDefault:
+            self.defaultAddress = address
         return connected
 
-    async def connectAttempt(self, timeout: int) -> bool:
+    def _getServiceMaps(self, serviceSet) -> tuple:
+        """
+        :returns: Tuple with a dict of service UUID to handle, and a dict of characteristic UUID to handle.
+        """
+        services = {}
+        characteristics = {}
+        for key, service in serviceSet.services.items():
+            services[service.uuid] = key
+        for key, characteristic in serviceSet.characteristics.items():
+            characteristics[characteristic.uuid] = characteristic.handle
+        return services, characteristics
+
+
+    async def connectAttempt(self, timeout: int, address: str = None) -> bool:
         # this can throw an error when the connection fails.
         # these BleakErrors are nicely human readable.
         # TODO: document/convert these errors.
         try:
             _LOGGER.debug(f"Connecting..")
-            connected = await self.activeClient.client.connect(timeout = timeout)
+            connected = await self._getClient(address).client.connect(timeout = timeout)
         except bleak.BleakError as err:
             _LOGGER.info(f"Failed to connect: {err}")
             connected = False
@@ -200,186 +390,388 @@ class BleHandler:
         return connected
 
 
-    async def disconnect(self):
-        if self.activeClient is not None:
-            self.settings.exitSetup()
-            await self.activeClient.client.disconnect()
-            self.activeClient = None
+    async def disconnect(self, address: str = None):
+        """
+        :param address: MAC address to disconnect from, when None, the address of the last connect() call is used.
+        """
+        client = self._getClient(address)
+        if client is not None:
+            self.resetClient(client.address)
+            await client.client.disconnect()
 
 
-    async def waitForPeripheralToDisconnect(self, timeout: int = 10):
-        if self.activeClient is not None:
-            if await self.activeClient.isConnected():
-                waiting = True
-                def disconnectListener(data):
-                    nonlocal waiting
-                    waiting = False
+    async def disconnectAll(self):
+        for client in list(self.clients.values()):
+            await self.disconnect(client.address)
 
-                listenerId = BleEventBus.subscribe(SystemBleTopics.forcedDisconnect, disconnectListener)
 
-                timer = 0
-                while waiting and timer < 10:
-                    await asyncio.sleep(0.1)
-                    timer += 0.1
+    async def waitForPeripheralToDisconnect(self, timeout: int = 10, address: str = None):
+        client = self._getClient(address)
+        if client is not None:
+            if await client.isConnected():
+                disconnected = asyncio.Event()
+                def disconnectListener(data):
+                    if data == client.address:
+                        disconnected.set()
 
-                self.settings.exitSetup()
-                BleEventBus.unsubscribe(listenerId)
+                listenerId = BleEventBus.subscribe(SystemBleTopics.forcedDisconnect, disconnectListener)
+                try:
+                    await asyncio.wait_for(disconnected.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    BleEventBus.unsubscribe(listenerId)
 
-                self.activeClient = None
+            self.resetClient(client.address)
 
 
     async def scan(self, duration=3):
+        """
+        Scan for the given duration, or until abortScan() is called.
+        When aborted, the scanner is stopped right away if there are no other scan consumers.
+        """
         _LOGGER.debug(f"scan duration={duration}")
+        scanAborted = asyncio.Event()
+        self.scanAbortedEvents.add(scanAborted)
+        try:
+            await self.addScanConsumer()
+            try:
+                await asyncio.wait_for(scanAborted.wait(), duration)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                await self.removeScanConsumer(linger=not scanAborted.is_set())
+        finally:
+            self.scanAbortedEvents.discard(scanAborted)
+
+
+    async def runScanConsumer(self, consumer: ScanConsumer, handleAdvertisement = None):
+        """
+        Pass the advertisements to handleAdvertisement, and to the predicate of the consumer, until the consumer is done.
+        The scan session is shared with the other consumers, so the scanner is only started when it's not running already.
+        """
+        subscriptionIds = []
+        if handleAdvertisement is not None:
+            subscriptionIds.append(BleEventBus.subscribe(consumer.topic, handleAdvertisement))
+        if consumer.predicate is not None:
+            subscriptionIds.append(BleEventBus.subscribe(consumer.topic, consumer.handleAdvertisement))
+        await self.addScanConsumer()
+        try:
+            await consumer.wait()
+        finally:
+            for subscriptionId in subscriptionIds:
+                BleEventBus.unsubscribe(subscriptionId)
+            await self.removeScanConsumer()
+
+
+    async def addScanConsumer(self):
+        """
+        Keep the scanner running until removeScanConsumer() is called.
+        """
+        self.scanConsumerCount += 1
+        _LOGGER.debug(f"addScanConsumer scanConsumerCount={self.scanConsumerCount}")
+        self._cancelScanLinger()
         await self.startScanning()
-        while duration > 0 and self.scanAborted == False:
-            await asyncio.sleep(0.1)
-            duration -= 0.1
-        await self.stopScanning()
+
+
+    async def removeScanConsumer(self, linger: bool = True):
+        """
+        Stop the scanner when this was the last consumer.
+        :param linger:   When True, the scanner is stopped after the linger time, unless a new consumer is added before that.
+        """
+        self.scanConsumerCount = max(0, self.scanConsumerCount - 1)
+        _LOGGER.debug(f"removeScanConsumer scanConsumerCount={self.scanConsumerCount}")
+        if self.scanConsumerCount > 0:
+            return
+        if linger and self.scanLingerTime > 0:
+            if self.scanLingerHandle is None:
+                self.scanLingerHandle = asyncio.get_event_loop().call_later(self.scanLingerTime, lambda: asyncio.ensure_future(self.stopScanningIfIdle()))
+        else:
+            await self.stopScanningIfIdle()
+
+
+    def _cancelScanLinger(self):
+        if self.scanLingerHandle is not None:
+            self.scanLingerHandle.cancel()
+            self.scanLingerHandle = None
+
+
+    async def stopScanningIfIdle(self):
+        """
+        Stop the scanner when there are no scan consumers.
+        """
+        if self.scanConsumerCount == 0:
+            await self.stopScanning()
 
 
     async def startScanning(self):
         _LOGGER.debug(f"startScanning scanningActive={self.scanningActive}")
         if not self.scanningActive:
-            self.scanAborted = False
             self.scanningActive = True
-            await self.scanner.start()
+            await asyncio.gather(*[scanner.start() for scanner in self.scanners])
 
 
     async def stopScanning(self):
         _LOGGER.debug(f"stopScanning scanningActive={self.scanningActive}")
+        self._cancelScanLinger()
         if self.scanningActive:
             self.scanningActive = False
-            self.scanAborted = False
-            await self.scanner.stop()
+            await asyncio.gather(*[scanner.stop() for scanner in self.scanners])
+
+
+    def _handleAdapterDiscovery(self, adapterIndex: int, device, advertisementData):
+        """
+        Detection callback of the scanner of an adapter, when using multiple adapters.
+        Only forwards the detection to the scan delegate when it's not a duplicate of a detection by another adapter.
+        """
+        address = self.scanDelegate.normalizeAddress(device.address)
+        if self.adapterSelector.handleDetection(adapterIndex, address, device.rssi, advertisementData.service_data):
+            self.scanDelegate.handleDiscovery(device, advertisementData)
 
 
     def abortScan(self):
+        """
+        End the scans started with scan(). Scan consumers of helpers like getMode() are not affected.
+        """
         _LOGGER.debug("abortScan")
-        self.scanAborted = True
+        for scanAborted in self.scanAbortedEvents:
+            scanAborted.set()
 
-    def hasService(self, serviceUUID) -> bool:
+    def hasService(self, serviceUUID, address: str = None) -> bool:
         _LOGGER.debug(f"hasService serviceUUID={serviceUUID}")
-        return serviceUUID in self.activeClient.services
+        return serviceUUID in self._getClient(address).services
 
-    def hasCharacteristic(self, characteristicUUID) -> bool:
+    def hasCharacteristic(self, characteristicUUID, address: str = None) -> bool:
         _LOGGER.debug(f"hasCharacteristic characteristicUUID={characteristicUUID}")
-        return characteristicUUID in self.activeClient.characteristics
+        return characteristicUUID in self._getClient(address).characteristics
 
-    async def writeToCharacteristic(self, serviceUUID, characteristicUUID, content):
+    def getMtu(self, address: str = None) -> int:
+        """
+        Get the MTU of a connection.
+        Bleak 0.10 doesn't report the MTU, but with BlueZ 5.62 or newer, the discovered characteristics have the negotiated MTU
+        as property. On other platforms, and older BlueZ versions, the MTU is unknown and DEFAULT_MTU is returned.
+        :param address: MAC address, when None, the address of the last connect() call is used.
+        :returns:       The negotiated MTU, or DEFAULT_MTU when the backend doesn't report it.
+        """
+        client = self._getClient(address)
+        if client is None:
+            raise CrownstoneBleException(CrownstoneError.NOT_CONNECTED, "Not connected.")
+        mtu = getattr(client.client, "mtu_size", None)
+        if mtu is None:
+            mtu = self._getCharacteristicMtu(client.client.services)
+        return mtu or DEFAULT_MTU
+
+    def _getCharacteristicMtu(self, serviceSet) -> int or None:
+        """
+        :returns: The MTU property of the discovered characteristics, as set by BlueZ, or None when there is none.
+        """
+        mtu = None
+        for characteristic in serviceSet.characteristics.values():
+            properties = getattr(characteristic, "obj", None)
+            if isinstance(properties, dict) and "MTU" in properties:
+                mtu = max(mtu or 0, int(properties["MTU"]))
+        return mtu
+
+    async def writeToCharacteristic(self, serviceUUID, characteristicUUID, content, address: str = None):
         _LOGGER.debug(f"writeToCharacteristic serviceUUID={serviceUUID} characteristicUUID={characteristicUUID} content={content}")
-        await self.is_connected_guard()
-        encryptedContent = EncryptionHandler.encrypt(content, self.settings)
+        await self.is_connected_guard(address)
+        client = self._getClient(address)
+        encryptedContent = EncryptionHandler.encrypt(content, client.settings)
         payload = self._preparePayload(encryptedContent)
-        await self.activeClient.client.write_gatt_char(characteristicUUID, payload, response=True)
+        await client.client.write_gatt_char(characteristicUUID, payload, response=True)
 
 
-    async def writeToCharacteristicWithoutEncryption(self, serviceUUID, characteristicUUID, content, response=True):
+    async def writeToCharacteristicWithoutEncryption(self, serviceUUID, characteristicUUID, content, response=True, address: str = None):
         _LOGGER.debug(f"writeToCharacteristicWithoutEncryption serviceUUID={serviceUUID} characteristicUUID={characteristicUUID} content={content}")
-        await self.is_connected_guard()
+        await self.is_connected_guard(address)
         payload = self._preparePayload(content)
-        await self.activeClient.client.write_gatt_char(characteristicUUID, payload, response=response)
+        await self._getClient(address).client.write_gatt_char(characteristicUUID, payload, response=response)
 
 
-    async def readCharacteristic(self, serviceUUID, characteristicUUID):
+    async def readCharacteristic(self, serviceUUID, characteristicUUID, address: str = None):
         _LOGGER.debug(f"readCharacteristic serviceUUID={serviceUUID} characteristicUUID={characteristicUUID}")
-        data = await self.readCharacteristicWithoutEncryption(serviceUUID, characteristicUUID)
-        if self.settings.isEncryptionEnabled():
-            return EncryptionHandler.decrypt(data, self.settings)
+        data = await self.readCharacteristicWithoutEncryption(serviceUUID, characteristicUUID, address)
+        settings = self.getSettings(address)
+        if settings.isEncryptionEnabled():
+            return EncryptionHandler.decrypt(data, settings)
 
 
-    async def readCharacteristicWithoutEncryption(self, serviceUUID, characteristicUUID):
+    async def readCharacteristicWithoutEncryption(self, serviceUUID, characteristicUUID, address: str = None):
         _LOGGER.debug(f"readCharacteristicWithoutEncryption serviceUUID={serviceUUID} characteristicUUID={characteristicUUID}")
-        await self.is_connected_guard()
-        return await self.activeClient.client.read_gatt_char(characteristicUUID)
+        await self.is_connected_guard(address)
+        return await self._getClient(address).client.read_gatt_char(characteristicUUID)
 
 
-    async def setupSingleNotification(self, serviceUUID, characteristicUUID, writeCommand, timeout = None):
+    async def setupSingleNotification(self, serviceUUID, characteristicUUID, writeCommand, timeout = None, address: str = None):
         if timeout is None:
             timeout = 12.5
 
         _LOGGER.debug(f"setupSingleNotification serviceUUID={serviceUUID} characteristicUUID={characteristicUUID}")
-        await self.is_connected_guard()
-
-        # setup the collecting of the notification data.
-        _LOGGER.debug(f"setupSingleNotification: subscribe for notifications.")
-        notificationDelegate = NotificationDelegate(self._killNotificationLoop, self.settings)
-        await self.activeClient.subscribeNotifications(characteristicUUID, notificationDelegate.handleNotification)
+        await self.is_connected_guard(address)
+        client = self._getClient(address)
 
-        # execute something that will trigger the notifications
-        _LOGGER.debug(f"setupSingleNotification: writeCommand().")
-        await writeCommand()
-
-        # wait for the results to come in.
-        self.notificationLoopActive = True
-        loopCount = 0
-        pollInterval = 0.1
-        while self.notificationLoopActive and loopCount < (timeout / pollInterval):
-            await asyncio.sleep(pollInterval)
-            loopCount += 1
-
-
-        if notificationDelegate.result is None:
-            if self.activeClient is not None:
-                self.activeClient.unsubscribeNotifications(characteristicUUID)
+        router = client.getNotificationRouter(characteristicUUID)
+        result = None
+        client.operationCount += 1
+        try:
+            # Wait for our turn, the router then collects the merged notifications for us.
+            mergedNotifications = await router.startRequest()
+            try:
+                # execute something that will trigger the notifications
+                _LOGGER.debug(f"setupSingleNotification: writeCommand().")
+                await writeCommand()
+
+                # wait for the result to come in.
+                try:
+                    result = await asyncio.wait_for(mergedNotifications.get(), timeout)
+                except asyncio.TimeoutError:
+                    _LOGGER.debug(f"setupSingleNotification: timeout after {timeout} seconds.")
+            finally:
+                router.finishRequest()
+        finally:
+            client.operationCount -= 1
+
+        if result is None:
             raise CrownstoneBleException(BleError.NO_NOTIFICATION_DATA_RECEIVED, "No notification data received.")
 
-        if self.activeClient is not None:
-            self.activeClient.unsubscribeNotifications(characteristicUUID)
-        return notificationDelegate.result
+        return result
 
 
-    async def setupNotificationStream(self, serviceUUID, characteristicUUID, writeCommand, resultHandler, timeout):
+    async def setupNotificationStream(self, serviceUUID, characteristicUUID, writeCommand, resultHandler, timeout, address: str = None):
         _LOGGER.debug(f"setupNotificationStream serviceUUID={serviceUUID} characteristicUUID={characteristicUUID} timeout={timeout}")
-        await self.is_connected_guard()
-
-        # Collect all merged notifications in a queue, so we can process them all.
-        mergedNotifications = []
-        def onMergedNotification():
-            mergedNotifications.append(notificationDelegate.result)
-            notificationDelegate.reset()
-
-        # Subscribe for notifications and let the delegate merge them.
-        _LOGGER.debug(f"setupNotificationStream: subscribe for notifications.")
-        notificationDelegate = NotificationDelegate(onMergedNotification, self.settings)
-        await self.activeClient.subscribeNotifications(characteristicUUID, notificationDelegate.handleNotification)
-
-        # Execute something that will trigger the notifications.
-        _LOGGER.debug(f"setupNotificationStream: writeCommand().")
-        await writeCommand()
-
-        # Wait for the results to come in.
-        self.notificationLoopActive = True
-        loopCount = 0
-        successful = False
-        pollInterval = 0.1
-        while self.notificationLoopActive and loopCount < (timeout / pollInterval):
-            await asyncio.sleep(pollInterval)
-            _LOGGER.debug(f"loopActive={self.notificationLoopActive} loopCount={loopCount}")
-            loopCount += 1
-            if len(mergedNotifications):
-                command = resultHandler(mergedNotifications.pop(0))
+        await self.is_connected_guard(address)
+        client = self._getClient(address)
+
+        router = client.getNotificationRouter(characteristicUUID)
+        client.operationCount += 1
+        try:
+            # Wait for our turn, the router then puts all merged notifications in a queue, so we can process them all.
+            mergedNotifications = await router.startRequest()
+        except BaseException:
+            client.operationCount -= 1
+            raise
+        try:
+            # Execute something that will trigger the notifications.
+            _LOGGER.debug(f"setupNotificationStream: writeCommand().")
+            await writeCommand()
+
+            # Handle the results as they come in, until finished or the deadline has passed.
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            successful = False
+            while not successful:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    notification = await asyncio.wait_for(mergedNotifications.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+                command = resultHandler(notification)
                 if command == ProcessType.ABORT_ERROR:
                     _LOGGER.debug("abort")
-                    self.notificationLoopActive = False
-                    self.activeClient.unsubscribeNotifications(characteristicUUID)
                     raise CrownstoneBleException(BleError.ABORT_NOTIFICATION_STREAM_W_ERROR, "Aborting the notification stream because the resultHandler raised an error.")
                 elif command == ProcessType.FINISHED:
                     _LOGGER.debug("finished")
-                    self.notificationLoopActive = False
                     successful = True
                 elif command == ProcessType.CONTINUE:
                     _LOGGER.debug("continue")
+        finally:
+            client.operationCount -= 1
+            router.finishRequest()
 
         if not successful:
-            self.activeClient.unsubscribeNotifications(characteristicUUID)
             raise CrownstoneBleException(BleError.NOTIFICATION_STREAM_TIMEOUT, "Notification stream not finished within timeout.")
 
-        # remove subscription from this characteristic
-        self.activeClient.unsubscribeNotifications(characteristicUUID)
 
-    def _killNotificationLoop(self):
-        _LOGGER.debug("_killNotificationLoop")
-        self.notificationLoopActive = False
+    async def setupNotificationPipeline(self, serviceUUID, characteristicUUID, writeCommands: list, resultHandler, windowSize: int, timeout: float,
+                                        drainTime: float = None, address: str = None) -> list:
+        """
+        Execute the write commands, without waiting for the result of a command before writing the next one.
+        Up to windowSize commands can be waiting for their result at the same time.
+
+        Every write command should trigger one final (merged) notification, optionally preceded by intermediate notifications.
+        The notifications are matched to the write commands in order, as the device sends the results in the order it handled the writes.
+        When no notification is received within the timeout, the pipeline stops, and the remaining commands are returned as failed.
+        Results that arrive late are then discarded until no notification is received for the drain time, so they won't be
+        taken as result of the commands written after this, for example when the failed commands are written again.
+
+        :param writeCommands:    List of async functions, that each write a command.
+        :param resultHandler:    Function (index, notification) -> ProcessType, for the result of writeCommands[index]:
+                                 FINISHED when the result is ok, CONTINUE when it's an intermediate result, ABORT_ERROR when it failed.
+                                 The notification is None when it could not be decrypted. It can raise to abort the pipeline.
+        :param windowSize:       Maximum number of commands waiting for their result.
+        :param timeout:          Time in seconds to wait for each result.
+        :param drainTime:        Time in seconds without notifications, before late results are assumed to be lost.
+                                 When None, the timeout is used.
+        :returns:                List of indices of the write commands that failed, or that did not get a result.
+        """
+        _LOGGER.debug(f"setupNotificationPipeline serviceUUID={serviceUUID} characteristicUUID={characteristicUUID} commands={len(writeCommands)} windowSize={windowSize}")
+        await self.is_connected_guard(address)
+        client = self._getClient(address)
+
+        # Indices of the write commands that are waiting for their result, in order of writing.
+        pending = deque()
+        failed = []
+        nextIndex = 0
+        router = client.getNotificationRouter(characteristicUUID)
+        client.operationCount += 1
+        try:
+            # Wait for our turn, the router then puts all merged notifications in a queue.
+            mergedNotifications = await router.startRequest()
+        except BaseException:
+            client.operationCount -= 1
+            raise
+        try:
+            while nextIndex < len(writeCommands) or pending:
+                if nextIndex < len(writeCommands) and len(pending) < max(1, windowSize):
+                    index = nextIndex
+                    nextIndex += 1
+                    try:
+                        await writeCommands[index]()
+                    except bleak.exc.BleakError as err:
+                        # The command was not written, so there will be no result for it.
+                        _LOGGER.debug("setupNotificationPipeline: write %s failed: %s", index, err)
+                        failed.append(index)
+                        continue
+                    pending.append(index)
+                    continue
+
+                try:
+                    notification = await asyncio.wait_for(mergedNotifications.get(), timeout)
+                except asyncio.TimeoutError:
+                    _LOGGER.debug("setupNotificationPipeline: timeout after %s seconds, %s commands without result.", timeout, len(pending))
+                    await self._drainNotifications(mergedNotifications, timeout if drainTime is None else drainTime)
+                    break
+
+                command = resultHandler(pending[0], notification)
+                if command == ProcessType.CONTINUE:
+                    continue
+                index = pending.popleft()
+                if command != ProcessType.FINISHED:
+                    failed.append(index)
+        finally:
+            client.operationCount -= 1
+            router.finishRequest()
+
+        failed.extend(pending)
+        failed.extend(range(nextIndex, len(writeCommands)))
+        return sorted(failed)
+
+
+    async def _drainNotifications(self, notifications: asyncio.Queue, quietTime: float):
+        """
+        Discard notifications, until no notification is received for quietTime seconds.
+        """
+        drained = 0
+        while True:
+            try:
+                await asyncio.wait_for(notifications.get(), quietTime)
+                drained += 1
+            except asyncio.TimeoutError:
+                break
+        _LOGGER.debug("Discarded %s late notifications.", drained)
 
 
     def _preparePayload(self, data: list or bytes or bytearray):
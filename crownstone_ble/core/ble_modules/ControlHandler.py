@@ -22,23 +22,41 @@ from crownstone_ble.Exceptions import BleError
 
 _LOGGER = logging.getLogger(__name__)
 
+# Asset filter chunk size, used when the MTU is too small for a chunk of at least MIN_FILTER_CHUNK_SIZE.
+DEFAULT_FILTER_CHUNK_SIZE = 128
+MIN_FILTER_CHUNK_SIZE = 32
+
+# Bytes of an upload filter chunk write that are not chunk data:
+# ATT header (3), encryption header (4), and within the encrypted blocks: validation key (4), control header (5), chunk header (8).
+ATT_HEADER_SIZE = 3
+ENCRYPTION_HEADER_SIZE = 4
+FILTER_CHUNK_OVERHEAD = 4 + 5 + 8
+
+# Number of times the commands of a pipelined upload are retransmitted when they didn't get a result.
+PIPELINE_RETRIES = 3
+
 class ControlHandler:
-    def __init__(self, bluetoothCore):
+    def __init__(self, bluetoothCore, address: str = None):
+        """
+        :param address:    MAC address of the connection to use, when None, the last connected Crownstone is used.
+        """
         self.core = bluetoothCore
+        self.address = address
 
     async def _getAndSetSessionNonce(self):
         """
         Reads the session nonce, and uses it to set settings.
         """
-        if self.core.ble.hasCharacteristic(CrownstoneCharacteristics.SessionData):
-            rawNonce = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.CrownstoneService, CrownstoneCharacteristics.SessionData)
-            ProcessSessionNoncePacket(rawNonce, self.core.settings.basicKey, self.core.settings)
-        elif self.core.ble.hasCharacteristic(SetupCharacteristics.SessionData):
-            sessionKey = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.SetupService, SetupCharacteristics.SessionKey)
-            sessionNoncePacket = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.SetupService, SetupCharacteristics.SessionData)
+        settings = self.core.ble.getSettings(self.address)
+        if self.core.ble.hasCharacteristic(CrownstoneCharacteristics.SessionData, self.address):
+            rawNonce = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.CrownstoneService, CrownstoneCharacteristics.SessionData, self.address)
+            ProcessSessionNoncePacket(rawNonce, settings.basicKey, settings)
+        elif self.core.ble.hasCharacteristic(SetupCharacteristics.SessionData, self.address):
+            sessionKey = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.SetupService, SetupCharacteristics.SessionKey, self.address)
+            sessionNoncePacket = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.SetupService, SetupCharacteristics.SessionData, self.address)
 
-            self.core.settings.loadSetupKey(sessionKey) # This also sets user level to "setup", make sure you "exitSetup()" on disconnect!
-            ProcessSessionNoncePacket(sessionNoncePacket, sessionKey, self.core.settings)
+            settings.loadSetupKey(sessionKey) # This also sets user level to "setup", the settings of this connection are discarded on disconnect.
+            ProcessSessionNoncePacket(sessionNoncePacket, sessionKey, settings)
 
     async def setSwitch(self, switchVal: int):
         """
@@ -104,7 +122,7 @@ class ControlHandler:
                 raise err
 
         # Disconnect from this side as well.
-        await self.core.ble.disconnect()
+        await self.core.ble.disconnect(self.address)
 
 
     async def lockSwitch(self, lock: bool):
@@ -131,27 +149,28 @@ class ControlHandler:
 
         :param address:      The MAC address of the Crownstone to recover.
         """
-        await self.core.connect(address, ignoreEncryption=True)
-        await self._recoveryByFactoryReset()
-        await self._checkRecoveryProcess()
-        await self.core.disconnect()
+        await self.core.ble.connect(address)
+        await self._recoveryByFactoryReset(address)
+        await self._checkRecoveryProcess(address)
+        await self.core.ble.disconnect(address)
         await asyncio.sleep(5)
-        await self.core.connect(address, ignoreEncryption=True)
-        await self._recoveryByFactoryReset()
-        await self._checkRecoveryProcess()
-        await self.core.disconnect()
+        await self.core.ble.connect(address)
+        await self._recoveryByFactoryReset(address)
+        await self._checkRecoveryProcess(address)
+        await self.core.ble.disconnect(address)
         await asyncio.sleep(2)
 
-    async def _recoveryByFactoryReset(self):
+    async def _recoveryByFactoryReset(self, address):
         packet = ControlPacketsGenerator.getFactoryResetPacket()
-        return self.core.ble.writeToCharacteristicWithoutEncryption(
+        return await self.core.ble.writeToCharacteristicWithoutEncryption(
             CSServices.CrownstoneService,
             CrownstoneCharacteristics.FactoryReset,
-            packet
+            packet,
+            address=address
         )
 
-    async def _checkRecoveryProcess(self):
-        result = self.core.ble.readCharacteristicWithoutEncryption(CSServices.CrownstoneService, CrownstoneCharacteristics.FactoryReset)
+    async def _checkRecoveryProcess(self, address):
+        result = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.CrownstoneService, CrownstoneCharacteristics.FactoryReset, address)
         if result[0] == 1:
             return True
         elif result[0] == 2:
@@ -159,12 +178,14 @@ class ControlHandler:
         else:
             raise CrownstoneException(BleError.NOT_IN_RECOVERY_MODE, "The recovery mechanism has expired. It is only available briefly after the Crownstone is powered on.")
 
-    async def setFilters(self, filters: List[AssetFilter], masterVersion: int = None) -> int:
+    async def setFilters(self, filters: List[AssetFilter], masterVersion: int = None, windowSize: int = 1, chunkSize: int = None) -> int:
         """
         Makes sure the given filters are set at the Crownstone.
         Uploads and removes filters where necessary.
         :param filters:           The asset filter to be uploaded.
         :param masterVersion:     The new master version. If None, the master version will be increased by 1.
+        :param windowSize:        When larger than 1, the removals and chunks are pipelined, see uploadFilter().
+        :param chunkSize:         Size of the filter chunks, when None, the size is based on the MTU, see getFilterChunkSize().
         :return:                  The new master version.
         """
         _LOGGER.info(f"setFilters")
@@ -173,12 +194,20 @@ class ControlHandler:
         if not syncer.commitRequired:
             return syncer.masterVersion
 
-        for filterId in syncer.removeIds:
-            await self.removeFilter(filterId)
+        if windowSize > 1:
+            # Removals and uploads of all filters go through a single pipeline.
+            packets = [ControlPacketsGenerator.getRemoveFilterPacket(filterId) for filterId in syncer.removeIds]
+            for filter in filters:
+                if filter.getFilterId() in syncer.uploadIds:
+                    packets += self._getFilterChunkPackets(filter, chunkSize)
+            await self._writeControlPacketsPipelined(packets, windowSize)
+        else:
+            for filterId in syncer.removeIds:
+                await self.removeFilter(filterId)
 
-        for filter in filters:
-            if filter.getFilterId() in syncer.uploadIds:
-                await self.uploadFilter(filter)
+            for filter in filters:
+                if filter.getFilterId() in syncer.uploadIds:
+                    await self.uploadFilter(filter, chunkSize=chunkSize)
 
         await self.commitFilterChanges(syncer.masterVersion, filters)
         return syncer.masterVersion
@@ -198,18 +227,49 @@ class ControlHandler:
         resultPacket = await self._writeControlAndGetResult(ControlPacketsGenerator.getGetFilterSummariesPacket())
         return FilterSummariesPacket(resultPacket.payload)
 
-    async def uploadFilter(self, filter: AssetFilter):
+    async def uploadFilter(self, filter: AssetFilter, chunkSize: int = None, windowSize: int = 1):
         """
         Upload an asset filter to the Crownstones.
         Once all changes are made, don't forget to commit them.
 
-        :param filter:  The asset filter to be uploaded.
+        With a window size larger than 1, the next chunks are written without waiting for the result of the previous chunk.
+        Chunks that fail, or don't get a result, are retransmitted. Since a chunk is written at its own offset in the filter,
+        retransmitting is safe, and the master CRC checked at commit catches anything that went wrong anyway.
+
+        :param filter:      The asset filter to be uploaded.
+        :param chunkSize:   Size of the filter chunks, when None, the size is based on the MTU, see getFilterChunkSize().
+        :param windowSize:  Maximum number of chunks waiting for their result.
         """
         _LOGGER.info(f"uploadFilter {filter}")
-        chunker = FilterChunker(filter, 128)
-        for i in range(0, chunker.getAmountOfChunks()):
-            chunk = chunker.getChunk()
-            await self._writeControlAndGetResult(ControlPacketsGenerator.getUploadFilterPacket(chunk))
+        packets = self._getFilterChunkPackets(filter, chunkSize)
+        if windowSize > 1:
+            await self._writeControlPacketsPipelined(packets, windowSize)
+        else:
+            for packet in packets:
+                await self._writeControlAndGetResult(packet)
+
+    def getFilterChunkSize(self) -> int:
+        """
+        Get the largest filter chunk size, for which an upload filter command fits in a single write at the MTU of the connection.
+        When that's smaller than MIN_FILTER_CHUNK_SIZE, the write won't fit anyway, and DEFAULT_FILTER_CHUNK_SIZE is returned.
+        This is also the case when the MTU is unknown, like on platforms other than BlueZ 5.62 or newer, see BleHandler.getMtu().
+        """
+        mtu = self.core.ble.getMtu(self.address)
+        # The encrypted part is padded to a multiple of the AES block size.
+        encryptedSize = (mtu - ATT_HEADER_SIZE - ENCRYPTION_HEADER_SIZE) // 16 * 16
+        chunkSize = encryptedSize - FILTER_CHUNK_OVERHEAD
+        if chunkSize < MIN_FILTER_CHUNK_SIZE:
+            return DEFAULT_FILTER_CHUNK_SIZE
+        return chunkSize
+
+    def _getFilterChunkPackets(self, filter: AssetFilter, chunkSize: int = None) -> list:
+        """
+        :returns: The serialized upload filter control packets, one per chunk.
+        """
+        if chunkSize is None:
+            chunkSize = self.getFilterChunkSize()
+        chunker = FilterChunker(filter, chunkSize)
+        return [ControlPacketsGenerator.getUploadFilterPacket(chunker.getChunk()) for i in range(0, chunker.getAmountOfChunks())]
 
     async def removeFilter(self, filterId):
         """
@@ -260,16 +320,16 @@ class ControlHandler:
     ##############################################
 
     async def _readControlPacket(self, packet):
-        if self.core.ble.hasCharacteristic(SetupCharacteristics.SetupControl):
-            return await self.core.ble.readCharacteristic(CSServices.SetupService, SetupCharacteristics.SetupControl)
+        if self.core.ble.hasCharacteristic(SetupCharacteristics.SetupControl, self.address):
+            return await self.core.ble.readCharacteristic(CSServices.SetupService, SetupCharacteristics.SetupControl, self.address)
         else:
-            return await self.core.ble.readCharacteristic(CSServices.CrownstoneService, CrownstoneCharacteristics.Control)
+            return await self.core.ble.readCharacteristic(CSServices.CrownstoneService, CrownstoneCharacteristics.Control, self.address)
 
     async def _writeControlPacket(self, packet):
-        if self.core.ble.hasCharacteristic(SetupCharacteristics.SetupControl):
-            await self.core.ble.writeToCharacteristic(CSServices.SetupService, SetupCharacteristics.SetupControl, packet)
+        if self.core.ble.hasCharacteristic(SetupCharacteristics.SetupControl, self.address):
+            await self.core.ble.writeToCharacteristic(CSServices.SetupService, SetupCharacteristics.SetupControl, packet, self.address)
         else:
-            await self.core.ble.writeToCharacteristic(CSServices.CrownstoneService, CrownstoneCharacteristics.Control, packet)
+            await self.core.ble.writeToCharacteristic(CSServices.CrownstoneService, CrownstoneCharacteristics.Control, packet, self.address)
 
 
     async def _writeControlAndGetResult(self, controlPacket, acceptedResultValues = [ResultValue.SUCCESS, ResultValue.SUCCESS_NO_CHANGE], timeout = None) -> ResultPacket:
@@ -279,10 +339,10 @@ class ControlHandler:
         :param acceptedResultValues:   List of result values that are ok.
         :returns:                      The result packet.
         """
-        if self.core.ble.hasCharacteristic(SetupCharacteristics.Result):
-            result = await self.core.ble.setupSingleNotification(CSServices.SetupService, SetupCharacteristics.Result, lambda: self._writeControlPacket(controlPacket), timeout)
+        if self.core.ble.hasCharacteristic(SetupCharacteristics.Result, self.address):
+            result = await self.core.ble.setupSingleNotification(CSServices.SetupService, SetupCharacteristics.Result, lambda: self._writeControlPacket(controlPacket), timeout, self.address)
         else:
-            result = await self.core.ble.setupSingleNotification(CSServices.CrownstoneService, CrownstoneCharacteristics.Result, lambda: self._writeControlPacket(controlPacket), timeout)
+            result = await self.core.ble.setupSingleNotification(CSServices.CrownstoneService, CrownstoneCharacteristics.Result, lambda: self._writeControlPacket(controlPacket), timeout, self.address)
         resultPacket = ResultPacket(result)
         if not resultPacket.valid:
             raise CrownstoneException(CrownstoneError.INCORRECT_RESPONSE_LENGTH, "Result is invalid")
@@ -291,6 +351,83 @@ class ControlHandler:
 
         return resultPacket
 
+    async def _writeControlPacketsPipelined(self, controlPackets: list, windowSize: int, acceptedResultValues = [ResultValue.SUCCESS, ResultValue.SUCCESS_NO_CHANGE],
+                                            timeout = 5, retries = PIPELINE_RETRIES, retryResultValues = [ResultValue.BUSY], successCallback = None):
+        """
+        Writes the control packets, with up to windowSize packets waiting for their result.
+        Packets without result, or with an invalid result, are written again, up to the given number of retries.
+        Before that, late results of the previous attempt are discarded, see BleHandler.setupNotificationPipeline().
+        A WAIT_FOR_SUCCESS result is treated as intermediate result, the packet then waits for the next result.
+
+        :param controlPackets:         Serialized control packets to write.
+        :param windowSize:             Maximum number of packets waiting for their result.
+        :param acceptedResultValues:   List of result values that are ok, other result values raise an exception right away.
+        :param timeout:                Time in seconds to wait for each result.
+        :param retries:                Number of times the failed packets are written again.
+        :param retryResultValues:      List of result values for which the packet is written again, instead of raising an exception.
+        :param successCallback:        Function (index, resultPacket), called when controlPackets[index] got an accepted result.
+        """
+        if self.core.ble.hasCharacteristic(SetupCharacteristics.Result, self.address):
+            service = CSServices.SetupService
+            resultCharacteristic = SetupCharacteristics.Result
+        else:
+            service = CSServices.CrownstoneService
+            resultCharacteristic = CrownstoneCharacteristics.Result
+
+        # Indices in controlPackets of the packets that are written in the current attempt.
+        remaining = list(range(0, len(controlPackets)))
+        packetTypes = [ControlPacketType(packet) for packet in controlPackets]
+
+        def handleResult(index, notificationData):
+            packetIndex = remaining[index]
+            if notificationData is None:
+                _LOGGER.debug(f"No valid result for packet {packetIndex}")
+                return ProcessType.ABORT_ERROR
+            resultPacket = ResultPacket(notificationData)
+            if not resultPacket.valid:
+                _LOGGER.debug(f"Invalid result packet for packet {packetIndex}")
+                return ProcessType.ABORT_ERROR
+            if resultPacket.commandTypeUInt16 != packetTypes[packetIndex]:
+                _LOGGER.debug(f"Result of type {resultPacket.commandTypeUInt16} does not match packet {packetIndex} of type {packetTypes[packetIndex]}")
+                return ProcessType.ABORT_ERROR
+            if resultPacket.resultCode == ResultValue.WAIT_FOR_SUCCESS:
+                return ProcessType.CONTINUE
+            if resultPacket.resultCode in retryResultValues:
+                _LOGGER.debug(f"Result code of packet {packetIndex} is {resultPacket.resultCode}, retry later")
+                return ProcessType.ABORT_ERROR
+            if resultPacket.resultCode not in acceptedResultValues:
+                raise CrownstoneException(CrownstoneError.RESULT_NOT_SUCCESS, f"Result code is {resultPacket.resultCode}")
+            if successCallback is not None:
+                successCallback(packetIndex, resultPacket)
+            return ProcessType.FINISHED
+
+        for attempt in range(0, retries + 1):
+            if attempt > 0:
+                _LOGGER.info(f"Retransmit {len(remaining)} of {len(controlPackets)} control packets")
+            writeCommands = [lambda packet=controlPackets[packetIndex]: self._writeControlPacket(packet) for packetIndex in remaining]
+            failedIndices = await self.core.ble.setupNotificationPipeline(service, resultCharacteristic, writeCommands, handleResult, windowSize, timeout, address=self.address)
+            remaining = [remaining[index] for index in failedIndices]
+            if not remaining:
+                return
+
+        raise CrownstoneBleException(BleError.NO_NOTIFICATION_DATA_RECEIVED, f"No result for {len(remaining)} of {len(controlPackets)} control packets.")
+
+    async def _writeControlPacketsAndGetResults(self, controlPackets: list, windowSize: int) -> (list, Exception or None):
+        """
+        Writes the control packets pipelined, and collects the result of each packet, regardless of the result code.
+        :returns: Tuple (results, error): the ResultPacket per control packet, or None when there was no result,
+                  and the exception that stopped the pipeline, or None when all packets got a result.
+        """
+        results = [None] * len(controlPackets)
+        def onResult(index, resultPacket):
+            results[index] = resultPacket
+        try:
+            await self._writeControlPacketsPipelined(controlPackets, windowSize, acceptedResultValues=list(ResultValue), successCallback=onResult)
+        except Exception as err:
+            _LOGGER.info(f"Failed to get all results: {err}")
+            return results, err
+        return results, None
+
     async def _writeControlAndWaitForSuccess(self, controlPacket, timeout = 5, acceptedResultValues = [ResultValue.SUCCESS, ResultValue.SUCCESS_NO_CHANGE]):
         """
         Writes the control packet, and waits for success.
@@ -318,7 +455,7 @@ class ControlHandler:
                 _LOGGER.warning("Invalid result packet.")
                 return ProcessType.ABORT_ERROR
 
-        if self.core.ble.hasCharacteristic(SetupCharacteristics.Result):
+        if self.core.ble.hasCharacteristic(SetupCharacteristics.Result, self.address):
             service = CSServices.SetupService
             resultCharacteristic = SetupCharacteristics.Result
         else:
@@ -330,9 +467,16 @@ class ControlHandler:
             resultCharacteristic,
             lambda: self._writeControlPacket(controlPacket),
             lambda notification: handleResult(notification),
-            timeout
+            timeout,
+            self.address
         )
 
+def ControlPacketType(controlPacket) -> int:
+    """
+    Get the control type of a serialized control packet.
+    """
+    return controlPacket[1] + (controlPacket[2] << 8)
+
 def ProcessSessionNoncePacket(encryptedPacket, key, settings):
     # decrypt it
     decrypted = EncryptionHandler.decryptECB(encryptedPacket, key)
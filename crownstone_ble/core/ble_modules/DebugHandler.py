@@ -1,3 +1,5 @@
+import time
+
 from crownstone_core.Exceptions import CrownstoneError, CrownstoneException
 from crownstone_core.packets.ResultPacket import ResultPacket
 from crownstone_core.packets.debug.AdcChannelSwapsPacket import AdcChannelSwapsPacket
@@ -5,31 +7,53 @@ from crownstone_core.packets.debug.AdcRestartsPacket import AdcRestartsPacket
 from crownstone_core.packets.debug.BootloaderInfoPacket import BootloaderInfoPacket, BOOTLOADER_INFO_PROTOCOL
 from crownstone_core.packets.debug.PowerSamplesPacket import PowerSamplesPacket
 from crownstone_core.packets.debug.SwitchHistoryPacket import SwitchHistoryListPacket
-from crownstone_core.protocol.BluenetTypes import ResultValue
+from crownstone_core.protocol.BluenetTypes import ResultValue, PowerSamplesType
 from crownstone_core.protocol.Characteristics import CrownstoneCharacteristics, DeviceCharacteristics
 from crownstone_core.protocol.ControlPackets import ControlPacket, ControlType
 from crownstone_core.protocol.ControlPackets import ControlPacketsGenerator
 from crownstone_core.protocol.Services import CSServices
 from crownstone_core.util.Conversion import Conversion
 
+from crownstone_ble.core.container.Diagnostics import Diagnostics
+from crownstone_ble.core.modules.PowerSamplesArrays import PowerSamplesArrays, requireNumpy
+
+DIAGNOSTICS_POWER_SAMPLES_TYPES = [
+	PowerSamplesType.SWITCHCRAFT,
+	PowerSamplesType.SWITCHCRAFT_NON_TRIGGERED,
+	PowerSamplesType.NOW_FILTERED,
+	PowerSamplesType.NOW_UNFILTERED,
+	PowerSamplesType.SOFT_FUSE,
+	PowerSamplesType.SWITCH,
+]
+
+# Number of power samples indices per type that are requested at once, the last index is only known when WRONG_PARAMETER is returned.
+POWER_SAMPLES_BATCH_SIZE = 2
+
+DEFAULT_DIAGNOSTICS_WINDOW_SIZE = 4
+
 
 class DebugHandler:
-	def __init__(self, bluetoothCore):
+	def __init__(self, bluetoothCore, address: str = None):
+		""" When address is None, the last connected Crownstone is used. """
 		self.core = bluetoothCore
+		self.address = address
 
 	async def getHardwareVersion(self) -> str:
 		""" Get the hardware version of the Crownstone as string. """
-		buf = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.DeviceInformation, DeviceCharacteristics.HardwareRevision)
+		buf = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.DeviceInformation, DeviceCharacteristics.HardwareRevision, self.address)
 		return Conversion.uint8_array_to_string(buf)
 
 	async def getFirmwareVersion(self) -> str:
 		""" Get the firmware version of the Crownstone as string. """
-		buf = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.DeviceInformation, DeviceCharacteristics.FirmwareRevision)
+		buf = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.DeviceInformation, DeviceCharacteristics.FirmwareRevision, self.address)
 		return Conversion.uint8_array_to_string(buf)
 
 	async def getBootloaderVersion(self) -> str:
 		""" Get the bootloader version of the Crownstone as simple string. """
 		bootloaderInfo = await self.getBootloaderInfo()
+		return self._getBootloaderVersionString(bootloaderInfo)
+
+	def _getBootloaderVersionString(self, bootloaderInfo: BootloaderInfoPacket) -> str:
 		if bootloaderInfo.protocol != BOOTLOADER_INFO_PROTOCOL:
 			raise CrownstoneException(CrownstoneError.PROTOCOL_NOT_SUPPORTED)
 		bootloaderVersion = f"{bootloaderInfo.major}.{bootloaderInfo.minor}.{bootloaderInfo.patch}"
@@ -76,21 +100,114 @@ class DebugHandler:
 			raise CrownstoneException(CrownstoneError.RESULT_NOT_SUCCESS, "Result: " + str(result.resultCode))
 		return SwitchHistoryListPacket(result.payload)
 
-	async def getPowerSamples(self, samplesType):
-		""" Get all power samples of the given type. Returns a list of PowerSamplesPacket. """
-		allSamples = []
+	async def getPowerSamples(self, samplesType, asArrays: bool = False):
+		"""
+		Get all power samples of the given type.
+		Returns a list of PowerSamplesPacket, or a PowerSamplesArrays when asArrays is True (requires NumPy).
+		"""
+		if asArrays:
+			requireNumpy()
+		payloads = []
 		index = 0
 		while True:
 			result = await self._getPowerSamples(samplesType, index)
 			if result.resultCode == ResultValue.WRONG_PARAMETER:
-				return allSamples
+				break
 			elif result.resultCode == ResultValue.SUCCESS:
-				samples = PowerSamplesPacket(result.payload)
-				allSamples.append(samples)
+				payloads.append(result.payload)
 				index += 1
 			else:
 				raise CrownstoneException(CrownstoneError.RESULT_NOT_SUCCESS, "Result: " + str(result.resultCode))
 
+		if asArrays:
+			return PowerSamplesArrays.fromPayloads(payloads, self.address or self.core.ble.defaultAddress)
+		return [PowerSamplesPacket(payload) for payload in payloads]
+
+	async def collectDiagnostics(self, powerSamplesTypes: list = None, windowSize: int = DEFAULT_DIAGNOSTICS_WINDOW_SIZE) -> Diagnostics:
+		"""
+		Collect the versions, uptime, ADC restarts and channel swaps, switch history, and all power samples in one go.
+		The control commands are pipelined: up to windowSize commands are written without waiting for their result.
+		Items that fail are put in the errors of the diagnostics, instead of raising.
+
+		:param powerSamplesTypes:   List of PowerSamplesType to get, when None, all types are collected.
+		:param windowSize:          Maximum number of commands waiting for their result.
+		"""
+		if powerSamplesTypes is None:
+			powerSamplesTypes = DIAGNOSTICS_POWER_SAMPLES_TYPES
+		diagnostics = Diagnostics(self.address or self.core.ble.defaultAddress)
+		diagnostics.timestamp = time.time()
+
+		for name, getVersion in [("hardwareVersion", self.getHardwareVersion), ("firmwareVersion", self.getFirmwareVersion)]:
+			try:
+				setattr(diagnostics, name, await getVersion())
+			except Exception as err:
+				diagnostics.errors[name] = str(err)
+
+		# Name as key, function that parses the result payload as value.
+		parsers = {
+			"bootloaderVersion": lambda payload: self._getBootloaderVersionString(BootloaderInfoPacket(payload)),
+			"uptime":            Conversion.uint8_array_to_uint32,
+			"adcRestarts":       AdcRestartsPacket,
+			"adcChannelSwaps":   AdcChannelSwapsPacket,
+			"switchHistory":     SwitchHistoryListPacket,
+		}
+		requests = [
+			("bootloaderVersion", ControlPacket(ControlType.GET_BOOTLOADER_VERSION).serialize()),
+			("uptime",            ControlPacket(ControlType.GET_UPTIME).serialize()),
+			("adcRestarts",       ControlPacket(ControlType.GET_ADC_RESTARTS).serialize()),
+			("adcChannelSwaps",   ControlPacket(ControlType.GET_ADC_CHANNEL_SWAPS).serialize()),
+			("switchHistory",     ControlPacket(ControlType.GET_SWITCH_HISTORY).serialize()),
+		]
+
+		# The power samples are requested in batches of indices per type, until an index returns WRONG_PARAMETER.
+		nextIndex = {}
+		for samplesType in powerSamplesTypes:
+			diagnostics.powerSamples[samplesType] = []
+			nextIndex[samplesType] = 0
+		while requests or nextIndex:
+			for samplesType, index in nextIndex.items():
+				for i in range(index, index + POWER_SAMPLES_BATCH_SIZE):
+					requests.append(((samplesType, i), ControlPacketsGenerator.getPowerSamplesRequestPacket(samplesType, i)))
+
+			results, error = await self.core.control._writeControlPacketsAndGetResults([packet for key, packet in requests], windowSize)
+			for (key, packet), result in zip(requests, results):
+				if isinstance(key, tuple):
+					samplesType, index = key
+					name = f"powerSamples.{samplesType.name}"
+					if samplesType not in nextIndex:
+						# Done with this type, because of WRONG_PARAMETER or an error at a lower index.
+						continue
+					if result is not None and result.resultCode == ResultValue.WRONG_PARAMETER:
+						nextIndex.pop(samplesType)
+						continue
+					parse = PowerSamplesPacket
+				else:
+					name = key
+					parse = parsers[key]
+
+				try:
+					if result is None:
+						raise CrownstoneException(CrownstoneError.RESULT_NOT_SUCCESS, f"No result: {error}")
+					if result.resultCode != ResultValue.SUCCESS:
+						raise CrownstoneException(CrownstoneError.RESULT_NOT_SUCCESS, "Result: " + str(result.resultCode))
+					value = parse(result.payload)
+				except Exception as err:
+					diagnostics.errors[name] = str(err)
+					if isinstance(key, tuple):
+						nextIndex.pop(key[0])
+					continue
+
+				if isinstance(key, tuple):
+					diagnostics.powerSamples[key[0]].append(value)
+				else:
+					setattr(diagnostics, key, value)
+
+			for samplesType in nextIndex:
+				nextIndex[samplesType] += POWER_SAMPLES_BATCH_SIZE
+			requests = []
+
+		return diagnostics
+
 	async def getPowerSamplesAtIndex(self, samplesType, index):
 		""" Get power samples of given type at given index. Returns a PowerSamplesPacket. """
 		result = await self._getPowerSamples(samplesType, index)
@@ -101,7 +218,7 @@ class DebugHandler:
 	async def _getPowerSamples(self, samplesType, index):
 		""" Get power samples of given type at given index, but don't check result code. """
 		controlPacket = ControlPacketsGenerator.getPowerSamplesRequestPacket(samplesType, index)
-		return await self._writeControlAndGetResult(controlPacket)
+		return await self.core.control._writeControlAndGetResult(controlPacket, [ResultValue.SUCCESS, ResultValue.WRONG_PARAMETER])
 
 	async def _writeControlPacket(self, packet):
 		""" Write the control packet. """
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+from typing import List
+
+from crownstone_core.packets.assetFilter.builders.AssetFilter import AssetFilter
+from crownstone_core.packets.assetFilter.util import AssetFilterMasterCrc
+
+from crownstone_ble.core.container.FilterSyncResult import FilterSyncResult, FilterSyncStatus
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SYNC_CONCURRENCY = 3
+
+# Time in seconds to wait for the filters to propagate via the mesh, before uploading them directly.
+DEFAULT_PROPAGATION_TIMEOUT = 60
+
+# Time in seconds between checks of a Crownstone that doesn't have the filters yet.
+VERIFY_INTERVAL = 5
+
+
+class FilterSyncHandler:
+    """
+    Syncs asset filters to all Crownstones of a sphere.
+
+    The filters are uploaded to a single Crownstone, the other Crownstones get them via the mesh, and are only verified.
+    The last known master version and master CRC of each Crownstone is cached, so Crownstones that are known to be
+    up to date are skipped without connecting.
+    """
+
+    def __init__(self, bluetoothCore):
+        self.core = bluetoothCore
+
+        # Lower case address as key, (masterVersion, masterCrc) as value.
+        self.summaries = {}
+
+
+    def getCachedSummary(self, address: str) -> (int, int) or None:
+        """
+        :returns: The last known (masterVersion, masterCrc) of the Crownstone, or None when unknown.
+        """
+        return self.summaries.get(address.lower(), None)
+
+
+    def clearCache(self, address: str = None):
+        """
+        :param address:   Forget the summary of this address, when None, all summaries are forgotten.
+        """
+        if address is None:
+            self.summaries = {}
+        else:
+            self.summaries.pop(address.lower(), None)
+
+
+    async def sync(self, addresses: List[str], filters: List[AssetFilter], masterVersion: int = None,
+                   useMesh: bool = True, useCache: bool = True,
+                   propagationTimeout: float = DEFAULT_PROPAGATION_TIMEOUT, concurrency: int = DEFAULT_SYNC_CONCURRENCY,
+                   attempts: int = 2, windowSize: int = 1, progressCallback = None) -> List[FilterSyncResult]:
+        """
+        :param addresses:            MAC addresses of the Crownstones to sync.
+        :param filters:              The filters that should be set at every Crownstone.
+        :param masterVersion:        The new master version. If None, the master version of the first uploaded Crownstone is increased by 1.
+        :param useMesh:              When True, the filters are uploaded to one Crownstone, and the others are verified after propagation via the mesh.
+                                     When False, the filters are uploaded to every Crownstone that doesn't have them.
+        :param useCache:             When True, Crownstones of which the cached summary matches the filters are skipped.
+        :param propagationTimeout:   Time in seconds to wait for the mesh, before uploading to a Crownstone directly.
+        :param concurrency:          Maximum number of Crownstones that are connected at the same time.
+        :param attempts:             Number of connection attempts per Crownstone, before it's marked as failed.
+        :param windowSize:           Window size of the filter upload, see ControlHandler.setFilters().
+        :param progressCallback:     Function (result: FilterSyncResult, doneCount: int, totalCount: int), called when a Crownstone is done.
+        :returns:                    A FilterSyncResult per address, in the same order as the addresses.
+        """
+        # This also checks for duplicate filter IDs.
+        masterCrc = AssetFilterMasterCrc.get_master_crc_from_filters(filters)
+        sync = FilterSync(self, addresses, filters, masterVersion, masterCrc, attempts, windowSize, progressCallback)
+
+        remaining = []
+        for result in sync.results:
+            if useCache and self.isUpToDate(self.getCachedSummary(result.address), masterVersion, masterCrc):
+                result.masterVersion, result.masterCrc = self.getCachedSummary(result.address)
+                result.fromCache = True
+                sync.finish(result, FilterSyncStatus.UP_TO_DATE)
+            else:
+                remaining.append(result)
+
+        if not remaining:
+            return sync.results
+
+        # Upload to a single Crownstone first, preferably one we are connected to already.
+        # This also determines the master version, when not given.
+        connected = [address.lower() for address in self.core.ble.getConnectedAddresses()]
+        remaining.sort(key=lambda result: result.address.lower() not in connected)
+        while remaining:
+            await sync.upload(remaining.pop(0))
+            if sync.masterVersion is not None:
+                break
+
+        if sync.masterVersion is None:
+            _LOGGER.warning("Failed to upload the filters to any Crownstone.")
+            return sync.results
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + propagationTimeout
+        async def syncRemaining(result):
+            async with semaphore:
+                if useMesh:
+                    await sync.verify(result, deadline)
+                else:
+                    await sync.upload(result)
+
+        await asyncio.gather(*[syncRemaining(result) for result in remaining])
+        return sync.results
+
+
+    def storeSummary(self, address: str, masterVersion: int, masterCrc: int):
+        self.summaries[address.lower()] = (masterVersion, masterCrc)
+
+
+    @staticmethod
+    def isUpToDate(summary: (int, int) or None, masterVersion: int or None, masterCrc: int) -> bool:
+        if summary is None:
+            return False
+        if masterVersion is not None and summary[0] != masterVersion:
+            return False
+        return summary[1] == masterCrc
+
+
+"""
+Class that holds the state of a single sync() call.
+"""
+class FilterSync:
+
+    def __init__(self, handler: FilterSyncHandler, addresses: List[str], filters: List[AssetFilter], masterVersion: int or None, masterCrc: int,
+                 attempts: int, windowSize: int, progressCallback):
+        self.handler = handler
+        self.core = handler.core
+        self.filters = filters
+        # Set by the first successful upload, when not given.
+        self.masterVersion = masterVersion
+        self.masterCrc = masterCrc
+        self.attempts = attempts
+        self.windowSize = windowSize
+        self.progressCallback = progressCallback
+        self.results = [FilterSyncResult(address) for address in addresses]
+        self.doneCount = 0
+
+
+    def finish(self, result: FilterSyncResult, status: FilterSyncStatus, error: Exception = None):
+        result.status = status
+        result.error = error
+        self.doneCount += 1
+        _LOGGER.info(f"Filter sync of {result.address}: {status} ({self.doneCount}/{len(self.results)})")
+        if self.progressCallback is not None:
+            self.progressCallback(result, self.doneCount, len(self.results))
+
+
+    async def upload(self, result: FilterSyncResult):
+        """
+        Set the filters at the Crownstone of the result.
+        """
+        async def setFilters(connection):
+            summaries = await connection.control.getFilterSummaries()
+            if self.handler.isUpToDate((summaries.masterVersion, summaries.masterCrc), self.masterVersion, self.masterCrc):
+                return summaries.masterVersion, False
+            return await connection.control.setFilters(self.filters, self.masterVersion, windowSize=self.windowSize), True
+
+        try:
+            masterVersion, uploaded = await self._withConnection(result, setFilters)
+        except Exception as err:
+            self.finish(result, FilterSyncStatus.FAILED, err)
+            return
+
+        self.handler.storeSummary(result.address, masterVersion, self.masterCrc)
+        result.masterVersion = masterVersion
+        result.masterCrc = self.masterCrc
+        if self.masterVersion is None:
+            self.masterVersion = masterVersion
+        self.finish(result, FilterSyncStatus.UPLOADED if uploaded else FilterSyncStatus.UP_TO_DATE)
+
+
+    async def verify(self, result: FilterSyncResult, deadline: float):
+        """
+        Check if the filters reached the Crownstone of the result via the mesh, until the deadline.
+        After the deadline, the filters are uploaded directly.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                summaries = await self._withConnection(result, lambda connection: connection.control.getFilterSummaries())
+            except Exception as err:
+                self.finish(result, FilterSyncStatus.FAILED, err)
+                return
+
+            result.masterVersion = summaries.masterVersion
+            result.masterCrc = summaries.masterCrc
+            self.handler.storeSummary(result.address, summaries.masterVersion, summaries.masterCrc)
+            if self.handler.isUpToDate((summaries.masterVersion, summaries.masterCrc), self.masterVersion, self.masterCrc):
+                self.finish(result, FilterSyncStatus.PROPAGATED)
+                return
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(VERIFY_INTERVAL, remaining))
+
+        _LOGGER.info(f"Filters did not propagate to {result.address}, uploading directly.")
+        await self.upload(result)
+
+
+    async def _withConnection(self, result: FilterSyncResult, operation):
+        """
+        Connect, execute the operation with the CrownstoneConnection, and disconnect when we weren't connected before.
+        Retries with a fresh connection, up to the number of attempts.
+        """
+        address = result.address
+        wasConnected = await self.core.ble.is_connected(address) == True
+        attempt = 0
+        while True:
+            attempt += 1
+            result.attempts += 1
+            try:
+                # Crownstones are synced concurrently, keep the default connection of the user.
+                await self.core.connect(address, setDefault=False)
+                returnValue = await operation(self.core.getConnection(address))
+                if not wasConnected:
+                    await self._disconnect(address)
+                return returnValue
+            except Exception as err:
+                _LOGGER.info(f"Filter sync of {address} failed at attempt {attempt}: {err}")
+                await self._disconnect(address)
+                if attempt >= self.attempts:
+                    raise err
+
+
+    async def _disconnect(self, address):
+        try:
+            await self.core.ble.disconnect(address)
+        except Exception as err:
+            _LOGGER.debug(f"Failed to disconnect from {address}: {err}")
@@ -1,4 +1,5 @@
 import logging
+import time
 
 from crownstone_core.packets.microapp.MicroappHeaderPacket import MicroappHeaderPacket
 from crownstone_core.packets.microapp.MicroappInfoPacket import MicroappInfoPacket
@@ -6,10 +7,18 @@ from crownstone_core.packets.microapp.MicroappMessagePacket import MicroappMessa
 from crownstone_core.packets.microapp.MicroappUploadPacket import MicroappUploadPacket
 from crownstone_core.protocol.BlePackets import ControlPacket
 from crownstone_core.protocol.BluenetTypes import ControlType
-from crownstone_ble.core.ble_modules.ControlHandler import ControlHandler
+from crownstone_ble.core.ble_modules.ControlHandler import ControlHandler, ATT_HEADER_SIZE, ENCRYPTION_HEADER_SIZE
+from crownstone_ble.core.modules.MicroappUpload import MicroappUpload
 
 _LOGGER = logging.getLogger(__name__)
 
+# Number of chunks of uploadMicroappResumable() that can wait for their result.
+DEFAULT_UPLOAD_WINDOW_SIZE = 4
+
+# Bytes of a microapp upload write within the encrypted blocks that are not chunk data:
+# validation key (4), control header (5), microapp header (2), offset (2).
+MICROAPP_CHUNK_OVERHEAD = 4 + 5 + 2 + 2
+
 
 class MicroappHandler:
     def __init__(self, control: ControlHandler):
@@ -37,6 +46,79 @@ class MicroappHandler:
                 chunk.extend((4 - (len(chunk) % 4)) * [0xFF])
             await self._uploadMicroappChunk(index, protocol, chunk, i)
 
+    async def uploadMicroappResumable(self, upload: MicroappUpload, windowSize: int = DEFAULT_UPLOAD_WINDOW_SIZE, skipIdentical: bool = True, progressCallback = None) -> MicroappUpload:
+        """
+        Upload a microapp, continuing from the checkpoint of the upload.
+        When this raises, for example because the connection was lost, call it again with the same upload after reconnecting.
+
+        Up to windowSize chunks are written without waiting for their result. Chunks that fail, or that get a BUSY result, are written again.
+
+        :param upload:             The upload, which keeps the checkpoint and throughput.
+        :param windowSize:         Maximum number of chunks waiting for their result.
+        :param skipIdentical:      When True, nothing is uploaded when the Crownstone already has this microapp at the app index.
+        :param progressCallback:   Function (upload: MicroappUpload), called when the checkpoint advanced.
+        :returns:                  The upload.
+        """
+        info = await self.getMicroappInfo()
+        if skipIdentical and upload.index < len(info.appsStatus) and upload.isIdentical(info.appsStatus[upload.index]):
+            _LOGGER.info(f"Microapp at index {upload.index} is identical, skip upload.")
+            upload.acknowledgedOffset = len(upload.data)
+            upload.skipped = True
+            return upload
+
+        chunkSize = upload.chunkSize
+        if chunkSize is None:
+            chunkSize = self.getUploadChunkSize(info.maxChunkSize)
+        chunks = upload.getChunks(chunkSize)
+        _LOGGER.info(f"Upload microapp index={upload.index} from offset={upload.acknowledgedOffset} in {len(chunks)} chunks of {chunkSize} bytes")
+
+        # Chunks are acknowledged out of order when some are retransmitted, the checkpoint only covers the chunks before the first gap.
+        acknowledged = [False] * len(chunks)
+        nextChunk = 0
+        def onChunkAcknowledged(chunkIndex, resultPacket):
+            nonlocal nextChunk
+            acknowledged[chunkIndex] = True
+            upload.bytesUploaded += len(chunks[chunkIndex][1])
+            if chunkIndex != nextChunk:
+                return
+            while nextChunk < len(chunks) and acknowledged[nextChunk]:
+                nextChunk += 1
+            if nextChunk < len(chunks):
+                upload.acknowledgedOffset = chunks[nextChunk][0]
+            else:
+                upload.acknowledgedOffset = len(upload.data)
+            if progressCallback is not None:
+                progressCallback(upload)
+
+        header = MicroappHeaderPacket(appIndex=upload.index, protocol=upload.protocol)
+        packets = [ControlPacket(ControlType.MICROAPP_UPLOAD).loadByteArray(MicroappUploadPacket(header, offset, chunk).serialize()).serialize() for offset, chunk in chunks]
+        upload.bytesUploaded = 0
+        upload.startTime = time.perf_counter()
+        try:
+            await self.control._writeControlPacketsPipelined(packets, windowSize, successCallback=onChunkAcknowledged)
+        finally:
+            upload.duration = time.perf_counter() - upload.startTime
+            upload.startTime = None
+            _LOGGER.info(f"Uploaded {upload.bytesUploaded} bytes in {upload.duration:.2f} s: {upload.getBytesPerSecond():.0f} bytes/s, checkpoint at offset {upload.acknowledgedOffset}")
+        return upload
+
+    def getUploadChunkSize(self, maxChunkSize: int = 0) -> int:
+        """
+        Get the largest microapp chunk size, for which an upload command fits in a single write at the MTU of the connection.
+        When that's smaller than MAX_CHUNK_SIZE, MAX_CHUNK_SIZE is returned. This is also the case when the MTU is unknown,
+        like on platforms other than BlueZ 5.62 or newer, see BleHandler.getMtu().
+
+        :param maxChunkSize:   The maximum chunk size of the Crownstone, from getMicroappInfo(), 0 when unknown.
+        """
+        mtu = self.control.core.ble.getMtu(self.control.address)
+        # The encrypted part is padded to a multiple of the AES block size, the chunk size must be a multiple of 4.
+        encryptedSize = (mtu - ATT_HEADER_SIZE - ENCRYPTION_HEADER_SIZE) // 16 * 16
+        chunkSize = (encryptedSize - MICROAPP_CHUNK_OVERHEAD) // 4 * 4
+        chunkSize = max(chunkSize, MicroappHandler.MAX_CHUNK_SIZE)
+        if maxChunkSize > 0:
+            chunkSize = min(chunkSize, maxChunkSize // 4 * 4)
+        return chunkSize
+
     async def _uploadMicroappChunk(self, index: int, protocol: int, data: bytearray, offset: int):
         _LOGGER.info(f"Upload microapp chunk index={index} offset={offset} size={len(data)}")
         header = MicroappHeaderPacket(appIndex=index, protocol=protocol)
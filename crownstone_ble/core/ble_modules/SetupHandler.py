@@ -19,33 +19,34 @@ class SetupHandler:
     async def setup(self, address, sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor):
         await self.core.ble.connect(address)
         try:
-            await self.fastSetupV2(sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor)
+            await self.fastSetupV2(sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor, address)
         except CrownstoneBleException as e:
             if e.type is not BleError.NOTIFICATION_STREAM_TIMEOUT:
                 raise e
 
         # Disconnect before scanning.
-        await self.core.ble.waitForPeripheralToDisconnect()
+        await self.core.ble.waitForPeripheralToDisconnect(address=address)
 
 
-    async def fastSetupV2(self, sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor):
+    async def fastSetupV2(self, sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor, address: str = None):
         if not self.core.settings.initializedKeys:
             raise CrownstoneBleException(BleError.NO_ENCRYPTION_KEYS_SET, "Keys are not initialized so I can't put anything on the Crownstone. Make sure you call .setSettings(adminKey, memberKey, basicKey, serviceDataKey, localizationKey, meshApplicationKey, meshNetworkKey")
 
-        await self.handleSetupPhaseEncryption()
+        await self.handleSetupPhaseEncryption(address)
         await self.core.ble.setupNotificationStream(
             CSServices.SetupService,
             SetupCharacteristics.Result,
-            lambda: self._writeFastSetupV2(sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor),
+            lambda: self._writeFastSetupV2(sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor, address),
             lambda notificationResult: self._handleResult(notificationResult),
-            3
+            3,
+            address
         )
 
         _LOGGER.info("Closing setup.")
-        self.core.settings.exitSetup()
+        self.core.ble.getSettings(address).exitSetup()
 
 
-    async def _writeFastSetupV2(self, sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor):
+    async def _writeFastSetupV2(self, sphereId, crownstoneId, meshDeviceKey, ibeaconUUID, ibeaconMajor, ibeaconMinor, address: str = None):
         packet = ControlPacketsGenerator.getSetupPacket(
             crownstoneId,
             sphereId,
@@ -63,7 +64,7 @@ class SetupHandler:
         )
 
         _LOGGER.info("Writing setup data to Crownstone...")
-        await self.core.ble.writeToCharacteristic(CSServices.SetupService, SetupCharacteristics.SetupControl, packet)
+        await self.core.ble.writeToCharacteristic(CSServices.SetupService, SetupCharacteristics.SetupControl, packet, address)
 
     def _handleResult(self, result):
         if result is None:
@@ -86,10 +87,11 @@ class SetupHandler:
             return ProcessType.ABORT_ERROR
 
 
-    async def handleSetupPhaseEncryption(self):
-        sessionKey         = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.SetupService, SetupCharacteristics.SessionKey)
-        sessionNoncePacket = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.SetupService, SetupCharacteristics.SessionData)
+    async def handleSetupPhaseEncryption(self, address: str = None):
+        sessionKey         = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.SetupService, SetupCharacteristics.SessionKey, address)
+        sessionNoncePacket = await self.core.ble.readCharacteristicWithoutEncryption(CSServices.SetupService, SetupCharacteristics.SessionData, address)
 
-        self.core.settings.loadSetupKey(sessionKey)
-        ProcessSessionNoncePacket(sessionNoncePacket, sessionKey, self.core.settings)
+        settings = self.core.ble.getSettings(address)
+        settings.loadSetupKey(sessionKey)
+        ProcessSessionNoncePacket(sessionNoncePacket, sessionKey, settings)
 
@@ -1,3 +1,5 @@
+import time
+
 from crownstone_core import Conversion
 from crownstone_core.Exceptions import CrownstoneError, CrownstoneException
 from crownstone_core.packets.ResultPacket import ResultPacket
@@ -7,53 +9,89 @@ from crownstone_core.protocol.BlePackets import ControlStateGetPacket, ControlSt
 from crownstone_core.protocol.BluenetTypes import StateType, ResultValue
 from crownstone_core.protocol.SwitchState import SwitchState
 
+from crownstone_ble.core.container.StateSnapshot import StateSnapshot
+
+# Functions that parse the value of a state type (the state payload without state type and ID).
+# Values of other state types are kept as list of bytes.
+STATE_PARSERS = {
+    StateType.SWITCH_STATE:  lambda stateVal: SwitchState(stateVal[0]),
+    StateType.TIME:          lambda stateVal: Conversion.uint8_array_to_uint32(stateVal),
+    StateType.PWM_ALLOWED:   lambda stateVal: stateVal[0] != 0,
+    StateType.SWITCH_LOCKED: lambda stateVal: stateVal[0] != 0,
+    StateType.POWER_USAGE:   lambda stateVal: Conversion.uint8_array_to_int32(stateVal) / 1000.0,
+    StateType.ERROR_BITMASK: lambda stateVal: AdvCrownstoneErrorBitmask(Conversion.uint8_array_to_uint32(stateVal)),
+    StateType.TEMPERATURE:   lambda stateVal: Conversion.uint8_to_int8(stateVal[0]),
+}
+
+DEFAULT_STATES_WINDOW_SIZE = 4
+
 
 class StateHandler:
-    def __init__(self, bluetoothCore):
+    def __init__(self, bluetoothCore, address: str = None):
+        """
+        :param address:    MAC address of the connection to use, when None, the last connected Crownstone is used.
+        """
         self.core = bluetoothCore
+        self.address = address
         
     async def getSwitchState(self) -> SwitchState:
-        stateVal = await self._getState(StateType.SWITCH_STATE)
-        return SwitchState(stateVal[0])
+        return await self._getParsedState(StateType.SWITCH_STATE)
 
     async def getTime(self) -> int:
         """
         :returns: posix timestamp (uint32)
         """
-        stateVal = await self._getState(StateType.TIME)
-        return Conversion.uint8_array_to_uint32(stateVal)
+        return await self._getParsedState(StateType.TIME)
 
     async def getDimmingAllowed(self) -> bool:
-        stateVal = await self._getState(StateType.PWM_ALLOWED)
-        # TODO: convert to uint8?
-        return stateVal[0] != 0
+        return await self._getParsedState(StateType.PWM_ALLOWED)
 
     async def getSwitchLocked(self) -> bool:
-        stateVal = await self._getState(StateType.SWITCH_LOCKED)
-        # TODO: convert to uint8?
-        return stateVal[0] != 0
+        return await self._getParsedState(StateType.SWITCH_LOCKED)
 
     async def getPowerUsage(self) -> float:
         """
         :returns: Power usage in Watt.
         """
-        stateVal = await self._getState(StateType.POWER_USAGE)
-        powerUsage = Conversion.uint8_array_to_int32(stateVal) / 1000.0
-        return powerUsage
+        return await self._getParsedState(StateType.POWER_USAGE)
 
     async def getErrors(self) -> AdvCrownstoneErrorBitmask:
         """
         :returns: Errors
         """
-        stateVal = await self._getState(StateType.ERROR_BITMASK)
-        return AdvCrownstoneErrorBitmask(Conversion.uint8_array_to_uint32(stateVal))
+        return await self._getParsedState(StateType.ERROR_BITMASK)
 
     async def getChipTemperature(self) -> float:
         """
         :returns: Chip temperature in °C.
         """
-        stateVal = await self._getState(StateType.TEMPERATURE)
-        return Conversion.uint8_to_int8(stateVal[0])
+        return await self._getParsedState(StateType.TEMPERATURE)
+
+    async def getStates(self, stateTypes: list, windowSize: int = DEFAULT_STATES_WINDOW_SIZE) -> StateSnapshot:
+        """
+        Get many states at once. The get state commands are pipelined: up to windowSize commands are written without
+        waiting for their result. States that fail are put in the errors of the snapshot, instead of raising.
+
+        :param stateTypes:   List of StateType. Values of the types in STATE_PARSERS are parsed like the get functions
+                             do, for example SWITCH_STATE gives a SwitchState. Other values are a list of bytes.
+        :param windowSize:   Maximum number of commands waiting for their result.
+        """
+        # Remove duplicates, but keep the order.
+        stateTypes = list(dict.fromkeys(stateTypes))
+        snapshot = StateSnapshot(self.address or self.core.ble.defaultAddress)
+        snapshot.timestamp = time.time()
+        controlPackets = [ControlStateGetPacket(stateType).serialize() for stateType in stateTypes]
+        results, error = await self.core.control._writeControlPacketsAndGetResults(controlPackets, windowSize)
+        for stateType, resultPacket in zip(stateTypes, results):
+            try:
+                if resultPacket is None:
+                    raise CrownstoneException(CrownstoneError.RESULT_NOT_SUCCESS, f"No result: {error}")
+                if resultPacket.resultCode != ResultValue.SUCCESS:
+                    raise CrownstoneException(CrownstoneError.RESULT_NOT_SUCCESS, f"Result code is {resultPacket.resultCode}")
+                snapshot.values[stateType] = self._parseState(stateType, self._getStateValue(resultPacket))
+            except Exception as err:
+                snapshot.errors[stateType] = str(err)
+        return snapshot
 
 
 
@@ -68,7 +106,17 @@ class StateHandler:
         :param stateType: StateType
         """
         resultPacket = await self.core.control._writeControlAndGetResult(ControlStateGetPacket(stateType).serialize())
+        return self._getStateValue(resultPacket)
+
+    async def _getParsedState(self, stateType):
+        return self._parseState(stateType, await self._getState(stateType))
+
+    def _parseState(self, stateType, stateVal: list):
+        if stateType in STATE_PARSERS:
+            return STATE_PARSERS[stateType](stateVal)
+        return stateVal
 
+    def _getStateValue(self, resultPacket: ResultPacket) -> list:
         # The payload of the resultPacket is padded with stateType and ID at the beginning
         # TODO: write a packet for this.
         state = []
@@ -1,42 +1,212 @@
+import sys
+from collections import OrderedDict
+
 from crownstone_core.Enums import CrownstoneOperationMode
 from crownstone_core.protocol.Services import DFU_ADVERTISEMENT_SERVICE_UUID
 
 from crownstone_core.packets.Advertisement import Advertisement
 
 from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.modules.BatchDecryptor import BatchDecryptor, AES_BLOCK_SIZE
 from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
 
 SERVICE_DATA_ADTYPE = 22
 NAME_ADTYPE         = 8
 FLAGS_ADTYPE        = 1
 
+# Number of parsed advertisements to keep, so repeated service data doesn't have to be decrypted again.
+DEFAULT_PARSE_CACHE_SIZE = 2048
+# Number of normalized addresses to keep.
+ADDRESS_CACHE_SIZE = 4096
+
+# Size of the service data of normal mode advertisements: opcode, device type, and an encrypted block.
+SERVICE_DATA_SIZE = 2 + AES_BLOCK_SIZE
+SERVICE_DATA_OPCODE_ENCRYPTED = 7
+
+batchDecryptor = BatchDecryptor()
+
+
+def parseAdvertisement(address, rssi, nameText, serviceDataArray, serviceUUID, serviceDataKey) -> Advertisement or None:
+    """
+    Parse and decrypt an advertisement. This is a module level function, so it can also run in a worker process.
+    :returns: The Advertisement, or None when it's not of the Crownstone family.
+    """
+    return parseAdvertisements([(address, rssi, nameText, serviceDataArray, serviceUUID)], serviceDataKey)[0]
+
+
+def parseAdvertisements(payloads: list, serviceDataKey) -> list:
+    """
+    Parse and decrypt a batch of advertisements.
+    The encrypted blocks of the normal mode service data are decrypted in one call, see BatchDecryptor.
+    Other advertisements, like setup mode ones, are parsed by crownstone_core as usual.
+    :param payloads:         List of (address, rssi, nameText, serviceDataArray, serviceUUID) tuples.
+    :param serviceDataKey:   The key to decrypt the service data with.
+    :returns:                List with the Advertisement of each payload, None when it's not of the Crownstone family.
+    """
+    encryptedIndices = []
+    if serviceDataKey is not None and len(serviceDataKey) >= AES_BLOCK_SIZE:
+        for i, (address, rssi, nameText, serviceDataArray, serviceUUID) in enumerate(payloads):
+            if serviceUUID == 0xC001 and len(serviceDataArray) == SERVICE_DATA_SIZE and serviceDataArray[0] == SERVICE_DATA_OPCODE_ENCRYPTED:
+                encryptedIndices.append(i)
+    decryptedBlocks = batchDecryptor.decryptBlocks([payloads[i][3][2:] for i in encryptedIndices], serviceDataKey)
+
+    advertisements = [None] * len(payloads)
+    for i, decryptedBlock in zip(encryptedIndices, decryptedBlocks):
+        address, rssi, nameText, serviceDataArray, serviceUUID = payloads[i]
+        advertisement = Advertisement(address, rssi, nameText, list(serviceDataArray[0:2]) + list(decryptedBlock), serviceUUID)
+        advertisement.serviceData.decrypted = True
+        try:
+            advertisement.parse()
+        except:
+            # fail silently. If we can't parse this, we just to propagate this message
+            pass
+        advertisements[i] = advertisement
+
+    decrypted = set(encryptedIndices)
+    for i, (address, rssi, nameText, serviceDataArray, serviceUUID) in enumerate(payloads):
+        if i in decrypted:
+            continue
+        advertisement = Advertisement(address, rssi, nameText, serviceDataArray, serviceUUID)
+        if not advertisement.isCrownstoneFamily():
+            continue
+        if advertisement.operationMode == CrownstoneOperationMode.SETUP:
+            advertisement.parse()
+        else:
+            try:
+                advertisement.parse(serviceDataKey)
+            except:
+                # fail silently. If we can't parse this, we just to propagate this message
+                pass
+        advertisements[i] = advertisement
+    return advertisements
+
+
+def _shallowCopy(obj):
+    """
+    Copy the attributes of an object into a new one, faster than copy.copy().
+    """
+    objCopy = object.__new__(type(obj))
+    objCopy.__dict__.update(obj.__dict__)
+    return objCopy
+
+
+def copyAdvertisement(advertisement: Advertisement) -> Advertisement:
+    """
+    Copy a parsed advertisement, with its service data and payload, so the copy can be modified without changing the original.
+    The values of the payload, like its switchState and flags, are shared.
+    """
+    advertisementCopy = _shallowCopy(advertisement)
+    if advertisement.serviceData is not None:
+        advertisementCopy.serviceData = _shallowCopy(advertisement.serviceData)
+        if advertisement.serviceData.payload is not None:
+            advertisementCopy.serviceData.payload = _shallowCopy(advertisement.serviceData.payload)
+    return advertisementCopy
+
+
 class BleakScanDelegate:
 
-    def __init__(self, settings):
+    def __init__(self, settings, cacheSize: int = DEFAULT_PARSE_CACHE_SIZE):
         self.settings = settings
 
+        # Parsed advertisements, with (address, service UUID, raw service data) as key.
+        # Ordered from least recently used to most recently used.
+        self.cache = OrderedDict()
+        self.cacheSize = cacheSize
+        self.cacheServiceDataKey = None
+        self.cacheHits = 0
+        self.cacheMisses = 0
+
+        # Address as received from bleak as key, normalized address as value.
+        self.normalizedAddresses = {}
+
+        # AdvertisementRecorder that gets all payloads, or None when not recording.
+        self.recorder = None
+
+        # AdvertisementDecoder that parses the payloads in workers, or None to parse them in the detection callback.
+        self.decoder = None
+
+
+    def normalizeAddress(self, address: str) -> str:
+        """
+        Get the lower case, interned, address. So the rest of the library can use it as key without converting it again.
+        """
+        normalizedAddress = self.normalizedAddresses.get(address, None)
+        if normalizedAddress is None:
+            if len(self.normalizedAddresses) >= ADDRESS_CACHE_SIZE:
+                self.normalizedAddresses.clear()
+            normalizedAddress = sys.intern(address.lower())
+            self.normalizedAddresses[address] = normalizedAddress
+        return normalizedAddress
+
     def handleDiscovery(self, device, advertisement_data):
         serviceData = advertisement_data.service_data
         for serviceUUID, serviceData in serviceData.items():
             longUUID = serviceUUID
             if "0000c001-0000-1000-8000-00805f9b34fb" in longUUID:
                 shortUUID = int(longUUID[4:8], 16)
-                self.parsePayload(device.address, device.rssi, device.name, list(serviceData), shortUUID)
+                self.parsePayload(self.normalizeAddress(device.address), device.rssi, device.name, list(serviceData), shortUUID)
             elif DFU_ADVERTISEMENT_SERVICE_UUID in longUUID:
-                self.parsePayload(device.address, device.rssi, device.name, list(serviceData), DFU_ADVERTISEMENT_SERVICE_UUID)
+                self.parsePayload(self.normalizeAddress(device.address), device.rssi, device.name, list(serviceData), DFU_ADVERTISEMENT_SERVICE_UUID)
 
 
     def parsePayload(self, address, rssi, nameText, serviceDataArray, serviceUUID):
-        advertisement = Advertisement(address, rssi, nameText, serviceDataArray, serviceUUID)
-        if advertisement.isCrownstoneFamily():
-            if advertisement.operationMode == CrownstoneOperationMode.SETUP:
-                advertisement.parse()
-                BleEventBus.emit(SystemBleTopics.rawAdvertisementClass, advertisement)
-            else:
-                try:
-                    advertisement.parse(self.settings.serviceDataKey)
-                except:
-                    # fail silently. If we can't parse this, we just to propagate this message
-                    pass
+        if self.recorder is not None:
+            self.recorder.record(address, rssi, nameText, serviceDataArray, serviceUUID)
 
+        if self.cacheServiceDataKey is not self.settings.serviceDataKey:
+            # The parsed advertisements depend on the key.
+            self.clearCache()
+            self.cacheServiceDataKey = self.settings.serviceDataKey
+
+        cacheKey = (address, serviceUUID, bytes(serviceDataArray))
+        cachedAdvertisement = self.cache.get(cacheKey, None)
+        if cachedAdvertisement is not None:
+            self.cacheHits += 1
+            self.cache.move_to_end(cacheKey)
+            # Only the rssi and name can differ. The cached advertisement is copied, so handlers that modify it don't change the cache.
+            advertisement = copyAdvertisement(cachedAdvertisement)
+            advertisement.rssi = rssi
+            advertisement.name = nameText
+            if self.decoder is not None:
+                # Emitted after the advertisements that are still being decoded.
+                self.decoder.post(advertisement)
+            else:
                 BleEventBus.emit(SystemBleTopics.rawAdvertisementClass, advertisement)
+            return
+
+        self.cacheMisses += 1
+        if self.decoder is not None:
+            self.decoder.submit(cacheKey, (address, rssi, nameText, serviceDataArray, serviceUUID))
+            return
+
+        advertisement = parseAdvertisement(address, rssi, nameText, serviceDataArray, serviceUUID, self.settings.serviceDataKey)
+        if advertisement is not None:
+            self._addToCache(cacheKey, advertisement)
+            BleEventBus.emit(SystemBleTopics.rawAdvertisementClass, advertisement)
+
+
+    def emitAdvertisement(self, advertisement):
+        BleEventBus.emit(SystemBleTopics.rawAdvertisementClass, advertisement)
+
+
+    def cacheDecodedAdvertisement(self, cacheKey, advertisement, serviceDataKey):
+        """
+        Cache an advertisement that was decoded by the decoder, unless the key changed in the meantime.
+        """
+        if serviceDataKey is self.cacheServiceDataKey:
+            self._addToCache(cacheKey, advertisement)
+
+
+    def _addToCache(self, cacheKey, advertisement):
+        # A copy is cached, as the advertisement itself is emitted.
+        self.cache[cacheKey] = copyAdvertisement(advertisement)
+        if len(self.cache) > self.cacheSize:
+            self.cache.popitem(last=False)
+
+
+    def clearCache(self):
+        self.cache.clear()
+
+
+    def getCacheStatistics(self) -> dict:
+        return {"size": len(self.cache), "hits": self.cacheHits, "misses": self.cacheMisses}
@@ -11,12 +11,14 @@ class NotificationDelegate:
     """
     Merges notifications and decrypts the merged data.
     The decrypted data is then placed in the "result" variable.
+
+    The parts are appended to a single bytearray, without intermediate copies, and passed as such to the decryption.
     """
 
     def __init__(self, callback, settings):
         self.callback = callback
         self.previousPart = -1 # Start at -1, so that we can check if received part > previous part
-        self.dataCollected = []
+        self.dataCollected = bytearray()
         self.result = None
         self.settings = settings
 
@@ -27,30 +29,36 @@ class NotificationDelegate:
         part = data[0]
 
         if self.result is not None:
-            _LOGGER.debug(f"Last part already received, ignoring this part.")
+            _LOGGER.debug("Last part already received, ignoring this part.")
             return
 
         # Ignore the case where we receive the same part twice.
         if part == self.previousPart:
-            _LOGGER.debug(f"Already received part {part}, ignoring this part.")
+            _LOGGER.debug("Already received part %s, ignoring this part.", part)
             return
 
         # Check the part number.
         if part != LAST_PACKET_INDEX and part != self.previousPart + 1:
-            _LOGGER.debug(f"Receive part {part}, expected part {self.previousPart + 1}")
+            _LOGGER.debug("Receive part %s, expected part %s", part, self.previousPart + 1)
             self.reset()
             return
         self.previousPart = part
 
-        self.dataCollected += data[1:]
-        _LOGGER.debug(f"Received part {part}")
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            # Extend via a memoryview, so the slice is not copied first.
+            self.dataCollected += memoryview(data)[1:]
+        else:
+            # Like a list of ints.
+            self.dataCollected += bytes(data[1:])
+        _LOGGER.debug("Received part %s", part)
 
-        if data[0] == LAST_PACKET_INDEX:
-            _LOGGER.debug(f"Received last part. Merged data: {self.dataCollected}")
+        if part == LAST_PACKET_INDEX:
+            # The arguments are only formatted when debug logging is enabled.
+            _LOGGER.debug("Received last part. Merged data: %s", self.dataCollected)
             result = self.checkPayload()
             self.reset()
             self.result = result
-            _LOGGER.debug(f"Result: {result}")
+            _LOGGER.debug("Result: %s", result)
             if self.callback is not None:
                 self.callback()
 
@@ -62,5 +70,5 @@ class NotificationDelegate:
 
     def reset(self):
         self.previousPart = -1
-        self.dataCollected = []
+        self.dataCollected = bytearray()
         self.result = None
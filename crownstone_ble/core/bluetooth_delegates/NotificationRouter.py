@@ -0,0 +1,76 @@
+import asyncio
+import logging
+
+from crownstone_ble.core.bluetooth_delegates.NotificationDelegate import NotificationDelegate
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class NotificationRouter:
+    """
+    Long-lived listener for the notifications of one characteristic of a connection, like the result characteristic.
+
+    The notifications are merged and decrypted by a single NotificationDelegate, and the merged results are routed to
+    the active request. Requests take turns in the order they started: the next request becomes active when the previous
+    one is finished, so results of concurrent commands on the same connection never get mixed up.
+
+    Use it like:
+        results = await router.startRequest()
+        try:
+            await writeCommand()
+            result = await results.get()
+        finally:
+            router.finishRequest()
+    """
+
+    def __init__(self, client, characteristicUuid: str):
+        """
+        :param client:               The ActiveClient of the connection.
+        :param characteristicUuid:   UUID of the characteristic to subscribe to.
+        """
+        self.client = client
+        self.characteristicUuid = characteristicUuid
+        self.delegate = NotificationDelegate(self._onMergedNotification, client.settings)
+        self.subscribed = False
+
+        # The lock is fair, so waiting requests are activated in order.
+        self.lock = asyncio.Lock()
+
+        # Queue with the merged results of the active request, None when there is no active request.
+        self.results = None
+
+    async def startRequest(self) -> asyncio.Queue:
+        """
+        Wait for the previous requests to finish, and make this request the active one.
+        Subscribes to the characteristic, when not done yet.
+        :returns: Queue that gets the merged results, a result is None when it could not be decrypted.
+        """
+        await self.lock.acquire()
+        try:
+            if not self.subscribed:
+                await self.client.subscribeNotifications(self.characteristicUuid, self.delegate.handleNotification)
+                self.subscribed = True
+        except BaseException:
+            self.lock.release()
+            raise
+
+        # Drop parts of a result that was not complete when the previous request finished.
+        self.delegate.reset()
+        self.delegate.settings = self.client.settings
+        self.results = asyncio.Queue()
+        return self.results
+
+    def finishRequest(self):
+        """
+        Finish the active request, so the next request can start.
+        """
+        self.results = None
+        self.lock.release()
+
+    def _onMergedNotification(self):
+        result = self.delegate.result
+        self.delegate.reset()
+        if self.results is None:
+            _LOGGER.debug("No active request for notification of %s, ignoring it.", self.characteristicUuid)
+            return
+        self.results.put_nowait(result)
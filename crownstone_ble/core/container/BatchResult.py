@@ -0,0 +1,18 @@
+class BatchResult:
+
+    def __init__(self, address):
+        self.address  = address
+        self.success  = False
+        self.result   = None    # return value of the operation, or the ResultPacket of the control packet.
+        self.error    = None    # the last exception, when not successful.
+        self.attempts = 0
+        self.viaMesh  = False
+
+    def __str__(self):
+        return \
+           f"address:       {self.address  }\n" \
+           f"success:       {self.success  }\n" \
+           f"result:        {self.result   }\n" \
+           f"error:         {self.error    }\n" \
+           f"attempts:      {self.attempts }\n" \
+           f"viaMesh:       {self.viaMesh  }\n"
@@ -0,0 +1,40 @@
+class DeviceRecord:
+    __slots__ = ("address", "name", "operationMode", "deviceType", "validated", "firstSeen", "lastSeen",
+                 "advertisementCount", "advertisementRate", "rssi", "rssiAverage", "rssiWindow", "rssiWindowSum", "scanData")
+
+    def __init__(self, address):
+        self.address            = address
+        self.name               = None
+        self.operationMode      = None
+        self.deviceType         = None
+        self.validated          = False
+        self.firstSeen          = None    # time.time() of the first advertisement.
+        self.lastSeen           = None    # time.time() of the last advertisement.
+        self.advertisementCount = 0
+        self.advertisementRate  = None    # exponential moving average, in advertisements per second.
+        self.rssi               = None    # RSSI of the last advertisement with a valid RSSI.
+        self.rssiAverage        = None    # exponential moving average of the RSSI.
+        self.rssiWindow         = None    # deque with the last RSSI values.
+        self.rssiWindowSum      = 0
+        self.scanData           = None    # ScanData of the last advertisement.
+
+    def getRssiWindowAverage(self) -> float or None:
+        """
+        :returns: The average of the last RSSI values, or None when no valid RSSI has been received.
+        """
+        if not self.rssiWindow:
+            return None
+        return self.rssiWindowSum / len(self.rssiWindow)
+
+    def __str__(self):
+        return \
+           f"address:            {self.address            }\n" \
+           f"name:               {self.name               }\n" \
+           f"operationMode:      {self.operationMode      }\n" \
+           f"validated:          {self.validated          }\n" \
+           f"lastSeen:           {self.lastSeen           }\n" \
+           f"advertisementCount: {self.advertisementCount }\n" \
+           f"advertisementRate:  {self.advertisementRate  }\n" \
+           f"rssi:               {self.rssi               }\n" \
+           f"rssiAverage:        {self.rssiAverage        }\n" \
+           f"rssiWindowAverage:  {self.getRssiWindowAverage()}\n"
@@ -0,0 +1,74 @@
+class Diagnostics:
+
+    def __init__(self, address):
+        self.address           = address
+        self.timestamp         = None    # time.time() at which the diagnostics were collected.
+        self.hardwareVersion   = None
+        self.firmwareVersion   = None
+        self.bootloaderVersion = None
+        self.uptime            = None    # seconds.
+        self.adcRestarts       = None    # AdcRestartsPacket
+        self.adcChannelSwaps   = None    # AdcChannelSwapsPacket
+        self.switchHistory     = None    # SwitchHistoryListPacket
+        self.powerSamples      = {}      # PowerSamplesType as key, list of PowerSamplesPacket as value.
+        self.errors            = {}      # name of the item that failed as key, error message as value.
+
+    def toDict(self) -> dict:
+        """
+        :returns: The diagnostics as dict, that can be serialized to JSON.
+        """
+        def countAndTimestamp(packet):
+            if packet is None:
+                return None
+            return {"count": packet.count, "timestamp": packet.timestamp}
+
+        switchHistory = None
+        if self.switchHistory is not None:
+            switchHistory = [{
+                "timestamp":     item.timestamp,
+                "switchCommand": item.switchCommand,
+                "switchState":   item.switchState.raw,
+                "sourceType":    item.source.sourceType.name,
+                "sourceId":      int(item.source.sourceId),
+                "viaMesh":       item.source.viaMesh,
+            } for item in self.switchHistory.list]
+
+        powerSamples = {}
+        for samplesType, packets in self.powerSamples.items():
+            powerSamples[samplesType.name] = [{
+                "index":            packet.index,
+                "timestamp":        packet.timestamp,
+                "delayUs":          packet.delayUs,
+                "sampleIntervalUs": packet.sampleIntervalUs,
+                "offset":           packet.offset,
+                "multiplier":       packet.multiplier,
+                "samples":          packet.samples,
+            } for packet in packets]
+
+        return {
+            "address":           self.address,
+            "timestamp":         self.timestamp,
+            "hardwareVersion":   self.hardwareVersion,
+            "firmwareVersion":   self.firmwareVersion,
+            "bootloaderVersion": self.bootloaderVersion,
+            "uptime":            self.uptime,
+            "adcRestarts":       countAndTimestamp(self.adcRestarts),
+            "adcChannelSwaps":   countAndTimestamp(self.adcChannelSwaps),
+            "switchHistory":     switchHistory,
+            "powerSamples":      powerSamples,
+            "errors":            self.errors,
+        }
+
+    def __str__(self):
+        return \
+           f"address:           {self.address           }\n" \
+           f"timestamp:         {self.timestamp         }\n" \
+           f"hardwareVersion:   {self.hardwareVersion   }\n" \
+           f"firmwareVersion:   {self.firmwareVersion   }\n" \
+           f"bootloaderVersion: {self.bootloaderVersion }\n" \
+           f"uptime:            {self.uptime            }\n" \
+           f"adcRestarts:       {self.adcRestarts       }\n" \
+           f"adcChannelSwaps:   {self.adcChannelSwaps   }\n" \
+           f"switchHistory:     {self.switchHistory     }\n" \
+           f"powerSamples:      {sum(len(packets) for packets in self.powerSamples.values())} packets\n" \
+           f"errors:            {self.errors            }\n"
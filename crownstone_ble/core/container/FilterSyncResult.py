@@ -0,0 +1,30 @@
+from enum import Enum
+
+
+class FilterSyncStatus(Enum):
+    UP_TO_DATE = "UP_TO_DATE"    # The Crownstone already had the filters.
+    UPLOADED   = "UPLOADED"      # The filters were uploaded to the Crownstone.
+    PROPAGATED = "PROPAGATED"    # The Crownstone was verified to have the filters, after they were uploaded to another Crownstone.
+    FAILED     = "FAILED"
+
+
+class FilterSyncResult:
+
+    def __init__(self, address):
+        self.address       = address
+        self.status        = None    # FilterSyncStatus, None while the Crownstone is not synced yet.
+        self.masterVersion = None    # last known master version of the Crownstone.
+        self.masterCrc     = None    # last known master CRC of the Crownstone.
+        self.fromCache     = False   # True when the status is based on the cached summary, without connecting.
+        self.error         = None    # the last exception, when failed.
+        self.attempts      = 0       # number of connections made to the Crownstone.
+
+    def __str__(self):
+        return \
+           f"address:       {self.address       }\n" \
+           f"status:        {self.status        }\n" \
+           f"masterVersion: {self.masterVersion }\n" \
+           f"masterCrc:     {self.masterCrc     }\n" \
+           f"fromCache:     {self.fromCache     }\n" \
+           f"error:         {self.error         }\n" \
+           f"attempts:      {self.attempts      }\n"
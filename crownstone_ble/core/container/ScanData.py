@@ -1,4 +1,5 @@
 class ScanData:
+    __slots__ = ("address", "rssi", "name", "operationMode", "deviceType", "payload", "validated")
 
     def __init__(self):
         self.address       = None
@@ -5,7 +5,8 @@ from crownstone_ble.core.container.ScanData import ScanData
 def fillScanDataFromAdvertisement(advertisement: Advertisement, validated: bool):
     data = ScanData()
 
-    data.address        = advertisement.address.lower()
+    # The address has been normalized by the scan delegate.
+    data.address        = advertisement.address
     data.rssi           = advertisement.rssi
     data.name           = advertisement.name
     data.operationMode  = advertisement.operationMode
@@ -0,0 +1,39 @@
+from crownstone_core.packets.serviceDataParsers.containers.elements.AdvCrownstoneErrorBitmask import AdvCrownstoneErrorBitmask
+from crownstone_core.protocol.SwitchState import SwitchState
+
+
+class StateSnapshot:
+
+    def __init__(self, address):
+        self.address   = address
+        self.timestamp = None    # time.time() at which the states were requested.
+        self.values    = {}      # StateType as key, parsed value as value, see StateHandler.getStates().
+        self.errors    = {}      # StateType (or "connection") as key, error message as value.
+
+    def get(self, stateType, default = None):
+        return self.values.get(stateType, default)
+
+    def toDict(self) -> dict:
+        """
+        :returns: The snapshot as dict, with state type names as keys, that can be serialized to JSON.
+        """
+        def toJson(value):
+            if isinstance(value, SwitchState):
+                return value.raw
+            if isinstance(value, AdvCrownstoneErrorBitmask):
+                return value.bitMask
+            return value
+
+        return {
+            "address":   self.address,
+            "timestamp": self.timestamp,
+            "values":    {stateType.name: toJson(value) for stateType, value in self.values.items()},
+            "errors":    {getattr(key, "name", key): message for key, message in self.errors.items()},
+        }
+
+    def __str__(self):
+        return \
+           f"address:       {self.address   }\n" \
+           f"timestamp:     {self.timestamp }\n" \
+           f"values:        {dict((stateType.name, str(value)) for stateType, value in self.values.items())}\n" \
+           f"errors:        {self.errors    }\n"
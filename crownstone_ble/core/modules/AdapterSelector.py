@@ -0,0 +1,126 @@
+import time
+
+# Time in seconds in which the same advertisement, received by another adapter, is considered a duplicate.
+# This is shorter than the advertisement interval of a Crownstone, so successive advertisements are not merged.
+DEFAULT_DUPLICATE_WINDOW = 0.05
+
+# Time in seconds after which the RSSI of an adapter to an address is no longer used to select an adapter.
+DEFAULT_ADAPTER_RSSI_TIMEOUT = 30
+
+# Decrease of the score of an adapter (in dB) per connection that already uses that adapter.
+DEFAULT_CONNECTION_PENALTY = 5
+
+# RSSI used for adapters that did not receive advertisements of an address recently.
+UNKNOWN_RSSI = -100
+
+# Number of addresses to keep track of, the tracked addresses are cleared when this is exceeded.
+MAX_TRACKED_ADDRESSES = 4096
+
+"""
+Class that merges the detections of multiple Bluetooth adapters, and selects the adapter to connect with.
+
+Each advertisement can be received by every adapter. A detection of an address with the same service data as the last
+forwarded detection of that address, by another adapter, within the duplicate window, is a duplicate: it only updates
+the RSSI of that adapter. Only the first detection is forwarded to the scan delegate, so the rest of the library gets
+each advertisement once.
+
+The adapter to connect with is the one with the highest score: the last RSSI of that adapter to the address, minus a
+penalty for each connection that already uses that adapter. So connections are spread over the adapters, while
+Crownstones that are only in range of one adapter are connected via that adapter.
+"""
+class AdapterSelector:
+
+    def __init__(self, adapterCount: int, duplicateWindow: float = DEFAULT_DUPLICATE_WINDOW, rssiTimeout: float = DEFAULT_ADAPTER_RSSI_TIMEOUT,
+                 connectionPenalty: float = DEFAULT_CONNECTION_PENALTY):
+        """
+        :param adapterCount:        Number of adapters.
+        :param duplicateWindow:     Time in seconds in which the same advertisement of another adapter is a duplicate.
+        :param rssiTimeout:         Time in seconds after which the RSSI of an adapter is no longer used.
+        :param connectionPenalty:   Decrease of the score of an adapter, in dB per connection.
+        """
+        self.adapterCount = adapterCount
+        self.duplicateWindow = duplicateWindow
+        self.rssiTimeout = rssiTimeout
+        self.connectionPenalty = connectionPenalty
+
+        # Address as key, list with (rssi, time) or None per adapter as value.
+        self.adapterRssi = {}
+
+        # Address as key, (serviceData, time, adapterIndex) of the last forwarded detection as value.
+        self.lastDetections = {}
+
+        # Statistics.
+        self.detectionCount = 0
+        self.duplicateCount = 0
+
+
+    def handleDetection(self, adapterIndex: int, address: str, rssi: int, serviceData, now: float = None) -> bool:
+        """
+        Register a detection of an adapter.
+        :param adapterIndex:   Index of the adapter that received the advertisement.
+        :param address:        Normalized address of the advertisement.
+        :param rssi:           RSSI at this adapter.
+        :param serviceData:    Service data of the advertisement, only compared with the service data of other detections.
+        :returns:              True when the detection should be forwarded, False when it's a duplicate.
+        """
+        if now is None:
+            now = time.time()
+        self.detectionCount += 1
+
+        adapterRssi = self.adapterRssi.get(address, None)
+        if adapterRssi is None:
+            if len(self.adapterRssi) >= MAX_TRACKED_ADDRESSES:
+                self.adapterRssi.clear()
+                self.lastDetections.clear()
+            adapterRssi = [None] * self.adapterCount
+            self.adapterRssi[address] = adapterRssi
+        if rssi is not None and 0 > rssi > UNKNOWN_RSSI:
+            adapterRssi[adapterIndex] = (rssi, now)
+
+        lastDetection = self.lastDetections.get(address, None)
+        if lastDetection is not None:
+            lastServiceData, lastTime, lastAdapterIndex = lastDetection
+            if lastAdapterIndex != adapterIndex and now - lastTime <= self.duplicateWindow and lastServiceData == serviceData:
+                self.duplicateCount += 1
+                return False
+        self.lastDetections[address] = (serviceData, now, adapterIndex)
+        return True
+
+
+    def getRssi(self, address: str, adapterIndex: int, now: float = None) -> int or None:
+        """
+        :returns: The last RSSI of the adapter to the address, or None when it's unknown or too old.
+        """
+        adapterRssi = self.adapterRssi.get(address.lower(), None)
+        if adapterRssi is None or adapterRssi[adapterIndex] is None:
+            return None
+        if now is None:
+            now = time.time()
+        rssi, lastTime = adapterRssi[adapterIndex]
+        if now - lastTime > self.rssiTimeout:
+            return None
+        return rssi
+
+
+    def selectAdapter(self, address: str, connectionCounts: list, maxConnections: int) -> int or None:
+        """
+        Select the adapter to connect to an address with.
+        :param address:            Address to connect to.
+        :param connectionCounts:   Number of connections per adapter.
+        :param maxConnections:     Maximum number of connections per adapter.
+        :returns:                  Index of the adapter with the highest score, or None when all adapters are at the maximum.
+        """
+        now = time.time()
+        bestIndex = None
+        bestScore = None
+        for adapterIndex in range(self.adapterCount):
+            if connectionCounts[adapterIndex] >= maxConnections:
+                continue
+            rssi = self.getRssi(address, adapterIndex, now)
+            if rssi is None:
+                rssi = UNKNOWN_RSSI
+            score = rssi - self.connectionPenalty * connectionCounts[adapterIndex]
+            if bestScore is None or score > bestScore:
+                bestIndex = adapterIndex
+                bestScore = score
+        return bestIndex
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import mmap
+import struct
+import time
+
+from crownstone_core.protocol.Services import DFU_ADVERTISEMENT_SERVICE_UUID
+
+from crownstone_ble.Exceptions import BleError
+from crownstone_core.Exceptions import CrownstoneBleException
+
+_LOGGER = logging.getLogger(__name__)
+
+"""
+Binary capture format of advertisements, so a scan can be replayed without hardware.
+
+The file starts with a header: CAPTURE_MAGIC, followed by the version (uint8).
+After that, each record consists of:
+- timestamp         float64   time.time() at which the advertisement was received.
+- rssi              int8
+- service UUID      uint16    short UUID, or 0 for the DFU service UUID. Advertisements with other long UUIDs are not recorded.
+- address length    uint8
+- name length       uint8     0 when there is no name.
+- data length       uint16
+- address           ascii
+- name              utf-8
+- service data      raw bytes
+
+All values are little endian.
+"""
+CAPTURE_MAGIC   = b"CSADV"
+CAPTURE_VERSION = 1
+
+HEADER_FORMAT = struct.Struct("<5sB")
+RECORD_FORMAT = struct.Struct("<dbHBBH")
+
+DFU_UUID_CODE = 0
+
+# Number of records that are replayed at max speed before giving other tasks a turn.
+REPLAY_BATCH_SIZE = 1000
+
+
+class AdvertisementRecorder:
+    """
+    Writes the advertisements that are passed to record() to a capture file.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.recordCount = 0
+        self.skippedCount = 0
+        self.file = open(filename, "wb")
+        self.file.write(HEADER_FORMAT.pack(CAPTURE_MAGIC, CAPTURE_VERSION))
+
+
+    def record(self, address: str, rssi: int, name: str or None, serviceData, serviceUUID, timestamp: float = None) -> bool:
+        """
+        :param serviceUUID:  Short UUID, or the DFU service UUID.
+        :returns:            False when the advertisement is skipped, because its service UUID can't be stored in the capture.
+        """
+        if serviceUUID == DFU_ADVERTISEMENT_SERVICE_UUID:
+            serviceUUID = DFU_UUID_CODE
+        elif not isinstance(serviceUUID, int) or not 0 < serviceUUID <= 0xFFFF:
+            _LOGGER.debug(f"Not recording advertisement of {address} with service UUID {serviceUUID}")
+            self.skippedCount += 1
+            return False
+        if timestamp is None:
+            timestamp = time.time()
+
+        addressBytes = address.encode("ascii")
+        nameBytes = b""
+        if name:
+            # Names are at most 248 bytes in BLE, so this only guards the format.
+            nameBytes = name.encode("utf-8")[0:255]
+        dataBytes = bytes(serviceData)
+
+        self.file.write(RECORD_FORMAT.pack(timestamp, max(-128, min(127, int(rssi))), serviceUUID, len(addressBytes), len(nameBytes), len(dataBytes)))
+        self.file.write(addressBytes)
+        self.file.write(nameBytes)
+        self.file.write(dataBytes)
+        self.recordCount += 1
+        return True
+
+
+    def close(self):
+        _LOGGER.info(f"Recorded {self.recordCount} advertisements to {self.filename}, skipped {self.skippedCount}")
+        self.file.close()
+
+
+class AdvertisementReplayer:
+    """
+    Reads a capture file, memory mapped, so large captures don't have to fit in memory.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+
+    def records(self):
+        """
+        Iterate over the records in the capture file.
+        :returns: Generator of (timestamp, address, rssi, name, serviceData, serviceUUID) tuples,
+                  where serviceData is a list of uint8, like the scan delegate gets from bleak.
+        """
+        with open(self.filename, "rb") as fileHandle:
+            if fileHandle.seek(0, 2) < HEADER_FORMAT.size:
+                raise CrownstoneBleException(BleError.INVALID_CAPTURE_FILE, f"{self.filename} is too small to be a capture file.")
+            with mmap.mmap(fileHandle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, version = HEADER_FORMAT.unpack_from(data, 0)
+                if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+                    raise CrownstoneBleException(BleError.INVALID_CAPTURE_FILE, f"{self.filename} is not a capture file of version {CAPTURE_VERSION}.")
+
+                offset = HEADER_FORMAT.size
+                size = len(data)
+                while offset + RECORD_FORMAT.size <= size:
+                    timestamp, rssi, serviceUUID, addressLength, nameLength, dataLength = RECORD_FORMAT.unpack_from(data, offset)
+                    offset += RECORD_FORMAT.size
+                    if offset + addressLength + nameLength + dataLength > size:
+                        _LOGGER.warning(f"Capture {self.filename} ends with an incomplete record.")
+                        return
+
+                    address = data[offset:offset + addressLength].decode("ascii")
+                    offset += addressLength
+                    name = None
+                    if nameLength > 0:
+                        name = data[offset:offset + nameLength].decode("utf-8", errors="replace")
+                        offset += nameLength
+                    serviceData = list(data[offset:offset + dataLength])
+                    offset += dataLength
+
+                    if serviceUUID == DFU_UUID_CODE:
+                        serviceUUID = DFU_ADVERTISEMENT_SERVICE_UUID
+                    yield timestamp, address, rssi, name, serviceData, serviceUUID
+
+
+    async def replay(self, handleRecord, speed: float or None = 1.0) -> int:
+        """
+        Pass each record to handleRecord(address, rssi, name, serviceData, serviceUUID), like BleakScanDelegate.parsePayload.
+
+        :param handleRecord:   Function that handles a record.
+        :param speed:          1.0 to replay at the original pace, 10.0 to replay 10 times as fast, None to replay as fast as possible.
+        :returns:              The number of replayed records.
+        """
+        count = 0
+        loop = asyncio.get_event_loop()
+        startTime = loop.time()
+        firstTimestamp = None
+        for timestamp, address, rssi, name, serviceData, serviceUUID in self.records():
+            if speed:
+                if firstTimestamp is None:
+                    firstTimestamp = timestamp
+                delay = startTime + (timestamp - firstTimestamp) / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif count % REPLAY_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+
+            handleRecord(address, rssi, name, serviceData, serviceUUID)
+            count += 1
+        return count
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+
+from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import parseAdvertisements
+
+_LOGGER = logging.getLogger(__name__)
+
+# Number of workers that decode advertisements.
+DEFAULT_DECODING_WORKERS = 2
+
+# Maximum number of advertisements that are sent to a worker at once.
+DEFAULT_DECODING_BATCH_SIZE = 32
+
+# Time in seconds a batch waits for more advertisements, before it's sent to a worker.
+DEFAULT_DECODING_BATCH_INTERVAL = 0.01
+
+# Maximum number of advertisements that are waiting to be decoded or emitted, new advertisements are dropped when reached.
+DEFAULT_MAX_PENDING_ADVERTISEMENTS = 10000
+
+# Weight of a new value in the moving average of the lag.
+LAG_SMOOTHING = 0.1
+
+
+def decodeAdvertisements(payloads: list, serviceDataKey) -> list:
+    """
+    Decode a batch of advertisements, this runs in a worker thread or process.
+    :param payloads:         List of (address, rssi, nameText, serviceDataArray, serviceUUID) tuples.
+    :param serviceDataKey:   The key to decrypt the service data with.
+    :returns:                List with the Advertisement of each payload, None when it's not of the Crownstone family.
+    """
+    return parseAdvertisements(payloads, serviceDataKey)
+
+
+"""
+Class that decrypts and parses advertisements in batches, in a pool of worker threads or processes, instead of on the event loop.
+The service data of a batch is decrypted in one call, see parseAdvertisements(). Without workers, the batches are decoded on the event loop.
+
+The BleakScanDelegate submits the payloads that are not in its cache, and posts the advertisements it already parsed.
+Both are collected in batches, which are sent to a worker when full, or after the batch interval.
+The results are emitted on the event loop, in the order they were received: a batch is only emitted when all batches
+before it are done. So the advertisements of each address keep their order.
+
+With processes, the decryption runs in parallel with the event loop. With threads, the decryption still shares the
+interpreter lock with the event loop, but the loop gets to run in between, instead of being blocked by each detection callback.
+
+Only the decryption and parsing are moved off the loop: the validation and the events of each advertisement still run on it.
+In examples/benchmark_decoding.py, that's most of the work, so neither threads nor processes made the loop less late than
+decoding inline (average 0.95 ms and 0.92 ms versus 0.70 ms), while each advertisement is emitted about 12 ms later because
+of the batch interval. The batched decryption does make decoding itself cheaper, see examples/benchmark_decryption.py.
+"""
+class AdvertisementDecoder:
+
+    def __init__(self, settings: EncryptionSettings, emitCallback, cacheCallback = None, workers: int = DEFAULT_DECODING_WORKERS,
+                 useProcesses: bool = False, batchSize: int = DEFAULT_DECODING_BATCH_SIZE, batchInterval: float = DEFAULT_DECODING_BATCH_INTERVAL,
+                 maxPending: int = DEFAULT_MAX_PENDING_ADVERTISEMENTS):
+        """
+        :param settings:        Encryption settings with the service data key.
+        :param emitCallback:    Called on the event loop with each Advertisement, in order.
+        :param cacheCallback:   Called on the event loop with (cacheKey, advertisement, serviceDataKey) for each decoded advertisement.
+        :param workers:         Number of worker threads or processes, 0 to decode the batches on the event loop.
+        :param useProcesses:    When True, a process pool is used, else a thread pool.
+        :param batchSize:       Maximum number of advertisements sent to a worker at once.
+        :param batchInterval:   Time in seconds a batch waits for more advertisements.
+        :param maxPending:      Maximum number of advertisements waiting to be emitted, new payloads are dropped when reached.
+        """
+        self.settings = settings
+        self.emitCallback = emitCallback
+        self.cacheCallback = cacheCallback
+        self.batchSize = batchSize
+        self.batchInterval = batchInterval
+        self.maxPending = maxPending
+        if workers == 0:
+            self.executor = None
+        elif useProcesses:
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="AdvertisementDecoder")
+        self.stopped = False
+
+        # Entries of the batch that is being collected: [receivedTime, advertisement, payload, cacheKey] lists.
+        # The advertisement is None until the payload is decoded, the payload is None for posted advertisements.
+        self.batch = []
+        self.batchPayloadCount = 0
+        self.batchTimer = None
+
+        # Batches that are sent to the workers, in order: (entries, future, serviceDataKey) tuples.
+        # The future is None when there's nothing to decode.
+        self.pendingBatches = deque()
+
+        # Number of advertisements that are submitted or posted, but not emitted yet.
+        self.pendingCount = 0
+
+        # Statistics.
+        self.maxPendingCount = 0
+        self.batchCount = 0
+        self.decodedCount = 0
+        self.droppedCount = 0
+        self.errorCount = 0
+        self.lastLag = None
+        self.averageLag = None
+        self.maxLag = 0.0
+
+
+    def submit(self, cacheKey, payload: tuple):
+        """
+        Decode the payload in a worker, and emit the advertisement in order.
+        :param cacheKey:   Key of the payload in the cache of the scan delegate, passed to the cacheCallback.
+        :param payload:    Tuple of (address, rssi, nameText, serviceDataArray, serviceUUID).
+        """
+        if self.pendingCount >= self.maxPending:
+            self.droppedCount += 1
+            return
+        self.batch.append([time.time(), None, payload, cacheKey])
+        self.batchPayloadCount += 1
+        self._addPending()
+
+
+    def post(self, advertisement):
+        """
+        Emit an already parsed advertisement, after the advertisements that were submitted before it.
+        """
+        if self.pendingCount == 0:
+            self.emitCallback(advertisement)
+            return
+        if self.pendingCount >= self.maxPending:
+            self.droppedCount += 1
+            return
+        self.batch.append([time.time(), advertisement, None, None])
+        self._addPending()
+
+
+    def _addPending(self):
+        self.pendingCount += 1
+        self.maxPendingCount = max(self.maxPendingCount, self.pendingCount)
+        if self.batchPayloadCount >= self.batchSize:
+            self.flush()
+        elif self.batchTimer is None:
+            self.batchTimer = asyncio.get_event_loop().call_later(self.batchInterval, self.flush)
+
+
+    def flush(self):
+        """
+        Send the batch that is being collected to a worker.
+        """
+        if self.batchTimer is not None:
+            self.batchTimer.cancel()
+            self.batchTimer = None
+        if not self.batch:
+            return
+        entries = self.batch
+        self.batch = []
+        self.batchPayloadCount = 0
+        self.batchCount += 1
+
+        payloads = [entry[2] for entry in entries if entry[2] is not None]
+        serviceDataKey = self.settings.serviceDataKey
+        if not payloads or self.stopped:
+            future = None
+        elif self.executor is None:
+            future = asyncio.get_event_loop().create_future()
+            try:
+                future.set_result(decodeAdvertisements(payloads, serviceDataKey))
+            except Exception as err:
+                future.set_exception(err)
+        else:
+            future = asyncio.get_event_loop().run_in_executor(self.executor, decodeAdvertisements, payloads, serviceDataKey)
+            future.add_done_callback(lambda f: self._emitCompletedBatches())
+        self.pendingBatches.append((entries, future, serviceDataKey))
+        if future is None or future.done():
+            self._emitCompletedBatches()
+
+
+    def _emitCompletedBatches(self):
+        while self.pendingBatches:
+            entries, future, serviceDataKey = self.pendingBatches[0]
+            if future is not None and not future.done():
+                # Wait for this batch, so the order is kept.
+                return
+            self.pendingBatches.popleft()
+
+            results = None
+            if future is not None:
+                try:
+                    results = iter(future.result())
+                except Exception as err:
+                    self.errorCount += 1
+                    _LOGGER.warning(f"Failed to decode {len(entries)} advertisements: {err}")
+                    results = None
+
+            now = time.time()
+            for receivedTime, advertisement, payload, cacheKey in entries:
+                self.pendingCount -= 1
+                if payload is not None:
+                    if results is None:
+                        continue
+                    advertisement = next(results)
+                    self.decodedCount += 1
+                    if advertisement is None:
+                        continue
+                    if self.cacheCallback is not None:
+                        self.cacheCallback(cacheKey, advertisement, serviceDataKey)
+                self._updateLag(now - receivedTime)
+                try:
+                    self.emitCallback(advertisement)
+                except Exception as err:
+                    # Keep emitting the rest of the batch, so the pending count stays right.
+                    self.errorCount += 1
+                    _LOGGER.warning(f"Failed to emit advertisement of {advertisement.address}: {err}")
+
+
+    def _updateLag(self, lag: float):
+        self.lastLag = lag
+        self.maxLag = max(self.maxLag, lag)
+        if self.averageLag is None:
+            self.averageLag = lag
+        else:
+            self.averageLag += LAG_SMOOTHING * (lag - self.averageLag)
+
+
+    def stop(self):
+        """
+        Send the last batch to a worker, and shut down the workers once they're done.
+        The advertisements that are still being decoded are emitted when done.
+        """
+        self.flush()
+        self.stopped = True
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+    def getStatistics(self) -> dict:
+        """
+        :returns: Dict with:
+                  - queueDepth: number of advertisements waiting to be decoded or emitted.
+                  - maxQueueDepth: the largest queue depth so far.
+                  - batches: number of batches.
+                  - decoded: number of decoded payloads.
+                  - dropped: number of payloads dropped because the queue was full.
+                  - errors: number of batches that failed to decode, and advertisements that failed to emit.
+                  - lastLag, averageLag, maxLag: time in seconds between receiving and emitting an advertisement.
+        """
+        return {
+            "queueDepth":    self.pendingCount,
+            "maxQueueDepth": self.maxPendingCount,
+            "batches":       self.batchCount,
+            "decoded":       self.decodedCount,
+            "dropped":       self.droppedCount,
+            "errors":        self.errorCount,
+            "lastLag":       self.lastLag,
+            "averageLag":    self.averageLag,
+            "maxLag":        self.maxLag,
+        }
@@ -0,0 +1,74 @@
+import asyncio
+from collections import OrderedDict
+from enum import Enum
+
+from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.container.ScanData import ScanData
+
+DEFAULT_STREAM_SIZE = 100
+
+
+class OverflowPolicy(Enum):
+    DROP_OLDEST = "DROP_OLDEST"   # Drop the oldest queued advertisement to make room for the new one.
+    DROP_NEWEST = "DROP_NEWEST"   # Drop the new advertisement.
+    COALESCE    = "COALESCE"      # Keep only the latest queued advertisement per address, drop the oldest address when full.
+
+
+"""
+Class that queues advertisements of an event bus topic, so they can be consumed at the pace of the consumer.
+
+The event bus callback only puts the advertisement in the queue. When the queue is full, the overflow policy decides what to drop.
+"""
+class AdvertisementStream:
+
+    def __init__(self, topic: str, filter=None, maxSize: int = DEFAULT_STREAM_SIZE, overflowPolicy: OverflowPolicy = OverflowPolicy.DROP_OLDEST):
+        self.filter = filter
+        self.maxSize = max(1, maxSize)
+        self.overflowPolicy = overflowPolicy
+
+        # Queued advertisements, oldest first.
+        # The key is the address when coalescing, and a sequence number otherwise.
+        self.queue = OrderedDict()
+        self.sequenceNumber = 0
+        self.droppedCount = 0
+        self.dataAvailable = asyncio.Event()
+
+        self.subscriptionId = BleEventBus.subscribe(topic, self.handleAdvertisement)
+
+
+    def handleAdvertisement(self, scanData: ScanData):
+        if self.filter is not None and not self.filter(scanData):
+            return
+
+        if self.overflowPolicy == OverflowPolicy.COALESCE:
+            key = scanData.address
+            if key in self.queue:
+                self.queue[key] = scanData
+                return
+        else:
+            key = self.sequenceNumber
+            self.sequenceNumber += 1
+
+        if len(self.queue) >= self.maxSize:
+            self.droppedCount += 1
+            if self.overflowPolicy == OverflowPolicy.DROP_NEWEST:
+                return
+            self.queue.popitem(last=False)
+
+        self.queue[key] = scanData
+        self.dataAvailable.set()
+
+
+    async def get(self) -> ScanData:
+        """
+        Wait for, and remove, the oldest queued advertisement.
+        """
+        while not self.queue:
+            self.dataAvailable.clear()
+            await self.dataAvailable.wait()
+        key, scanData = self.queue.popitem(last=False)
+        return scanData
+
+
+    def close(self):
+        BleEventBus.unsubscribe(self.subscriptionId)
@@ -0,0 +1,57 @@
+import threading
+
+import pyaes
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:
+    Cipher = None
+
+AES_BLOCK_SIZE = 16
+
+# Number of keys of which the cipher is kept.
+MAX_CACHED_CIPHERS = 8
+
+"""
+Class that decrypts many AES ECB blocks at once, like the encrypted part of the service data of many advertisements.
+
+With the optional cryptography package (pip install crownstone-ble[cryptography]), all blocks are decrypted in one call.
+Without it, pyaes is used, with one cipher per key: the key expansion is only done once, instead of for every block.
+"""
+class BatchDecryptor:
+
+    def __init__(self):
+        # Key (as bytes) as key, pyaes.AES as value.
+        self.ciphers = {}
+        self.lock = threading.Lock()
+
+
+    def decryptBlocks(self, blocks: list, key: bytes) -> list:
+        """
+        :param blocks:   List of 16 byte blocks (bytes, bytearray, or list of ints).
+        :param key:      The 16 byte AES key.
+        :returns:        List with the decrypted bytes of each block.
+        """
+        if not blocks:
+            return []
+        if Cipher is not None:
+            decryptor = Cipher(algorithms.AES(bytes(key)), modes.ECB()).decryptor()
+            decrypted = decryptor.update(b"".join(bytes(block) for block in blocks)) + decryptor.finalize()
+            return [decrypted[i : i + AES_BLOCK_SIZE] for i in range(0, len(decrypted), AES_BLOCK_SIZE)]
+
+        cipher = self._getCipher(key)
+        return [bytes(cipher.decrypt(list(block))) for block in blocks]
+
+
+    def _getCipher(self, key: bytes):
+        # Keys loaded from hex strings are a bytearray, which can't be used as dict key.
+        key = bytes(key)
+        cipher = self.ciphers.get(key, None)
+        if cipher is None:
+            # The ciphers are shared by the decoding workers.
+            with self.lock:
+                if len(self.ciphers) >= MAX_CACHED_CIPHERS:
+                    self.ciphers.clear()
+                cipher = pyaes.AES(bytes(key))
+                self.ciphers[key] = cipher
+        return cipher
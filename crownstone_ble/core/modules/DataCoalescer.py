@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.container.ScanData import ScanData
+from crownstone_ble.core.modules.DeviceRegistry import DEFAULT_RECORD_TIMEOUT
+from crownstone_ble.topics.BleTopics import BleTopics
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_COALESCE_INTERVAL = 0.5
+DEFAULT_POWER_THRESHOLD   = 5.0
+
+"""
+Class that coalesces the data of topic 'BleTopics.newDataAvailable'.
+
+Only the latest ScanData per Crownstone is kept, and emitted on 'BleTopics.coalescedDataAvailable' every interval.
+Relevant changes are emitted right away:
+- A different payload type.
+- A different switch state.
+- A change in real power usage of at least the power threshold, compared to the last emitted data.
+
+Crownstones also advertise the state of other Crownstones (external states), so the data is kept per
+address, and per Crownstone ID in the payload.
+
+Like the records of the DeviceRegistry, the last emitted data of a Crownstone is removed when no data was received for
+the expiry time. The keys are ordered by their last data, so expired ones are removed from the front.
+"""
+class DataCoalescer:
+
+    def __init__(self, interval: float = DEFAULT_COALESCE_INTERVAL, powerThreshold: float = DEFAULT_POWER_THRESHOLD,
+                 expiryTime: float = DEFAULT_RECORD_TIMEOUT):
+        """
+        :param interval:         Time in seconds between flushes of the pending data.
+        :param powerThreshold:   Minimal change in real power usage (W) that is emitted right away.
+        :param expiryTime:       Time in seconds after the last data of a key, after which its last emitted data is removed.
+        """
+        self.interval = interval
+        self.powerThreshold = powerThreshold
+        self.expiryTime = expiryTime
+
+        # Latest data that has not been emitted yet, oldest first.
+        self.pending = OrderedDict()
+        # Last emitted data per key.
+        self.lastEmitted = {}
+        # Time of the last received data per key. Ordered from least recently received to most recently received.
+        self.lastReceived = OrderedDict()
+        self.flushTimer = None
+
+        self.subscriptionId = BleEventBus.subscribe(BleTopics.newDataAvailable, self.handleData)
+
+
+    def handleData(self, data: ScanData, now: float = None):
+        if now is None:
+            now = time.time()
+        self.cleanupExpiredData(now)
+
+        key = (data.address, getattr(data.payload, "crownstoneId", None))
+        self.lastReceived[key] = now
+        self.lastReceived.move_to_end(key)
+        if self._isRelevantChange(self.lastEmitted.get(key, None), data):
+            self.pending.pop(key, None)
+            self._emit(key, data)
+            return
+
+        self.pending[key] = data
+        if self.flushTimer is None:
+            self.flushTimer = asyncio.get_event_loop().call_later(self.interval, self.flush)
+
+
+    def cleanupExpiredData(self, now: float = None):
+        if now is None:
+            now = time.time()
+        while self.lastReceived:
+            key, receivedTime = next(iter(self.lastReceived.items()))
+            if receivedTime + self.expiryTime > now:
+                break
+            self.lastReceived.popitem(last=False)
+            self.lastEmitted.pop(key, None)
+
+
+    def _isRelevantChange(self, previous: ScanData, data: ScanData) -> bool:
+        if previous is None:
+            return True
+        previousPayload = previous.payload
+        payload = data.payload
+        if getattr(previousPayload, "type", None) != getattr(payload, "type", None):
+            return True
+        if self._getRawSwitchState(previousPayload) != self._getRawSwitchState(payload):
+            return True
+
+        previousPower = getattr(previousPayload, "powerUsageReal", None)
+        power = getattr(payload, "powerUsageReal", None)
+        if previousPower is None or power is None:
+            return previousPower is not power
+        return abs(power - previousPower) >= self.powerThreshold
+
+
+    def _getRawSwitchState(self, payload) -> int or None:
+        # Each parse creates a new SwitchState, which can't be compared, so compare the raw value.
+        switchState = getattr(payload, "switchState", None)
+        return getattr(switchState, "raw", switchState)
+
+
+    def _emit(self, key, data: ScanData):
+        self.lastEmitted[key] = data
+        BleEventBus.emit(BleTopics.coalescedDataAvailable, data)
+
+
+    def flush(self):
+        """
+        Emit all pending data.
+        """
+        self.flushTimer = None
+        while self.pending:
+            key, data = self.pending.popitem(last=False)
+            self._emit(key, data)
+
+
+    def stop(self):
+        """
+        Stop coalescing, pending data is emitted.
+        """
+        BleEventBus.unsubscribe(self.subscriptionId)
+        if self.flushTimer is not None:
+            self.flushTimer.cancel()
+        self.flush()
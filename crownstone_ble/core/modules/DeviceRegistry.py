@@ -0,0 +1,198 @@
+import bisect
+import time
+from collections import OrderedDict, deque
+from typing import List
+
+from crownstone_core.Enums import CrownstoneOperationMode
+
+from crownstone_ble.core.container.DeviceRecord import DeviceRecord
+from crownstone_ble.core.container.ScanData import ScanData
+
+# Time in seconds after the last advertisement, after which a record is removed.
+DEFAULT_RECORD_TIMEOUT = 60
+
+# Weight of a new value in the exponential moving averages of the RSSI and the advertisement rate.
+DEFAULT_SMOOTHING = 0.1
+
+# Number of RSSI values of the windowed average.
+DEFAULT_RSSI_WINDOW_SIZE = 10
+
+"""
+Class that keeps a record of every Crownstone we received advertisements from, updated by the Validator on each advertisement.
+
+Each record holds the last seen time, operation mode, validated flag, moving and windowed RSSI averages, and the advertisement rate.
+The averages are updated in O(1). The records are also kept sorted by RSSI average, in a list: bisect finds the position in
+O(log N), but inserting and removing shift the list, which is O(N). That's a fast memory move, for the number of Crownstones
+around a scanner: an update takes about 5 us with 200 records, and 15 us with 20000.
+Lookups by address are O(1), the nearest Crownstone is the first record in RSSI order that passes the filters.
+
+Like the trackers of the Validator, the records are ordered by their last update, so expired records are removed from the front.
+"""
+class DeviceRegistry:
+
+    def __init__(self, recordTimeout: float = DEFAULT_RECORD_TIMEOUT, smoothing: float = DEFAULT_SMOOTHING, rssiWindowSize: int = DEFAULT_RSSI_WINDOW_SIZE):
+        """
+        :param recordTimeout:    Time in seconds after the last advertisement, after which a record is removed.
+        :param smoothing:        Weight [0, 1] of a new value in the moving averages.
+        :param rssiWindowSize:   Number of RSSI values of the windowed average.
+        """
+        self.recordTimeout = recordTimeout
+        self.smoothing = smoothing
+        self.rssiWindowSize = rssiWindowSize
+
+        # Address as key, DeviceRecord as value. Ordered from least recently updated to most recently updated.
+        self.records = OrderedDict()
+
+        # Sorted list of (-rssiAverage, address) tuples, so the strongest RSSI comes first. Inserting and removing are O(N).
+        self.rssiOrder = []
+
+
+    def __len__(self):
+        return len(self.records)
+
+
+    def clear(self):
+        self.records = OrderedDict()
+        self.rssiOrder = []
+
+
+    def update(self, scanData: ScanData, now: float = None):
+        """
+        Update the record of the address of the advertisement.
+        """
+        if now is None:
+            now = time.time()
+        self.cleanupExpiredRecords(now)
+
+        address = scanData.address
+        record = self.records.get(address, None)
+        if record is None:
+            record = DeviceRecord(address)
+            record.firstSeen = now
+            record.rssiWindow = deque(maxlen=self.rssiWindowSize)
+            self.records[address] = record
+        else:
+            self.records.move_to_end(address)
+            interval = now - record.lastSeen
+            if interval > 0:
+                if record.advertisementRate is None:
+                    record.advertisementRate = 1.0 / interval
+                else:
+                    record.advertisementRate += self.smoothing * (1.0 / interval - record.advertisementRate)
+
+        record.lastSeen = now
+        record.advertisementCount += 1
+        record.name = scanData.name
+        record.operationMode = scanData.operationMode
+        record.deviceType = scanData.deviceType
+        record.validated = bool(scanData.validated)
+        record.scanData = scanData
+
+        # Only use valid RSSI measurements.
+        rssi = scanData.rssi
+        if rssi is None or not 0 > rssi > -100:
+            return
+        record.rssi = rssi
+        if len(record.rssiWindow) == record.rssiWindow.maxlen:
+            record.rssiWindowSum -= record.rssiWindow[0]
+        record.rssiWindow.append(rssi)
+        record.rssiWindowSum += rssi
+
+        if record.rssiAverage is None:
+            rssiAverage = float(rssi)
+        else:
+            rssiAverage = record.rssiAverage + self.smoothing * (rssi - record.rssiAverage)
+        self._removeFromRssiOrder(record)
+        record.rssiAverage = rssiAverage
+        bisect.insort(self.rssiOrder, (-rssiAverage, address))
+
+
+    def cleanupExpiredRecords(self, now: float = None):
+        if now is None:
+            now = time.time()
+        while self.records:
+            address, record = next(iter(self.records.items()))
+            if record.lastSeen + self.recordTimeout > now:
+                break
+            self.records.popitem(last=False)
+            self._removeFromRssiOrder(record)
+
+
+    def get(self, address: str) -> DeviceRecord or None:
+        return self.records.get(address.lower(), None)
+
+
+    def getRecords(self, maxAge: float = None) -> List[DeviceRecord]:
+        """
+        :param maxAge:   Only return records of which the last advertisement is at most this many seconds old.
+        :returns:        List of records, from least recently to most recently seen.
+        """
+        if maxAge is None:
+            return list(self.records.values())
+        oldest = time.time() - maxAge
+        return [record for record in self.records.values() if record.lastSeen >= oldest]
+
+
+    def getMode(self, address: str, maxAge: float = None) -> CrownstoneOperationMode or None:
+        """
+        :returns: The operation mode of the last advertisement of the address, or None when unknown or older than maxAge seconds.
+        """
+        record = self.get(address)
+        if record is None or not self._isFresh(record, maxAge, time.time()):
+            return None
+        return record.operationMode
+
+
+    def getNearest(self, setupModeOnly: bool = False, validatedOnly: bool = False, rssiAtLeast: float = -100,
+                   addressesToExclude: set = None, maxAge: float = None) -> DeviceRecord or None:
+        """
+        Get the record with the strongest RSSI average, see getTopByRssi().
+        """
+        top = self.getTopByRssi(1, setupModeOnly, validatedOnly, rssiAtLeast, addressesToExclude, maxAge)
+        if not top:
+            return None
+        return top[0]
+
+
+    def getTopByRssi(self, count: int, setupModeOnly: bool = False, validatedOnly: bool = False, rssiAtLeast: float = -100,
+                     addressesToExclude: set = None, maxAge: float = None) -> List[DeviceRecord]:
+        """
+        Get the records with the strongest RSSI average, that pass the filters.
+
+        :param count:                Maximum number of records to return.
+        :param setupModeOnly:        When True, only Crownstones in setup mode, when False, only Crownstones that are not in setup mode.
+        :param validatedOnly:        When True, only validated Crownstones.
+        :param rssiAtLeast:          Minimum RSSI average.
+        :param addressesToExclude:   Set of lower case addresses to skip.
+        :param maxAge:               Only records of which the last advertisement is at most this many seconds old.
+        :returns:                    List of records, strongest RSSI first.
+        """
+        now = time.time()
+        top = []
+        for negativeRssi, address in self.rssiOrder:
+            if len(top) >= count or -negativeRssi < rssiAtLeast:
+                break
+            if addressesToExclude is not None and address in addressesToExclude:
+                continue
+            record = self.records[address]
+            if (record.operationMode == CrownstoneOperationMode.SETUP) != setupModeOnly:
+                continue
+            if validatedOnly and not record.validated:
+                continue
+            if not self._isFresh(record, maxAge, now):
+                continue
+            top.append(record)
+        return top
+
+
+    def _isFresh(self, record: DeviceRecord, maxAge: float or None, now: float) -> bool:
+        return maxAge is None or record.lastSeen >= now - maxAge
+
+
+    def _removeFromRssiOrder(self, record: DeviceRecord):
+        if record.rssiAverage is None:
+            return
+        key = (-record.rssiAverage, record.address)
+        index = bisect.bisect_left(self.rssiOrder, key)
+        if index < len(self.rssiOrder) and self.rssiOrder[index] == key:
+            del self.rssiOrder[index]
@@ -13,7 +13,7 @@ class Gatherer:
             rssi = None
         
         if scanData.address not in self.deviceList:
-            self.deviceList[scanData.address] = {"address": scanData.address.lower(), "setupMode": None, "validated": scanData.validated, "rssi": rssi}
+            self.deviceList[scanData.address] = {"address": scanData.address, "setupMode": None, "validated": scanData.validated, "rssi": rssi}
 
         self.deviceList[scanData.address]["validated"] = True
         self.deviceList[scanData.address]["setupMode"] = scanData.operationMode == CrownstoneOperationMode.SETUP
@@ -0,0 +1,100 @@
+import time
+
+from crownstone_core.packets.microapp.MicroappStatusPacket import MicroappStatusPacket
+from crownstone_core.util.BufferReader import BufferReader
+
+# The binary starts with a header: sdk version (2), size (2), checksum (2), checksum of the header (2), build version (4), ...
+MICROAPP_BINARY_HEADER_SIZE = 12
+
+# Value of the checksum test of a microapp status, when the Crownstone validated the checksums.
+MICROAPP_TEST_PASSED = 3
+
+"""
+Class that holds the state of a microapp upload.
+
+The offset up to which the Crownstone acknowledged all chunks is kept as checkpoint. When the upload is interrupted,
+for example by a disconnect, passing the same object to MicroappHandler.uploadMicroappResumable() after reconnecting
+continues from the checkpoint. Use a separate object for each Crownstone.
+"""
+class MicroappUpload:
+
+    def __init__(self, data: bytes or bytearray, index: int = 0, protocol: int = 0, chunkSize: int = None):
+        """
+        :param data:        The microapp binary.
+        :param index:       The app index on the Crownstone.
+        :param protocol:    The microapp protocol.
+        :param chunkSize:   Size of the chunks, multiple of 4. When None, the size is based on the MTU of the connection.
+        """
+        # Pad the data with 0xFF, so the size is a multiple of 4.
+        self.data = bytes(data) + bytes([0xFF] * (-len(data) % 4))
+        self.index = index
+        self.protocol = protocol
+        self.chunkSize = chunkSize
+
+        # All data before this offset has been acknowledged by the Crownstone.
+        self.acknowledgedOffset = 0
+
+        # True when the upload was skipped, because the Crownstone already has this microapp.
+        self.skipped = False
+
+        # Statistics of the last call to uploadMicroappResumable().
+        self.bytesUploaded = 0
+        self.startTime = None
+        self.duration = 0.0
+
+
+    def isFinished(self) -> bool:
+        return self.acknowledgedOffset >= len(self.data)
+
+
+    def getBytesPerSecond(self) -> float:
+        """
+        :returns: The throughput of the last upload, in bytes per second.
+        """
+        duration = self.duration
+        if self.startTime is not None:
+            duration = time.perf_counter() - self.startTime
+        if duration <= 0:
+            return 0.0
+        return self.bytesUploaded / duration
+
+
+    def getChunks(self, chunkSize: int) -> list:
+        """
+        :returns: List of (offset, chunk) tuples, of the data after the checkpoint.
+        """
+        return [(offset, self.data[offset : offset + chunkSize]) for offset in range(self.acknowledgedOffset, len(self.data), chunkSize)]
+
+
+    def isIdentical(self, status: MicroappStatusPacket) -> bool:
+        """
+        :returns: True when the status of an app on the Crownstone shows that it's this microapp, based on the checksums in the binary header.
+                  The Crownstone must have validated the checksums, else the app might be uploaded partially.
+        """
+        if not status.tests.hasData or status.tests.checksum != MICROAPP_TEST_PASSED:
+            return False
+        if len(self.data) < MICROAPP_BINARY_HEADER_SIZE:
+            return False
+        reader = BufferReader(self.data[0:MICROAPP_BINARY_HEADER_SIZE])
+        reader.getUInt8() # sdk version major
+        reader.getUInt8() # sdk version minor
+        reader.getUInt16() # size
+        checksum = reader.getUInt16()
+        checksumHeader = reader.getUInt16()
+        buildVersion = reader.getUInt32()
+        if checksum == 0 and checksumHeader == 0:
+            return False
+        return status.checksum == checksum and status.checksumHeader == checksumHeader and status.buildVersion == buildVersion
+
+
+    def restart(self):
+        """
+        Forget the checkpoint, so the next upload starts at offset 0.
+        """
+        self.acknowledgedOffset = 0
+        self.skipped = False
+
+
+    def __str__(self):
+        return f"MicroappUpload(index={self.index}, size={len(self.data)}, acknowledgedOffset={self.acknowledgedOffset}, " \
+               f"skipped={self.skipped}, bytesPerSecond={self.getBytesPerSecond():.0f})"
@@ -7,14 +7,25 @@ from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
 
 class ModeChecker:
 
-    def __init__(self, address: str, targetMode: CrownstoneOperationMode or None, waitUntilInTargetMode=False):
+    def __init__(self, address: str, targetMode: CrownstoneOperationMode or None, waitUntilInTargetMode=False, abortCallback=None):
         self.address = address.lower()
         self.result = None
         self.targetMode = targetMode
         self.waitUntilInTargetMode = waitUntilInTargetMode
+        # Called when the result is known, the abortScanning topic is emitted when None.
+        self.abortCallback = abortCallback
+        # Set when the result is known, advertisements that arrive before the scan consumer is done are ignored.
+        self.done = False
+
+    def abort(self):
+        self.done = True
+        if self.abortCallback is not None:
+            self.abortCallback()
+        else:
+            BleEventBus.emit(SystemBleTopics.abortScanning, True)
 
     def handleAdvertisement(self, scanData: ScanData):
-        if scanData.address != self.address:
+        if self.done or scanData.address != self.address:
             return
 
         self.result = scanData.operationMode
@@ -25,7 +36,7 @@ class ModeChecker:
             # if we're looking for a mode, we'll wait for the duration of the timeout in the hope it will be something other than unknown
             pass
         else:
-            BleEventBus.emit(SystemBleTopics.abortScanning, True)
+            self.abort()
 
     def getResult(self):
         return self.result
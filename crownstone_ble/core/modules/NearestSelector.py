@@ -7,7 +7,7 @@ from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
 
 class NearestSelector:
     
-    def __init__(self, setupModeOnly=False, rssiAtLeast=-100, returnFirstAcceptable=False, addressesToExcludeSet=None):
+    def __init__(self, setupModeOnly=False, rssiAtLeast=-100, returnFirstAcceptable=False, addressesToExcludeSet=None, abortCallback=None):
         self.setupModeOnly = setupModeOnly
         self.rssiAtLeast = rssiAtLeast
         self.returnFirstAcceptable = returnFirstAcceptable
@@ -15,10 +15,18 @@ class NearestSelector:
             self.addressesToExcludeSet = set()
         else:
             self.addressesToExcludeSet = addressesToExcludeSet
-        self.deviceList = []
         self.nearest = None
-        
-        
+        # Called when an acceptable Crownstone is found, the abortScanning topic is emitted when None.
+        self.abortCallback = abortCallback
+
+
+    def abort(self):
+        if self.abortCallback is not None:
+            self.abortCallback()
+        else:
+            BleEventBus.emit(SystemBleTopics.abortScanning, True)
+
+
     def handleAdvertisement(self, scanData: ScanData):
         if scanData.address in self.addressesToExcludeSet:
             return
@@ -33,22 +41,15 @@ class NearestSelector:
         if scanData.rssi < self.rssiAtLeast:
             return
         
-        self.deviceList.append(scanData)
+        # Only keep the nearest so far, a stronger advertisement needs a valid (negative) RSSI to replace it.
+        if self.nearest is None or self.nearest.rssi < scanData.rssi < 0:
+            self.nearest = scanData
         
         if self.returnFirstAcceptable:
-            BleEventBus.emit(SystemBleTopics.abortScanning, True)
+            self.abort()
             
             
     def getNearest(self):
-        if len(self.deviceList) == 0:
-            return None
-        
-        nearest = self.deviceList[0]
-        
-        for adv in self.deviceList:
-            if nearest.rssi < adv.rssi < 0:
-                nearest = adv
-            
-        return nearest
+        return self.nearest
 
 
@@ -0,0 +1,212 @@
+from typing import List
+
+from crownstone_core.Exceptions import CrownstoneError, CrownstoneException
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Header of a power samples result payload, followed by count int16 samples.
+POWER_SAMPLES_HEADER_FIELDS = [
+    ("samplesType",      "u1"),
+    ("index",            "u1"),
+    ("count",            "<u2"),
+    ("timestamp",        "<u4"),
+    ("delayUs",          "<u2"),
+    ("sampleIntervalUs", "<u2"),
+    ("reserved",         "V2"),
+    ("offset",           "<i2"),
+    ("multiplier",       "<f4"),
+]
+POWER_SAMPLES_HEADER_SIZE = 20
+
+
+def requireNumpy():
+    if numpy is None:
+        raise ImportError("NumPy is required for power samples arrays, install it with: pip install crownstone-ble[numpy]")
+
+
+"""
+Class that holds power samples of many captures (the same as a list of PowerSamplesPacket), as NumPy arrays.
+
+Each capture is a row: the metadata are 1D arrays with a value per capture, and the samples are a 2D array with a
+row per capture. Captures with fewer samples than the longest capture are padded: samples with 0, values with NaN.
+Captures of many Crownstones can be combined with concatenate(), the analysis methods then return a value per capture.
+
+Requires NumPy, which is an optional dependency: pip install crownstone-ble[numpy]
+"""
+class PowerSamplesArrays:
+
+    def __init__(self, header, samples, addresses):
+        """
+        Use fromPayloads() or concatenate() instead.
+
+        :param header:      Structured array with the POWER_SAMPLES_HEADER_FIELDS, a row per capture.
+        :param samples:     2D int16 array with the raw samples, a row per capture.
+        :param addresses:   Array with the address of the Crownstone per capture.
+        """
+        self.samplesType      = header["samplesType"]
+        self.index            = header["index"]
+        self.count            = header["count"].astype(numpy.int64)
+        self.timestamp        = header["timestamp"]
+        self.delayUs          = header["delayUs"]
+        self.sampleIntervalUs = header["sampleIntervalUs"]
+        self.offset           = header["offset"]
+        self.multiplier       = header["multiplier"]
+        self.samples          = samples
+        self.addresses        = addresses
+        self._header          = header
+
+        # True for the samples that are not padding.
+        self.mask = numpy.arange(samples.shape[1])[None, :] < self.count[:, None]
+
+        # The samples converted to the unit of the samples type: (sample - offset) * multiplier, NaN for padding.
+        self.values = (samples - self.offset[:, None].astype(numpy.float64)) * self.multiplier[:, None]
+        self.values[~self.mask] = numpy.nan
+
+
+    @classmethod
+    def fromPayloads(cls, payloads: list, address: str = None):
+        """
+        Decode the result payloads of get power samples commands, without parsing each sample separately.
+        Like PowerSamplesPacket, only the number of samples in the header are used, trailing bytes are ignored.
+
+        :param payloads:   List of payloads (bytes, bytearray, or list of ints).
+        :param address:    Address of the Crownstone the payloads came from.
+        """
+        requireNumpy()
+        headerType = numpy.dtype(POWER_SAMPLES_HEADER_FIELDS)
+        header = numpy.zeros(len(payloads), dtype=headerType)
+        payloads = [bytes(payload) for payload in payloads]
+        maxSize = POWER_SAMPLES_HEADER_SIZE
+        for payload in payloads:
+            if len(payload) < POWER_SAMPLES_HEADER_SIZE:
+                raise CrownstoneException(CrownstoneError.INCORRECT_RESPONSE_LENGTH, f"Invalid power samples payload size: {len(payload)}")
+            maxSize = max(maxSize, len(payload))
+        samples = numpy.zeros((len(payloads), (maxSize - POWER_SAMPLES_HEADER_SIZE) // 2), dtype=numpy.int16)
+
+        # Payloads of the same size are decoded at once, by viewing their concatenation as a structured array.
+        indicesBySize = {}
+        for i, payload in enumerate(payloads):
+            indicesBySize.setdefault(len(payload), []).append(i)
+        for size, indices in indicesBySize.items():
+            available = (size - POWER_SAMPLES_HEADER_SIZE) // 2
+            payloadType = numpy.dtype(POWER_SAMPLES_HEADER_FIELDS + [("samples", "<i2", (available,))] + [("trailing", "V1")] * (size % 2))
+            decoded = numpy.frombuffer(b"".join(payloads[i] for i in indices), dtype=payloadType)
+            if numpy.any(decoded["count"] > available):
+                raise CrownstoneException(CrownstoneError.INCORRECT_RESPONSE_LENGTH, f"Power samples count does not fit in payload size: {size}")
+            for name, fieldType in POWER_SAMPLES_HEADER_FIELDS:
+                header[name][indices] = decoded[name]
+            # The samples after the count are set to 0, like the padding.
+            inCount = numpy.arange(available)[None, :] < decoded["count"][:, None]
+            samples[indices, 0:available] = numpy.where(inCount, decoded["samples"], 0)
+
+        samples = samples[:, 0:int(header["count"].max(initial=0))]
+        return cls(header, samples, numpy.full(len(payloads), address, dtype=object))
+
+
+    @classmethod
+    def concatenate(cls, arraysList: List["PowerSamplesArrays"]):
+        """
+        Combine the captures of many PowerSamplesArrays, for example of many Crownstones, into one.
+        """
+        requireNumpy()
+        header = numpy.concatenate([arrays._header for arrays in arraysList]) if arraysList else numpy.zeros(0, dtype=numpy.dtype(POWER_SAMPLES_HEADER_FIELDS))
+        maxCount = max([arrays.samples.shape[1] for arrays in arraysList], default=0)
+        samples = numpy.zeros((len(header), maxCount), dtype=numpy.int16)
+        addresses = numpy.empty(len(header), dtype=object)
+        row = 0
+        for arrays in arraysList:
+            rows, count = arrays.samples.shape
+            samples[row : row + rows, 0:count] = arrays.samples
+            addresses[row : row + rows] = arrays.addresses
+            row += rows
+        return cls(header, samples, addresses)
+
+
+    def __len__(self):
+        return len(self.count)
+
+
+    def getSampleTimes(self):
+        """
+        :returns: 2D array with the time of each sample, in seconds since epoch, NaN for padding.
+        """
+        sampleNumbers = numpy.arange(self.samples.shape[1])[None, :]
+        times = self.timestamp[:, None] + (self.delayUs[:, None] + sampleNumbers * self.sampleIntervalUs[:, None].astype(numpy.float64)) / 1e6
+        times[~self.mask] = numpy.nan
+        return times
+
+
+    def getMean(self):
+        """
+        :returns: The mean value per capture.
+        """
+        return self._sum(self.values) / self._getCount()
+
+
+    def getRms(self):
+        """
+        :returns: The root mean square of the values per capture.
+        """
+        return numpy.sqrt(self._sum(self.values ** 2) / self._getCount())
+
+
+    def getPeak(self):
+        """
+        :returns: The largest absolute value per capture.
+        """
+        return numpy.max(numpy.where(self.mask, numpy.abs(self.values), -numpy.inf), axis=1, initial=-numpy.inf)
+
+
+    def getSpectrum(self):
+        """
+        Get the amplitude spectrum of each capture, without the mean.
+
+        :returns: Tuple (frequencies, amplitudes): 2D arrays with a row per capture, the frequencies are in Hz.
+                  Captures are zero padded to the length of the longest capture.
+        """
+        centered = numpy.where(self.mask, self.values - self.getMean()[:, None], 0.0)
+        length = self.samples.shape[1]
+        amplitudes = 2 * numpy.abs(numpy.fft.rfft(centered, axis=1)) / self._getCount()[:, None]
+        intervals = numpy.where(self.sampleIntervalUs > 0, self.sampleIntervalUs, numpy.nan) / 1e6
+        frequencies = numpy.arange(length // 2 + 1)[None, :] / (length * intervals[:, None])
+        return frequencies, amplitudes
+
+
+    def getSpectralSummary(self) -> dict:
+        """
+        :returns: Dict with an array per item, with a value per capture:
+                  - dominantFrequency: frequency in Hz with the largest amplitude, like the mains frequency.
+                  - dominantAmplitude: amplitude at the dominant frequency.
+                  - distortion: amplitude of all other frequencies, relative to the dominant amplitude.
+        """
+        frequencies, amplitudes = self.getSpectrum()
+        rows = numpy.arange(len(self))
+        if amplitudes.shape[1] == 0:
+            empty = numpy.full(len(self), numpy.nan)
+            return {"dominantFrequency": empty, "dominantAmplitude": empty, "distortion": empty}
+        dominant = numpy.argmax(amplitudes, axis=1)
+        dominantAmplitude = amplitudes[rows, dominant]
+        otherPower = numpy.sum(amplitudes ** 2, axis=1) - dominantAmplitude ** 2
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            distortion = numpy.sqrt(numpy.maximum(otherPower, 0)) / dominantAmplitude
+        return {
+            "dominantFrequency": frequencies[rows, dominant],
+            "dominantAmplitude": dominantAmplitude,
+            "distortion":        distortion,
+        }
+
+
+    def _sum(self, values):
+        return numpy.sum(numpy.where(self.mask, values, 0.0), axis=1)
+
+
+    def _getCount(self):
+        # Empty captures result in NaN, instead of a division by zero.
+        return numpy.where(self.count > 0, self.count, numpy.nan)
+
+
+    def __str__(self):
+        return f"PowerSamplesArrays(captures={len(self)}, maxCount={self.samples.shape[1]})"
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+"""
+Class that represents a temporary consumer of the scan session, like getMode() or getNearestCrownstone().
+
+The consumer receives the advertisements of a topic until its deadline has passed, or until it's aborted.
+Aborting only ends this consumer, other consumers of the scan session keep receiving advertisements.
+Waiting ends as soon as the consumer is aborted, and the deadline uses a monotonic clock.
+
+An optional predicate is evaluated inline, in the callback of each advertisement: the first advertisement for which it
+returns True is stored as result, and aborts the consumer.
+"""
+class ScanConsumer:
+
+    def __init__(self, topic: str, duration: float, predicate=None):
+        """
+        :param topic:      The topic of which the advertisements are consumed, like BleTopics.advertisement.
+        :param duration:   Time in seconds after which the consumer is done, counted from the start of wait().
+        :param predicate:  Optional function that gets the ScanData, and returns True when it's the advertisement we're looking for.
+        """
+        self.topic = topic
+        self.duration = duration
+        self.predicate = predicate
+        self.result = None
+        self.deadline = None
+        self.aborted = asyncio.Event()
+
+
+    def abort(self):
+        self.aborted.set()
+
+
+    def isAborted(self) -> bool:
+        return self.aborted.is_set()
+
+
+    def handleAdvertisement(self, scanData):
+        """
+        Evaluate the predicate, only used when a predicate is given.
+        """
+        if self.aborted.is_set():
+            return
+        if self.predicate(scanData):
+            self.result = scanData
+            self.abort()
+
+
+    def getRemainingTime(self) -> float:
+        """
+        :returns: Time in seconds until the deadline, the full duration when wait() hasn't been called yet.
+        """
+        if self.deadline is None:
+            return self.duration
+        return max(0.0, self.deadline - time.monotonic())
+
+
+    async def wait(self):
+        """
+        Wait until the deadline has passed, or until the consumer is aborted.
+        """
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.duration
+        if self.aborted.is_set():
+            return
+        try:
+            await asyncio.wait_for(self.aborted.wait(), self.getRemainingTime())
+        except asyncio.TimeoutError:
+            pass
@@ -43,14 +43,14 @@ class StoneAdvertisementTracker:
             self.cleanupCallback()
 
 
-    def update(self, advertisement: Advertisement):
+    def update(self, advertisement: Advertisement, now: float = None):
         self.address = advertisement.address
 
         if advertisement.isCrownstoneFamily():
-            self.handlePayload(advertisement)
+            self.handlePayload(advertisement, now)
 
 
-    def handlePayload(self, advertisement: Advertisement):
+    def handlePayload(self, advertisement: Advertisement, now: float = None):
         if advertisement.operationMode == CrownstoneOperationMode.DFU:
             self.verified = True
             self.consecutiveMatches = 0
@@ -60,7 +60,9 @@ class StoneAdvertisementTracker:
         else:
             self.verify(advertisement.serviceData)
 
-        self.timeoutTime = time.time() + self.timeoutDuration
+        if now is None:
+            now = time.time()
+        self.timeoutTime = now + self.timeoutDuration
 
         if hasattr(advertisement.serviceData.payload, "uniqueIdentifier"):
             self.uniqueIdentifier = advertisement.serviceData.payload.uniqueIdentifier
@@ -1,56 +1,87 @@
+import logging
+import time
+from collections import OrderedDict
+
 from crownstone_ble.core.container.ScanDataUtil import fillScanDataFromAdvertisement
 from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.modules.DeviceRegistry import DeviceRegistry
 from crownstone_ble.core.modules.StoneAdvertisementTracker import StoneAdvertisementTracker
 from crownstone_ble.topics.BleTopics import BleTopics
 from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
 
+_LOGGER = logging.getLogger(__name__)
+
 """
 Class that validates advertisements from topic 'SystemBleTopics.rawAdvertisementClass'.
 
-Each MAC address will have its own 'StoneAdvertisementTracker'.
+Each MAC address will have its own 'StoneAdvertisementTracker'. The addresses are normalized to lower case by the scan delegate.
 
 On each 'SystemBleTopics.rawAdvertisementClass', this class will:
 - Call 'update()' on the StoneAdvertisementTracker of that MAC address.
 - Emit 'BleTopics.advertisement', if the address is validated.
 - Emit 'BleTopics.newDataAvailable' if the address is validated, and the rawAdvertisement has service data.
 - Emit 'BleTopics.rawAdvertisement' for all incoming Crownstone messages.
+- Update the record of the address in the DeviceRegistry, if given.
 
-The threading part is removed. This adds a little overhead since the cleanup is called every checkAdvertisement. On the other hand, not threading is usually no issues.
+The threading part is removed, expired trackers are cleaned up on each checkAdvertisement instead.
+The trackers are ordered by their last update. Since they all have the same timeout duration, they expire in that order,
+so the cleanup only has to look at the first trackers, instead of all of them.
 """
 class Validator:
 
-    def __init__(self):
+    def __init__(self, registry: DeviceRegistry = None):
         BleEventBus.subscribe(SystemBleTopics.rawAdvertisementClass, self.checkAdvertisement)
-        self.trackedCrownstones = {}
+        # Ordered from least recently updated to most recently updated.
+        self.trackedCrownstones = OrderedDict()
+        self.registry = registry
+
 
+    def cleanupExpiredTrackers(self, now: float = None):
+        if now is None:
+            now = time.time()
+        while self.trackedCrownstones:
+            address, trackedStone = next(iter(self.trackedCrownstones.items()))
+            if trackedStone.timeoutTime > now:
+                break
+            _LOGGER.debug(f"Timeout {address}")
+            self.trackedCrownstones.popitem(last=False)
 
-    def cleanupExpiredTrackers(self):
-        allKeys = []
-        # we first collect keys because we might delete items from this list during ticks
-        for key, trackedStone in self.trackedCrownstones.items():
-            allKeys.append(key)
 
-        for key in allKeys:
-            self.trackedCrownstones[key].checkForCleanup()
+    def getCrownstoneId(self, address) -> int or None:
+        """
+        Get the Crownstone ID of a validated Crownstone, or None if the address has not been validated.
+        """
+        trackedStone = self.trackedCrownstones.get(address.lower(), None)
+        if trackedStone is not None and trackedStone.verified and trackedStone.crownstoneId != 0:
+            return trackedStone.crownstoneId
+        return None
 
 
     def removeStone(self, address):
-        del self.trackedCrownstones[address]
+        self.trackedCrownstones.pop(address, None)
 
 
     def checkAdvertisement(self, advertisement):
-        self.cleanupExpiredTrackers()
+        now = time.time()
+        self.cleanupExpiredTrackers(now)
 
-        if advertisement.address not in self.trackedCrownstones:
-            self.trackedCrownstones[advertisement.address] = StoneAdvertisementTracker(lambda: self.removeStone(advertisement.address))
+        address = advertisement.address
+        trackedStone = self.trackedCrownstones.get(address, None)
+        if trackedStone is None:
+            trackedStone = StoneAdvertisementTracker(lambda: self.removeStone(address))
+            self.trackedCrownstones[address] = trackedStone
+        else:
+            self.trackedCrownstones.move_to_end(address)
 
-        self.trackedCrownstones[advertisement.address].update(advertisement)
+        trackedStone.update(advertisement, now)
 
         # forward all scans over this topic. It is located here instead of the delegates so it would be easier to convert the json to classes.
-        data = fillScanDataFromAdvertisement(advertisement, self.trackedCrownstones[advertisement.address].verified)
+        data = fillScanDataFromAdvertisement(advertisement, trackedStone.verified)
+        if self.registry is not None:
+            self.registry.update(data, now)
         BleEventBus.emit(BleTopics.rawAdvertisement, data)
-        if self.trackedCrownstones[advertisement.address].verified:
+        if trackedStone.verified:
             BleEventBus.emit(BleTopics.advertisement, data)
 
-            if not self.trackedCrownstones[advertisement.address].duplicate:
+            if not trackedStone.duplicate:
                 BleEventBus.emit(BleTopics.newDataAvailable, data)
@@ -3,3 +3,4 @@ class BleTopics:
      rawAdvertisement  = "rawAdvertisement"
      advertisement     = "advertisement"
      newDataAvailable  = "newDataAvailable"
+     coalescedDataAvailable = "coalescedDataAvailable"
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+This example benchmarks the round trip of commands: writing a control packet and waiting for its result notification.
+It runs against simulated Crownstones, so no Bluetooth adapter or Crownstone is needed.
+
+The result is awaited, instead of polled, so a command takes about as long as the simulated Crownstone needs to answer.
+With a latency of a few milliseconds, 20 setSwitch commands should take well below a second.
+"""
+
+# Asyncio provides the API for using async/await methods.
+import asyncio
+import time
+
+# Import the Crownstone BLE library in order to use it.
+from crownstone_ble import CrownstoneBle
+from crownstone_ble.core.backends.SimulatedBackend import SimulatedBackend
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+
+LATENCY = 0.002              # seconds per Bluetooth operation
+NOTIFICATION_INTERVAL = 0.002
+ITERATIONS = 20
+ADDRESS = "AA:BB:CC:DD:EE:01"
+
+
+# Initialize the Crownstone BLE library, with the simulated backend.
+backend = SimulatedBackend(latency=LATENCY, notificationInterval=NOTIFICATION_INTERVAL)
+core = CrownstoneBle(backend=backend)
+core.setSettings("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+backend.addCrownstone(SimulatedCrownstone(ADDRESS, 1, core.settings))
+
+
+async def benchmark():
+    await core.connect(ADDRESS)
+
+    startTime = time.perf_counter()
+    for i in range(0, ITERATIONS):
+        await core.control.setSwitch(100 * (i % 2))
+    duration = time.perf_counter() - startTime
+    print(f"{ITERATIONS} setSwitch commands in {duration:.3f} s, {1000 * duration / ITERATIONS:.2f} ms each")
+
+    startTime = time.perf_counter()
+    for i in range(0, ITERATIONS):
+        await core.state.getSwitchState()
+    duration = time.perf_counter() - startTime
+    print(f"{ITERATIONS} getSwitchState commands in {duration:.3f} s, {1000 * duration / ITERATIONS:.2f} ms each")
+
+    await core.shutDown()
+
+
+# This is where we actually start running the example.
+# Python does not allow us to run async functions like they're normal functions.
+try:
+    asyncio.run(benchmark())
+except KeyboardInterrupt:
+    # this catches the CONTROL+C case, which can otherwise result in arbitrary interrupt errors.
+    print("Stopping the example.")
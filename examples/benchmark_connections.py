@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+This example benchmarks commanding many Crownstones: one after the other, and with connections that are open at the same time.
+It runs against simulated Crownstones, so no Bluetooth adapter or Crownstone is needed.
+
+It measures:
+- Sequential: connect, switch and disconnect, for each Crownstone in turn.
+- Parallel: connect and switch all Crownstones at the same time, via getConnection().
+- Batch: the same via batch(), with a limited number of concurrent connections.
+"""
+
+# Asyncio provides the API for using async/await methods.
+import asyncio
+import time
+
+from crownstone_core.protocol.ControlPackets import ControlPacketsGenerator
+
+# Import the Crownstone BLE library in order to use it.
+from crownstone_ble import CrownstoneBle
+from crownstone_ble.core.backends.SimulatedBackend import SimulatedBackend
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+
+LATENCY = 0.02               # seconds per Bluetooth operation
+CROWNSTONE_COUNT = 10
+BATCH_CONCURRENCY = 5
+
+
+# Initialize the Crownstone BLE library, with the simulated backend.
+backend = SimulatedBackend(latency=LATENCY)
+core = CrownstoneBle(backend=backend, maxConnections=CROWNSTONE_COUNT)
+core.setSettings("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+
+# Add the simulated Crownstones, they use the same keys as the library.
+addresses = []
+for i in range(0, CROWNSTONE_COUNT):
+    address = f"AA:BB:CC:DD:EE:{i + 1:02X}"
+    addresses.append(address)
+    backend.addCrownstone(SimulatedCrownstone(address, i + 1, core.settings))
+
+
+def report(name, startTime):
+    duration = time.perf_counter() - startTime
+    print(f"{name:<12} {CROWNSTONE_COUNT} Crownstones in {duration:7.3f} s")
+
+
+async def switchConnected(address):
+    await core.connect(address)
+    await core.getConnection(address).control.setSwitch(100)
+
+
+async def benchmark():
+    startTime = time.perf_counter()
+    for address in addresses:
+        await core.connect(address)
+        await core.control.setSwitch(100)
+        await core.disconnect(address)
+    report("sequential", startTime)
+
+    startTime = time.perf_counter()
+    await asyncio.gather(*[switchConnected(address) for address in addresses])
+    report("parallel", startTime)
+    await core.disconnectAll()
+
+    startTime = time.perf_counter()
+    results = await core.batch([(address, ControlPacketsGenerator.getSwitchCommandPacket(0)) for address in addresses], concurrency=BATCH_CONCURRENCY)
+    report("batch", startTime)
+    print(f"{sum(1 for result in results if result.success)} of {len(results)} batch jobs succeeded.")
+
+    await core.shutDown()
+
+
+# This is where we actually start running the example.
+# Python does not allow us to run async functions like they're normal functions.
+try:
+    asyncio.run(benchmark())
+except KeyboardInterrupt:
+    # this catches the CONTROL+C case, which can otherwise result in arbitrary interrupt errors.
+    print("Stopping the example.")
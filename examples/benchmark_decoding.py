@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+This example benchmarks decoding advertisements on the event loop, versus in a pool of workers, see enableDecodingWorkers().
+It runs against simulated Crownstones, so no Bluetooth adapter or Crownstone is needed.
+
+While advertisements with new service data come in, the event loop also runs a 2 ms ticker, and switches a connected Crownstone.
+For each mode, it reports:
+- The CPU time of the event loop thread.
+- How late the ticker was: the more the loop is blocked by decoding, the later it is.
+- The average duration of a setSwitch command.
+- The decoding statistics, like the lag between receiving and emitting an advertisement.
+
+Run it with the modes to compare as arguments, for example: benchmark_decoding.py inline threads processes
+"""
+
+# Asyncio provides the API for using async/await methods.
+import asyncio
+import statistics
+import sys
+import time
+
+# Import the Crownstone BLE library in order to use it.
+from crownstone_ble import CrownstoneBle, BleEventBus
+from crownstone_ble.core.backends.SimulatedBackend import SimulatedBackend
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
+
+MODES = ["inline", "batched", "threads", "processes"]
+LATENCY = 0.005              # seconds per Bluetooth operation
+ADVERTISEMENTS_PER_BURST = 15
+BURST_INTERVAL = 0.01        # seconds between bursts of advertisements
+DURATION = 3.0               # seconds
+CROWNSTONE_COUNT = 300
+PAYLOAD_COUNT = 4000
+TICK_INTERVAL = 0.002
+ADDRESS = "AA:BB:CC:DD:EE:01"
+
+
+def getPayloads(settings) -> list:
+    """
+    Get advertisements with new service data, up front, so only the decoding is measured.
+    """
+    crownstones = [SimulatedCrownstone(f"AA:BB:CC:00:{i // 256:02X}:{i % 256:02X}", i % 250 + 1, settings) for i in range(0, CROWNSTONE_COUNT)]
+    payloads = []
+    for i in range(0, PAYLOAD_COUNT):
+        crownstone = crownstones[i % CROWNSTONE_COUNT]
+        crownstone.temperature = (i // CROWNSTONE_COUNT) % 100
+        payloads.append((crownstone.address.lower(), -60, crownstone.name, list(crownstone.getServiceData()), 0xC001))
+    return payloads
+
+
+async def benchmark(mode):
+    # Initialize the Crownstone BLE library, with the simulated backend. The advertisements are fed to the scan delegate directly.
+    backend = SimulatedBackend(latency=LATENCY, advertisementInterval=10)
+    core = CrownstoneBle(backend=backend)
+    core.setSettings("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+    backend.addCrownstone(SimulatedCrownstone(ADDRESS, 1, core.settings))
+    payloads = getPayloads(core.settings)
+
+    if mode == "batched":
+        core.enableDecodingWorkers(workers=0)
+    elif mode == "threads":
+        core.enableDecodingWorkers(workers=2)
+    elif mode == "processes":
+        core.enableDecodingWorkers(workers=2, useProcesses=True)
+
+    received = [0]
+    def handleAdvertisement(advertisement):
+        received[0] += 1
+    subscriptionId = BleEventBus.subscribe(SystemBleTopics.rawAdvertisementClass, handleAdvertisement)
+    await core.connect(ADDRESS)
+
+    running = True
+    lateness = []
+    commandDurations = []
+
+    async def tick():
+        while running:
+            startTime = time.perf_counter()
+            await asyncio.sleep(TICK_INTERVAL)
+            lateness.append(time.perf_counter() - startTime - TICK_INTERVAL)
+
+    async def switch():
+        while running:
+            startTime = time.perf_counter()
+            await core.control.setSwitch(100)
+            commandDurations.append(time.perf_counter() - startTime)
+
+    async def advertise():
+        sent = 0
+        endTime = time.perf_counter() + DURATION
+        while time.perf_counter() < endTime:
+            for i in range(0, ADVERTISEMENTS_PER_BURST):
+                core.ble.scanDelegate.parsePayload(*payloads[sent % len(payloads)])
+                sent += 1
+            await asyncio.sleep(BURST_INTERVAL)
+        return sent
+
+    tickTask = asyncio.ensure_future(tick())
+    switchTask = asyncio.ensure_future(switch())
+    startCpuTime = time.thread_time()
+    sent = await advertise()
+    # Give the workers time to finish.
+    await asyncio.sleep(0.5)
+    running = False
+    await tickTask
+    await switchTask
+    cpuTime = time.thread_time() - startCpuTime
+
+    lateness.sort()
+    print(f"{mode:<10} loop thread CPU {cpuTime:.2f} s, sent {sent}, emitted {received[0]}, "
+          f"loop lateness avg {1000 * statistics.mean(lateness):.2f} ms, p99 {1000 * lateness[int(len(lateness) * 0.99)]:.2f} ms, "
+          f"setSwitch avg {1000 * statistics.mean(commandDurations):.1f} ms")
+    decodingStatistics = core.getDecodingStatistics()
+    if decodingStatistics is not None:
+        print(f"{'':<10} {decodingStatistics}")
+
+    BleEventBus.unsubscribe(subscriptionId)
+    await core.shutDown()
+
+
+# This is where we actually start running the example.
+# Python does not allow us to run async functions like they're normal functions.
+try:
+    for mode in sys.argv[1:] or MODES:
+        if mode not in MODES:
+            print(f"Unknown mode {mode}, use one of {MODES}")
+            continue
+        asyncio.run(benchmark(mode))
+except KeyboardInterrupt:
+    # this catches the CONTROL+C case, which can otherwise result in arbitrary interrupt errors.
+    print("Stopping the example.")
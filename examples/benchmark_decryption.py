@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+This example benchmarks decrypting and parsing advertisements one by one, versus in batches.
+It uses the service data of simulated Crownstones, so no Bluetooth adapter or Crownstone is needed.
+
+For 1k, 10k and 100k advertisements, it measures the time per advertisement of:
+- Decrypting only: per packet with crownstone_core's EncryptionHandler, versus batched with the BatchDecryptor.
+- Decrypting and parsing: per packet with crownstone_core, with parseAdvertisement(), and batched with parseAdvertisements().
+
+The batched decryption is a lot faster with the optional cryptography package, the AES implementation that is used is printed.
+"""
+
+import time
+
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+from crownstone_core.packets.Advertisement import Advertisement
+from crownstone_core.util.EncryptionHandler import EncryptionHandler
+
+# Import the Crownstone BLE library in order to use it.
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+import crownstone_ble.core.modules.BatchDecryptor as BatchDecryptorModule
+from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import parseAdvertisement, parseAdvertisements, batchDecryptor
+from crownstone_ble.core.modules.AdvertisementDecoder import DEFAULT_DECODING_BATCH_SIZE
+
+COUNTS = [1000, 10000, 100000]
+CROWNSTONE_COUNT = 200
+PAYLOAD_COUNT = 2000         # Number of different payloads, these are repeated to get the counts. Nothing is cached.
+BATCH_SIZE = DEFAULT_DECODING_BATCH_SIZE
+
+
+settings = EncryptionSettings()
+settings.loadKeys("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+serviceDataKey = settings.serviceDataKey
+
+# Get the advertisements of the simulated Crownstones up front, so only the decryption and parsing are measured.
+crownstones = [SimulatedCrownstone(f"AA:BB:CC:DD:{i // 256:02X}:{i % 256:02X}", i % 250 + 1, settings) for i in range(0, CROWNSTONE_COUNT)]
+payloads = []
+for i in range(0, PAYLOAD_COUNT):
+    crownstone = crownstones[i % CROWNSTONE_COUNT]
+    crownstone.temperature = i // CROWNSTONE_COUNT
+    payloads.append((crownstone.address.lower(), -60, crownstone.name, list(crownstone.getServiceData()), 0xC001))
+
+
+def getPayloads(count):
+    return [payloads[i % PAYLOAD_COUNT] for i in range(0, count)]
+
+
+def getBatches(items):
+    return [items[i : i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+
+
+def measure(function, count):
+    """
+    :returns: The time per advertisement in microseconds.
+    """
+    startTime = time.perf_counter()
+    function()
+    return 1e6 * (time.perf_counter() - startTime) / count
+
+
+def decryptPerPacket(blocks):
+    for block in blocks:
+        EncryptionHandler.decryptECB(block, serviceDataKey)
+
+
+def decryptBatched(blocks):
+    for batch in getBatches(blocks):
+        batchDecryptor.decryptBlocks(batch, serviceDataKey)
+
+
+def parsePerPacketCore(countPayloads):
+    for address, rssi, nameText, serviceDataArray, serviceUUID in countPayloads:
+        # The service data is decrypted in place, so it's copied to be able to parse it again.
+        advertisement = Advertisement(address, rssi, nameText, list(serviceDataArray), serviceUUID)
+        advertisement.parse(serviceDataKey)
+
+
+def parsePerPacket(countPayloads):
+    for payload in countPayloads:
+        parseAdvertisement(*payload, serviceDataKey)
+
+
+def parseBatched(countPayloads):
+    for batch in getBatches(countPayloads):
+        parseAdvertisements(batch, serviceDataKey)
+
+
+print(f"AES implementation of the batches: {'cryptography' if BatchDecryptorModule.Cipher is not None else 'pyaes'}, batch size {BATCH_SIZE}")
+print(f"{'count':>7} | {'decrypt per packet':>18} {'batched':>9} | {'parse crownstone_core':>21} {'parseAdvertisement':>18} {'parseAdvertisements':>19}")
+for count in COUNTS:
+    countPayloads = getPayloads(count)
+    blocks = [serviceDataArray[2:] for address, rssi, nameText, serviceDataArray, serviceUUID in countPayloads]
+
+    decryptPerPacketTime = measure(lambda: decryptPerPacket(blocks), count)
+    decryptBatchedTime = measure(lambda: decryptBatched(blocks), count)
+    parseCoreTime = measure(lambda: parsePerPacketCore(countPayloads), count)
+    parsePerPacketTime = measure(lambda: parsePerPacket(countPayloads), count)
+    parseBatchedTime = measure(lambda: parseBatched(countPayloads), count)
+    print(f"{count:>7} | {decryptPerPacketTime:>15.2f} us {decryptBatchedTime:>6.2f} us | "
+          f"{parseCoreTime:>18.2f} us {parsePerPacketTime:>15.2f} us {parseBatchedTime:>16.2f} us")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+"""
+This example benchmarks parsing advertisements, with and without the cache of parsed advertisements.
+It uses the service data of simulated Crownstones, so no Bluetooth adapter or Crownstone is needed.
+
+Crownstones repeat the same encrypted service data until their state changes. With the cache, repeated service data is
+not decrypted and parsed again.
+"""
+
+import time
+
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+
+# Import the Crownstone BLE library in order to use it.
+from crownstone_ble import BleEventBus
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import BleakScanDelegate, DEFAULT_PARSE_CACHE_SIZE
+from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
+
+CROWNSTONE_COUNT = 50
+ROUNDS = 200
+ROUNDS_PER_STATE = 20        # Number of advertisements with the same service data, before the state changes.
+
+
+settings = EncryptionSettings()
+settings.loadKeys("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+
+# Get the advertisements of the simulated Crownstones up front, so only the parsing is measured.
+crownstones = [SimulatedCrownstone(f"AA:BB:CC:DD:EE:{i + 1:02X}", i + 1, settings) for i in range(0, CROWNSTONE_COUNT)]
+payloads = []
+for roundIndex in range(0, ROUNDS):
+    for crownstone in crownstones:
+        crownstone.temperature = roundIndex // ROUNDS_PER_STATE
+        payloads.append((crownstone.address.lower(), -60, crownstone.name, list(crownstone.getServiceData()), 0xC001))
+
+
+def benchmark(cacheSize):
+    delegate = BleakScanDelegate(settings, cacheSize=cacheSize)
+    received = [0]
+    def handleAdvertisement(advertisement):
+        received[0] += 1
+    subscriptionId = BleEventBus.subscribe(SystemBleTopics.rawAdvertisementClass, handleAdvertisement)
+
+    startTime = time.perf_counter()
+    for payload in payloads:
+        delegate.parsePayload(*payload)
+    duration = time.perf_counter() - startTime
+    BleEventBus.unsubscribe(subscriptionId)
+
+    statistics = delegate.getCacheStatistics()
+    print(f"cache size {cacheSize:>5}: {received[0]} advertisements in {duration:.3f} s, {statistics['hits']} hits, {statistics['misses']} misses")
+
+
+benchmark(0)
+benchmark(DEFAULT_PARSE_CACHE_SIZE)
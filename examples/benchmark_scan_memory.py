@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+This example benchmarks the memory use and throughput of handling a large stream of advertisements.
+It generates a capture of 1M advertisements of simulated Crownstones, and replays it, so no Bluetooth adapter or Crownstone is needed.
+
+It measures:
+- Throughput: the capture is replayed as fast as possible through the scan delegate and validator.
+- Memory: the ScanData of the last 100k advertisements is kept, tracemalloc measures the memory that's freed when it's released.
+  Before: like the ScanData used to be, with a __dict__ and its own lower case copy of the address.
+  After:  the ScanData with __slots__, and the address that is normalized once by the scan delegate.
+
+Pass a filename as argument to keep the generated capture, or to replay an existing one.
+"""
+
+# Asyncio provides the API for using async/await methods.
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+# Import the Crownstone BLE library in order to use it.
+from crownstone_ble import CrownstoneBle, BleTopics, BleEventBus
+from crownstone_ble.core.backends.SimulatedBackend import SimulatedBackend
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.modules.AdvertisementCapture import AdvertisementRecorder
+
+ADVERTISEMENT_COUNT = 1000000
+CROWNSTONE_COUNT = 50
+ADVERTISEMENTS_PER_STATE = 20    # Number of advertisements with the same service data, before the state of a Crownstone changes.
+ADVERTISEMENT_INTERVAL = 0.1     # seconds between advertisements of each Crownstone, in the capture.
+RETAINED_COUNT = 100000
+
+
+class UnslottedScanData:
+    """
+    The ScanData as it was before: with a __dict__, and its own lower case copy of the address.
+    """
+
+    def __init__(self, scanData):
+        self.address       = scanData.address.lower()
+        self.rssi          = scanData.rssi
+        self.name          = scanData.name
+        self.operationMode = scanData.operationMode
+        self.deviceType    = scanData.deviceType
+        self.payload       = scanData.payload
+        self.validated     = scanData.validated
+
+
+def generateCapture(filename, settings):
+    """
+    Record the advertisements of simulated Crownstones, the state of each Crownstone changes every ADVERTISEMENTS_PER_STATE advertisements.
+    """
+    crownstones = [SimulatedCrownstone(f"AA:BB:CC:DD:EE:{i + 1:02X}", i + 1, settings) for i in range(0, CROWNSTONE_COUNT)]
+    recorder = AdvertisementRecorder(filename)
+    timestamp = time.time()
+    serviceData = [None] * CROWNSTONE_COUNT
+    for i in range(0, ADVERTISEMENT_COUNT):
+        crownstoneIndex = i % CROWNSTONE_COUNT
+        crownstone = crownstones[crownstoneIndex]
+        roundIndex = i // CROWNSTONE_COUNT
+        if roundIndex % ADVERTISEMENTS_PER_STATE == 0:
+            crownstone.temperature = (roundIndex // ADVERTISEMENTS_PER_STATE) % 100
+            serviceData[crownstoneIndex] = crownstone.getServiceData()
+        recorder.record(crownstone.address.lower(), -60, crownstone.name, serviceData[crownstoneIndex], 0xC001,
+                        timestamp + roundIndex * ADVERTISEMENT_INTERVAL)
+    recorder.close()
+
+
+# Initialize the Crownstone BLE library, with the simulated backend. The capture is replayed, instead of scanned.
+core = CrownstoneBle(backend=SimulatedBackend())
+core.setSettings("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+
+
+async def measureThroughput(filename):
+    """
+    :returns: Tuple (number of replayed advertisements, duration in seconds).
+    """
+    startTime = time.perf_counter()
+    count = await core.replayAdvertisements(filename, speed=None)
+    duration = time.perf_counter() - startTime
+    return count, duration
+
+
+async def measureRetainedMemory(filename, convert=None):
+    """
+    Replay the capture as fast as possible, while keeping the ScanData of the last RETAINED_COUNT advertisements.
+    :param convert:   Function that converts the retained ScanData, or None to keep it as is.
+    :returns:         The memory in bytes that is freed when the retained ScanData is released.
+    """
+    retained = deque(maxlen=RETAINED_COUNT)
+    if convert is None:
+        subscriptionId = BleEventBus.subscribe(BleTopics.rawAdvertisement, retained.append)
+    else:
+        subscriptionId = BleEventBus.subscribe(BleTopics.rawAdvertisement, lambda scanData: retained.append(convert(scanData)))
+
+    tracemalloc.start()
+    await core.replayAdvertisements(filename, speed=None)
+    retainedMemory = tracemalloc.get_traced_memory()[0]
+    retained.clear()
+    retainedMemory -= tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    BleEventBus.unsubscribe(subscriptionId)
+    return retainedMemory
+
+
+async def benchmark(filename):
+    count, duration = await measureThroughput(filename)
+    print(f"Replayed {count} advertisements in {duration:.2f} s: {count / duration / 1000:.1f}k advertisements/s")
+    for name, convert in [("before", UnslottedScanData), ("after", None)]:
+        memory = await measureRetainedMemory(filename, convert)
+        print(f"{name:<7} {RETAINED_COUNT} retained ScanData use {memory / 1e6:5.1f} MB, {memory / RETAINED_COUNT:.0f} bytes each")
+    await core.shutDown()
+
+
+# This is where we actually start running the example.
+# Python does not allow us to run async functions like they're normal functions.
+try:
+    captureFilename = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.mkdtemp(), "advertisements.csadv")
+    if not os.path.isfile(captureFilename):
+        startTime = time.perf_counter()
+        generateCapture(captureFilename, core.settings)
+        print(f"Generated {captureFilename} in {time.perf_counter() - startTime:.1f} s, {os.path.getsize(captureFilename) / 1e6:.1f} MB")
+    asyncio.run(benchmark(captureFilename))
+    if len(sys.argv) <= 1:
+        os.remove(captureFilename)
+except KeyboardInterrupt:
+    # this catches the CONTROL+C case, which can otherwise result in arbitrary interrupt errors.
+    print("Stopping the example.")
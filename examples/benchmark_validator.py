@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""
+This example benchmarks validating advertisements of many Crownstones, see Validator.checkAdvertisement().
+It uses advertisements of simulated Crownstones, so no Bluetooth adapter or Crownstone is needed.
+
+100k advertisements of 1000 addresses are validated:
+- Before: on each advertisement, every tracker is checked for expiry, like the validator used to do.
+- After:  the trackers are kept in order of their last update, so only the oldest ones are checked for expiry.
+"""
+
+import time
+
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+
+# Import the Crownstone BLE library in order to use it.
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import parseAdvertisements
+from crownstone_ble.core.modules.Validator import Validator
+
+ADDRESS_COUNT = 1000
+ADVERTISEMENT_COUNT = 100000
+STATES_PER_ADDRESS = 5       # Number of different advertisements per address, these are repeated to get the count.
+
+
+class ScanningValidator(Validator):
+    """
+    The validator as it was before: on each advertisement, all trackers are checked for expiry.
+    """
+
+    def cleanupExpiredTrackers(self, now: float = None):
+        for trackedStone in list(self.trackedCrownstones.values()):
+            trackedStone.checkForCleanup()
+
+
+settings = EncryptionSettings()
+settings.loadKeys("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+
+# Parse the advertisements of the simulated Crownstones up front, so only the validation is measured.
+crownstones = [SimulatedCrownstone(f"AA:BB:CC:DD:{i // 256:02X}:{i % 256:02X}", i % 250 + 1, settings) for i in range(0, ADDRESS_COUNT)]
+payloads = []
+for state in range(0, STATES_PER_ADDRESS):
+    for crownstone in crownstones:
+        crownstone.temperature = state
+        payloads.append((crownstone.address.lower(), -60, crownstone.name, list(crownstone.getServiceData()), 0xC001))
+advertisements = parseAdvertisements(payloads, settings.serviceDataKey)
+
+
+def benchmark(name, validator):
+    startTime = time.perf_counter()
+    for i in range(0, ADVERTISEMENT_COUNT):
+        validator.checkAdvertisement(advertisements[i % len(advertisements)])
+    duration = time.perf_counter() - startTime
+    print(f"{name:<7} {ADVERTISEMENT_COUNT} advertisements of {len(validator.trackedCrownstones)} addresses in {duration:7.3f} s, "
+          f"{1e6 * duration / ADVERTISEMENT_COUNT:7.2f} us per advertisement")
+
+
+benchmark("before", ScanningValidator())
+benchmark("after", Validator())
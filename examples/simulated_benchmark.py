@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""
+This example benchmarks the library against simulated Crownstones, so no Bluetooth adapter or Crownstone is needed.
+It can be used to spot performance regressions, for example in CI.
+
+It measures:
+- Connecting, including reading the session nonce.
+- Switching.
+- Getting power samples.
+- Setting asset filters.
+- Processing advertisements.
+
+The simulation is configured with the constants below: latency per Bluetooth operation, and packet loss.
+"""
+
+# Asyncio provides the API for using async/await methods.
+import asyncio
+import time
+
+from crownstone_core.packets.assetFilter.builders.AssetFilter import AssetFilter
+from crownstone_core.protocol.BluenetTypes import PowerSamplesType
+
+# Import the Crownstone BLE library in order to use it.
+from crownstone_ble import CrownstoneBle, BleEventBus, BleTopics
+from crownstone_ble.core.backends.SimulatedBackend import SimulatedBackend
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+
+LATENCY = 0.01               # seconds per Bluetooth operation
+NOTIFICATION_INTERVAL = 0.0075
+PACKET_LOSS = 0.0
+CROWNSTONE_COUNT = 10
+ITERATIONS = 20
+
+
+# Initialize the Crownstone BLE library, with the simulated backend.
+backend = SimulatedBackend(latency=LATENCY, packetLoss=PACKET_LOSS, notificationInterval=NOTIFICATION_INTERVAL, advertisementInterval=0.01)
+core = CrownstoneBle(backend=backend)
+core.setSettings("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+
+# Add the simulated Crownstones, they use the same keys as the library.
+addresses = []
+for i in range(0, CROWNSTONE_COUNT):
+    address = f"AA:BB:CC:DD:EE:{i + 1:02X}"
+    addresses.append(address)
+    backend.addCrownstone(SimulatedCrownstone(address, i + 1, core.settings))
+
+
+def report(name, startTime, count):
+    duration = time.perf_counter() - startTime
+    print(f"{name:<20} {count:>6} in {duration:7.3f} s, {1000 * duration / count:8.2f} ms each")
+
+
+async def benchmark():
+    startTime = time.perf_counter()
+    for i in range(0, ITERATIONS):
+        await core.connect(addresses[0])
+        await core.disconnect(addresses[0])
+    report("connect", startTime, ITERATIONS)
+
+    await core.connect(addresses[0])
+    startTime = time.perf_counter()
+    for i in range(0, ITERATIONS):
+        await core.control.setSwitch(100 * (i % 2))
+    report("setSwitch", startTime, ITERATIONS)
+
+    startTime = time.perf_counter()
+    for i in range(0, ITERATIONS):
+        await core.debug.getPowerSamplesAtIndex(PowerSamplesType.NOW_FILTERED, 0)
+    report("getPowerSamples", startTime, ITERATIONS)
+
+    filters = []
+    for i in range(0, 3):
+        assetFilter = AssetFilter(i)
+        assetFilter.filterByMacAddress([f"01:23:45:67:89:{j:02X}" for j in range(0, 10)])
+        assetFilter.outputMacRssiReport()
+        filters.append(assetFilter)
+    startTime = time.perf_counter()
+    await core.control.setFilters(filters)
+    report("setFilters", startTime, 1)
+    await core.disconnect(addresses[0])
+
+    # Crownstones are validated after a few advertisements with a different unique identifier, which changes every second.
+    received = {BleTopics.rawAdvertisement: 0, BleTopics.advertisement: 0}
+    def handleAdvertisement(topic):
+        received[topic] += 1
+    subscriptionIds = [BleEventBus.subscribe(topic, lambda data, topic=topic: handleAdvertisement(topic)) for topic in received]
+    startTime = time.perf_counter()
+    await core.startScanning(5)
+    for subscriptionId in subscriptionIds:
+        BleEventBus.unsubscribe(subscriptionId)
+    report("advertisements", startTime, max(1, received[BleTopics.rawAdvertisement]))
+    print(f"{received[BleTopics.advertisement]} of the advertisements were validated.")
+
+    await core.shutDown()
+
+
+# This is where we actually start running the example.
+# Python does not allow us to run async functions like they're normal functions.
+try:
+    asyncio.run(benchmark())
+except KeyboardInterrupt:
+    # this catches the CONTROL+C case, which can otherwise result in arbitrary interrupt errors.
+    print("Stopping the example.")
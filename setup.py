@@ -14,6 +14,12 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/crownstone/crownstone-lib-python-ble",
     install_requires=list(package.strip() for package in open('requirements.txt')),
+    extras_require={
+        # For power samples as NumPy arrays, see PowerSamplesArrays.
+        'numpy': ['numpy'],
+        # To decrypt the service data of many advertisements in one call, see BatchDecryptor.
+        'cryptography': ['cryptography'],
+    },
     classifiers=[
         'Programming Language :: Python :: 3.7'
     ],
@@ -0,0 +1,53 @@
+import pytest
+
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+
+from crownstone_ble import CrownstoneBle
+from crownstone_ble.core.backends.SimulatedBackend import SimulatedBackend
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+
+SIMULATED_CROWNSTONE_COUNT = 5
+SIMULATED_KEYS = ["adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey"]
+
+
+def getSimulatedAddress(index: int) -> str:
+    return f"AA:BB:CC:DD:EE:{index + 1:02X}"
+
+
+def getSimulatedSettings() -> EncryptionSettings:
+    """
+    :returns: Encryption settings with the keys that the simulated Crownstones use.
+    """
+    settings = EncryptionSettings()
+    settings.loadKeys(*SIMULATED_KEYS)
+    return settings
+
+
+def getAdvertisementPayload(crownstone: SimulatedCrownstone, rssi: int = None) -> tuple:
+    """
+    :returns: The current advertisement of a simulated Crownstone, as (address, rssi, nameText, serviceDataArray, serviceUUID) payload,
+              with the address normalized like the scan delegate does.
+    """
+    rssi = crownstone.rssi if rssi is None else rssi
+    return crownstone.address.lower(), rssi, crownstone.name, list(crownstone.getServiceData()), 0xC001
+
+
+def createSimulatedCore(crownstoneCount: int = SIMULATED_CROWNSTONE_COUNT, backend: SimulatedBackend = None, **kwargs) -> CrownstoneBle:
+    """
+    Create a CrownstoneBle with a simulated backend, and simulated Crownstones that use the same keys.
+    :param kwargs:  Extra arguments for CrownstoneBle, like maxConnections.
+    """
+    backend = backend if backend is not None else SimulatedBackend()
+    core = CrownstoneBle(backend=backend, **kwargs)
+    core.setSettings(*SIMULATED_KEYS)
+    for i in range(0, crownstoneCount):
+        backend.addCrownstone(SimulatedCrownstone(getSimulatedAddress(i), i + 1, core.settings))
+    return core
+
+
+@pytest.fixture
+def simulatedCore():
+    """
+    Call core.shutDown() at the end of the test, within the event loop of the test.
+    """
+    return createSimulatedCore()
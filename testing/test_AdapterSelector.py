@@ -0,0 +1,86 @@
+import asyncio
+
+from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.backends.SimulatedBackend import SimulatedBackend
+from crownstone_ble.core.modules.AdapterSelector import AdapterSelector
+from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
+from testing.conftest import createSimulatedCore, getSimulatedAddress
+
+ADAPTER_ADDRESSES = ["00:00:00:00:00:01", "00:00:00:00:00:02"]
+
+
+def test_handleDetection_dropsDuplicatesOfOtherAdapters():
+    selector = AdapterSelector(2, duplicateWindow=0.05)
+    address = getSimulatedAddress(0).lower()
+
+    assert selector.handleDetection(0, address, -70, b"a", now=10.0)
+    # The same advertisement, received by the other adapter.
+    assert not selector.handleDetection(1, address, -50, b"a", now=10.01)
+    # The next advertisement of the same adapter, with the same service data, is not a duplicate.
+    assert selector.handleDetection(0, address, -70, b"a", now=10.02)
+    # New service data, or outside the duplicate window, is not a duplicate.
+    assert selector.handleDetection(1, address, -50, b"b", now=10.03)
+    assert selector.handleDetection(0, address, -70, b"b", now=10.2)
+
+    assert selector.detectionCount == 5
+    assert selector.duplicateCount == 1
+    # Duplicates still update the RSSI of their adapter.
+    assert selector.getRssi(address, 1, now=10.01) == -50
+
+
+def test_selectAdapter_bestScore():
+    selector = AdapterSelector(2, connectionPenalty=5)
+    address = getSimulatedAddress(0).lower()
+    selector.handleDetection(0, address, -70, b"a")
+    selector.handleDetection(1, address, -62, b"a")
+
+    assert selector.selectAdapter(address, [0, 0], 5) == 1
+    # Two connections on the second adapter make the first one the better choice.
+    assert selector.selectAdapter(address, [0, 2], 5) == 0
+    assert selector.selectAdapter(address, [0, 5], 5) == 0
+    assert selector.selectAdapter(address, [5, 5], 5) is None
+    # Unknown addresses are spread over the adapters.
+    assert selector.selectAdapter(getSimulatedAddress(1), [1, 0], 5) == 1
+
+
+def test_scan_forwardsEachAdvertisementOnce():
+    backend = SimulatedBackend(advertisementInterval=0.02)
+    core = createSimulatedCore(crownstoneCount=2, backend=backend, bleAdapterAddress=ADAPTER_ADDRESSES)
+    received = []
+    subscriptionId = BleEventBus.subscribe(SystemBleTopics.rawAdvertisementClass, received.append)
+
+    async def run():
+        try:
+            await core.startScanning(0.3)
+        finally:
+            BleEventBus.unsubscribe(subscriptionId)
+            await core.shutDown()
+
+    asyncio.run(run())
+    selector = core.ble.adapterSelector
+    assert backend.advertisementCount > 0
+    # Every advertisement is received by both adapters, but forwarded once.
+    assert selector.detectionCount == 2 * backend.advertisementCount
+    assert selector.duplicateCount == backend.advertisementCount
+    assert len(received) == backend.advertisementCount
+
+
+def test_connect_usesAdapterWithBestRssi():
+    backend = SimulatedBackend(advertisementInterval=0.02)
+    core = createSimulatedCore(crownstoneCount=2, backend=backend, bleAdapterAddress=ADAPTER_ADDRESSES)
+    addresses = [getSimulatedAddress(i) for i in range(0, 2)]
+    backend.getCrownstone(addresses[0]).adapterRssi = {ADAPTER_ADDRESSES[0]: -80, ADAPTER_ADDRESSES[1]: -50}
+    backend.getCrownstone(addresses[1]).adapterRssi = {ADAPTER_ADDRESSES[0]: -55, ADAPTER_ADDRESSES[1]: None}
+
+    async def run():
+        try:
+            await core.startScanning(0.1)
+            await core.connect(addresses[0])
+            await core.connect(addresses[1])
+            assert core.ble.getAdapterAddress(addresses[0]) == ADAPTER_ADDRESSES[1]
+            assert core.ble.getAdapterAddress(addresses[1]) == ADAPTER_ADDRESSES[0]
+            assert core.ble.getConnectionCounts() == [1, 1]
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
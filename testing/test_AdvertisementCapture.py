@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from crownstone_core.Exceptions import CrownstoneBleException
+from crownstone_core.protocol.Services import DFU_ADVERTISEMENT_SERVICE_UUID
+
+from crownstone_ble.Exceptions import BleError
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.modules.AdvertisementCapture import AdvertisementRecorder, AdvertisementReplayer, CAPTURE_MAGIC, CAPTURE_VERSION, HEADER_FORMAT
+from testing.conftest import getAdvertisementPayload, getSimulatedAddress, getSimulatedSettings
+
+
+def recordCapture(filename, records: list) -> list:
+    """
+    Record the (timestamp, address, rssi, name, serviceData, serviceUUID) records, and return them as they should be replayed.
+    """
+    recorder = AdvertisementRecorder(filename)
+    for timestamp, address, rssi, name, serviceData, serviceUUID in records:
+        recorder.record(address, rssi, name, serviceData, serviceUUID, timestamp)
+    recorder.close()
+    return records
+
+
+def getRecords() -> list:
+    settings = getSimulatedSettings()
+    crownstone = SimulatedCrownstone(getSimulatedAddress(0), 1, settings)
+    address, rssi, name, serviceData, serviceUUID = getAdvertisementPayload(crownstone, rssi=-60)
+    return [
+        (1000.0, address, rssi, name, serviceData, serviceUUID),
+        (1000.5, address, -70, None, serviceData, serviceUUID),
+        (1001.0, getSimulatedAddress(1), -80, "DFU", [1, 2, 3], DFU_ADVERTISEMENT_SERVICE_UUID),
+    ]
+
+
+def test_replayer_roundTrip(tmp_path):
+    filename = str(tmp_path / "capture.csadv")
+    records = recordCapture(filename, getRecords())
+
+    replayed = list(AdvertisementReplayer(filename).records())
+    assert replayed == records
+    # The DFU service UUID is stored as a code, but replayed as the full UUID.
+    assert replayed[2][5] == DFU_ADVERTISEMENT_SERVICE_UUID
+
+
+def test_replay_passesRecordsToHandler(tmp_path):
+    filename = str(tmp_path / "capture.csadv")
+    records = recordCapture(filename, getRecords())
+    handled = []
+
+    async def run():
+        return await AdvertisementReplayer(filename).replay(lambda *record: handled.append(record), speed=None)
+
+    assert asyncio.run(run()) == len(records)
+    assert handled == [record[1:] for record in records]
+
+
+def test_replayer_skipsTruncatedLastRecord(tmp_path):
+    filename = str(tmp_path / "capture.csadv")
+    records = recordCapture(filename, getRecords())
+    with open(filename, "r+b") as fileHandle:
+        fileHandle.truncate(fileHandle.seek(0, 2) - 1)
+
+    assert list(AdvertisementReplayer(filename).records()) == records[0:-1]
+
+
+@pytest.mark.parametrize("header", [
+    HEADER_FORMAT.pack(b"OTHER", CAPTURE_VERSION),
+    HEADER_FORMAT.pack(CAPTURE_MAGIC, CAPTURE_VERSION + 1),
+    CAPTURE_MAGIC,
+])
+def test_replayer_rejectsInvalidHeader(tmp_path, header):
+    filename = str(tmp_path / "capture.csadv")
+    with open(filename, "wb") as fileHandle:
+        fileHandle.write(header)
+
+    with pytest.raises(CrownstoneBleException) as err:
+        list(AdvertisementReplayer(filename).records())
+    assert err.value.type == BleError.INVALID_CAPTURE_FILE
+
+
+def test_recorder_skipsUnsupportedServiceUuid(tmp_path):
+    filename = str(tmp_path / "capture.csadv")
+    records = getRecords()
+    recorder = AdvertisementRecorder(filename)
+    assert recorder.record(*records[0][1:], records[0][0])
+    assert not recorder.record(getSimulatedAddress(2), -60, None, [1, 2], "0000fe59-0000-1000-8000-00805f9b34fb")
+    assert not recorder.record(getSimulatedAddress(2), -60, None, [1, 2], 0x10000)
+    recorder.close()
+    assert recorder.skippedCount == 2
+
+    assert list(AdvertisementReplayer(filename).records()) == records[0:1]
@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import crownstone_ble.core.modules.AdvertisementDecoder as AdvertisementDecoderModule
+from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import BleakScanDelegate, parseAdvertisement
+from crownstone_ble.core.modules.AdvertisementDecoder import AdvertisementDecoder
+from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
+from testing.conftest import getAdvertisementPayload, getSimulatedAddress, getSimulatedSettings
+
+
+def getPayloads(settings, count: int, crownstoneCount: int = 3) -> list:
+    """
+    :returns: Payloads with different service data, the temperature is the index of the payload.
+    """
+    crownstones = [SimulatedCrownstone(getSimulatedAddress(i), i + 1, settings) for i in range(0, crownstoneCount)]
+    payloads = []
+    for i in range(0, count):
+        crownstone = crownstones[i % crownstoneCount]
+        crownstone.temperature = i
+        payloads.append(getAdvertisementPayload(crownstone))
+    return payloads
+
+
+def getTemperatures(advertisements: list) -> list:
+    return [advertisement.serviceData.payload.temperature for advertisement in advertisements]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_submit_emitsInOrder(workers):
+    settings = getSimulatedSettings()
+    payloads = getPayloads(settings, 50)
+    emitted = []
+
+    async def run():
+        decoder = AdvertisementDecoder(settings, emitted.append, workers=workers, batchSize=8, batchInterval=0.01)
+        for i, payload in enumerate(payloads):
+            decoder.submit(i, payload)
+        for i in range(0, 100):
+            if len(emitted) == len(payloads):
+                break
+            await asyncio.sleep(0.01)
+        decoder.stop()
+        assert decoder.getStatistics()["queueDepth"] == 0
+        assert decoder.getStatistics()["decoded"] == len(payloads)
+
+    asyncio.run(run())
+    assert getTemperatures(emitted) == list(range(0, len(payloads)))
+
+
+def test_submit_waitsForEarlierBatches(monkeypatch):
+    settings = getSimulatedSettings()
+    payloads = getPayloads(settings, 8)
+    emitted = []
+    firstBatchDone = threading.Event()
+
+    decodeAdvertisements = AdvertisementDecoderModule.decodeAdvertisements
+    def decodeFirstBatchSlowly(batchPayloads, serviceDataKey):
+        if batchPayloads[0] is payloads[0]:
+            time.sleep(0.1)
+            firstBatchDone.set()
+        return decodeAdvertisements(batchPayloads, serviceDataKey)
+    monkeypatch.setattr(AdvertisementDecoderModule, "decodeAdvertisements", decodeFirstBatchSlowly)
+
+    async def run():
+        decoder = AdvertisementDecoder(settings, emitted.append, workers=2, batchSize=4)
+        for i, payload in enumerate(payloads):
+            decoder.submit(i, payload)
+        # The second batch is decoded first, but only emitted after the first batch.
+        await asyncio.sleep(0.05)
+        assert not firstBatchDone.is_set()
+        assert emitted == []
+        for i in range(0, 100):
+            if len(emitted) == len(payloads):
+                break
+            await asyncio.sleep(0.01)
+        decoder.stop()
+
+    asyncio.run(run())
+    assert getTemperatures(emitted) == list(range(0, len(payloads)))
+
+
+def test_post_emitsAfterSubmitted():
+    settings = getSimulatedSettings()
+    payloads = getPayloads(settings, 4)
+    emitted = []
+
+    async def run():
+        decoder = AdvertisementDecoder(settings, emitted.append, workers=1, batchSize=10, batchInterval=0.01)
+        # Without pending advertisements, posted advertisements are emitted right away.
+        decoder.post(parseAdvertisement(*payloads[0], settings.serviceDataKey))
+        assert len(emitted) == 1
+
+        decoder.submit(1, payloads[1])
+        decoder.post(parseAdvertisement(*payloads[2], settings.serviceDataKey))
+        decoder.submit(3, payloads[3])
+        assert len(emitted) == 1
+        for i in range(0, 100):
+            if len(emitted) == len(payloads):
+                break
+            await asyncio.sleep(0.01)
+        decoder.stop()
+
+    asyncio.run(run())
+    assert getTemperatures(emitted) == [0, 1, 2, 3]
+
+
+def test_submit_dropsWhenFull():
+    settings = getSimulatedSettings()
+    payloads = getPayloads(settings, 5)
+    emitted = []
+
+    async def run():
+        decoder = AdvertisementDecoder(settings, emitted.append, workers=0, batchSize=10, batchInterval=0.01, maxPending=3)
+        for i, payload in enumerate(payloads):
+            decoder.submit(i, payload)
+        assert decoder.getStatistics()["dropped"] == 2
+        await asyncio.sleep(0.05)
+        decoder.stop()
+
+    asyncio.run(run())
+    assert getTemperatures(emitted) == [0, 1, 2]
+
+
+def test_post_dropsWhenFull():
+    settings = getSimulatedSettings()
+    payloads = getPayloads(settings, 4)
+    emitted = []
+
+    async def run():
+        decoder = AdvertisementDecoder(settings, emitted.append, workers=0, batchSize=10, batchInterval=0.01, maxPending=2)
+        decoder.submit(0, payloads[0])
+        decoder.post(parseAdvertisement(*payloads[1], settings.serviceDataKey))
+        decoder.post(parseAdvertisement(*payloads[2], settings.serviceDataKey))
+        decoder.submit(3, payloads[3])
+        assert decoder.getStatistics()["dropped"] == 2
+        await asyncio.sleep(0.05)
+        decoder.stop()
+
+    asyncio.run(run())
+    assert getTemperatures(emitted) == [0, 1]
+
+
+def test_emit_continuesAfterFailedCallback():
+    settings = getSimulatedSettings()
+    payloads = getPayloads(settings, 4)
+    emitted = []
+
+    def emitOrFail(advertisement):
+        if advertisement.serviceData.payload.temperature == 1:
+            raise ValueError("failed to handle advertisement")
+        emitted.append(advertisement)
+
+    async def run():
+        decoder = AdvertisementDecoder(settings, emitOrFail, workers=0, batchSize=10, batchInterval=0.01)
+        for i, payload in enumerate(payloads):
+            decoder.submit(i, payload)
+        await asyncio.sleep(0.05)
+        decoder.stop()
+        assert decoder.getStatistics()["queueDepth"] == 0
+        assert decoder.getStatistics()["errors"] == 1
+
+    asyncio.run(run())
+    assert getTemperatures(emitted) == [0, 2, 3]
+
+
+def test_scanDelegate_keepsOrderWithCachedAdvertisements():
+    settings = getSimulatedSettings()
+    payloads = getPayloads(settings, 6)
+    delegate = BleakScanDelegate(settings)
+    received = []
+    subscriptionId = BleEventBus.subscribe(SystemBleTopics.rawAdvertisementClass, received.append)
+
+    async def run():
+        delegate.decoder = AdvertisementDecoder(settings, delegate.emitAdvertisement, delegate.cacheDecodedAdvertisement,
+                                                workers=2, batchSize=2, batchInterval=0.01)
+        try:
+            # The first three are decoded, the repeated ones come from the cache once decoded.
+            for payload in payloads[0:3] + payloads[0:3]:
+                delegate.parsePayload(*payload)
+            await asyncio.sleep(0.1)
+            for payload in payloads[0:3]:
+                delegate.parsePayload(*payload)
+            await asyncio.sleep(0.1)
+        finally:
+            delegate.decoder.stop()
+            BleEventBus.unsubscribe(subscriptionId)
+
+    asyncio.run(run())
+    assert getTemperatures(received) == [0, 1, 2] * 3
+    assert delegate.getCacheStatistics()["hits"] == 3
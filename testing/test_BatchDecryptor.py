@@ -0,0 +1,94 @@
+import pytest
+
+from crownstone_core.Enums import CrownstoneOperationMode
+from crownstone_core.Exceptions import CrownstoneException
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+from crownstone_core.packets.Advertisement import Advertisement
+
+import crownstone_ble.core.modules.BatchDecryptor as BatchDecryptorModule
+from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import BleakScanDelegate, parseAdvertisement, parseAdvertisements
+from crownstone_ble.core.modules.BatchDecryptor import BatchDecryptor
+from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
+
+
+def getHexKeySettings() -> EncryptionSettings:
+    # Hex string keys, like the keys from the cloud, are loaded as bytearray.
+    settings = EncryptionSettings()
+    settings.loadKeys("aa" * 16, "bb" * 16, "cc" * 16, "dd" * 16, "ee" * 16, "ff" * 16, "11" * 16)
+    assert isinstance(settings.serviceDataKey, bytearray)
+    return settings
+
+
+def getPayloads(settings, count):
+    payloads = []
+    for i in range(count):
+        crownstone = SimulatedCrownstone(f"aa:bb:cc:dd:ee:{i:02x}", i + 1, settings)
+        crownstone.temperature = 20 + i
+        payloads.append((crownstone.address, -60, "CRWN", list(crownstone.getServiceData()), 0xC001))
+    return payloads
+
+
+def parseWithCrownstoneCore(payload, key):
+    address, rssi, name, serviceData, serviceUUID = payload
+    advertisement = Advertisement(address, rssi, name, list(serviceData), serviceUUID)
+    try:
+        advertisement.parse(key)
+    except CrownstoneException:
+        # The payload is then unknown data, like the scan delegate does.
+        pass
+    return advertisement
+
+
+@pytest.fixture(params=["cryptography", "pyaes"])
+def backend(request, monkeypatch):
+    if request.param == "cryptography":
+        if BatchDecryptorModule.Cipher is None:
+            pytest.skip("cryptography is not installed")
+    else:
+        monkeypatch.setattr(BatchDecryptorModule, "Cipher", None)
+    return request.param
+
+
+def test_decryptBlocks_matchesCrownstoneCore(backend):
+    settings = getHexKeySettings()
+    payloads = getPayloads(settings, 5)
+    decrypted = BatchDecryptor().decryptBlocks([payload[3][2:] for payload in payloads], settings.serviceDataKey)
+    for payload, block in zip(payloads, decrypted):
+        expected = parseWithCrownstoneCore(payload, settings.serviceDataKey)
+        assert list(block) == expected.serviceData._data[2:]
+
+
+def test_parseAdvertisement_hexKey(backend):
+    settings = getHexKeySettings()
+    payload = getPayloads(settings, 1)[0]
+    advertisement = parseAdvertisement(*payload, settings.serviceDataKey)
+    assert advertisement.operationMode == CrownstoneOperationMode.NORMAL
+    assert advertisement.serviceData.decrypted
+    assert advertisement.serviceData.payload.crownstoneId == 1
+    assert advertisement.serviceData.payload.temperature == 20
+
+
+def test_parseAdvertisements_wrongKey(backend):
+    settings = getHexKeySettings()
+    payloads = getPayloads(settings, 3)
+    advertisements = parseAdvertisements(payloads, bytes(16))
+    for payload, advertisement in zip(payloads, advertisements):
+        assert advertisement is not None
+        # What garbage is decrypted depends on the time, so compare with how crownstone_core parses it.
+        expected = parseWithCrownstoneCore(payload, bytes(16))
+        assert type(advertisement.serviceData.payload) == type(expected.serviceData.payload)
+
+
+def test_scanDelegate_inlinePath_hexKey(backend):
+    settings = getHexKeySettings()
+    delegate = BleakScanDelegate(settings)
+    received = []
+    subscriptionId = BleEventBus.subscribe(SystemBleTopics.rawAdvertisementClass, received.append)
+    try:
+        for payload in getPayloads(settings, 3):
+            delegate.parsePayload(*payload)
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
+    assert [advertisement.serviceData.payload.crownstoneId for advertisement in received] == [1, 2, 3]
@@ -0,0 +1,61 @@
+import asyncio
+
+from crownstone_core.packets.assetFilter.builders.AssetFilter import AssetFilter
+
+from testing.conftest import getSimulatedAddress, SIMULATED_CROWNSTONE_COUNT
+
+
+def test_batch_keepsDefaultConnection(simulatedCore):
+    core = simulatedCore
+    defaultAddress = getSimulatedAddress(0)
+    addresses = [getSimulatedAddress(i) for i in range(1, SIMULATED_CROWNSTONE_COUNT)]
+
+    async def run():
+        await core.connect(defaultAddress)
+        try:
+            results = await core.batch([(address, lambda connection: connection.state.getSwitchState()) for address in addresses], concurrency=3)
+            assert all(result.success for result in results)
+            assert core.ble.defaultAddress == defaultAddress
+            assert core.ble.getConnectedAddresses() == [defaultAddress]
+            # The modules without address still use the default connection.
+            await core.control.setSwitch(100)
+            assert core.ble.backend.getCrownstone(defaultAddress).switchState == 100
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_collectDiagnostics_keepsDefaultConnection(simulatedCore):
+    core = simulatedCore
+    defaultAddress = getSimulatedAddress(0)
+    addresses = [getSimulatedAddress(i) for i in range(1, SIMULATED_CROWNSTONE_COUNT)]
+
+    async def run():
+        await core.connect(defaultAddress)
+        try:
+            await core.collectDiagnostics(addresses, concurrency=3)
+            assert core.ble.defaultAddress == defaultAddress
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_syncFilters_keepsDefaultConnection(simulatedCore):
+    core = simulatedCore
+    defaultAddress = getSimulatedAddress(0)
+    addresses = [getSimulatedAddress(i) for i in range(1, SIMULATED_CROWNSTONE_COUNT)]
+    assetFilter = AssetFilter(0)
+    assetFilter.filterByMacAddress(["01:23:45:67:89:AB"])
+    assetFilter.outputMacRssiReport()
+
+    async def run():
+        await core.connect(defaultAddress)
+        try:
+            await core.syncFilters(addresses, [assetFilter], useMesh=False, concurrency=3)
+            assert core.ble.defaultAddress == defaultAddress
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
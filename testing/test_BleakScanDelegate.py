@@ -0,0 +1,111 @@
+from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import BleakScanDelegate
+from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
+from testing.conftest import getAdvertisementPayload, getSimulatedAddress, getSimulatedSettings
+
+
+def collectAdvertisements():
+    received = []
+    subscriptionId = BleEventBus.subscribe(SystemBleTopics.rawAdvertisementClass, received.append)
+    return received, subscriptionId
+
+
+def test_parsePayload_cachesRepeatedServiceData():
+    settings = getSimulatedSettings()
+    crownstone = SimulatedCrownstone(getSimulatedAddress(0), 1, settings)
+    delegate = BleakScanDelegate(settings)
+    received, subscriptionId = collectAdvertisements()
+    try:
+        payload = getAdvertisementPayload(crownstone, rssi=-50)
+        delegate.parsePayload(*payload)
+        delegate.parsePayload(*getAdvertisementPayload(crownstone, rssi=-70))
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
+
+    assert delegate.getCacheStatistics() == {"size": 1, "hits": 1, "misses": 1}
+    assert [advertisement.rssi for advertisement in received] == [-50, -70]
+    # The cached advertisement keeps its own rssi.
+    assert delegate.cache[(payload[0], payload[4], bytes(payload[3]))].rssi == -50
+    assert received[1].serviceData.payload.crownstoneId == 1
+
+
+def test_parsePayload_cachedAdvertisementsCanBeModified():
+    settings = getSimulatedSettings()
+    crownstone = SimulatedCrownstone(getSimulatedAddress(0), 1, settings)
+    delegate = BleakScanDelegate(settings)
+    # A handler that modifies the advertisements it receives.
+    def modifyAdvertisement(advertisement):
+        advertisement.serviceData.payload.temperature = -1
+        advertisement.serviceData.deviceType = None
+    modifySubscriptionId = BleEventBus.subscribe(SystemBleTopics.rawAdvertisementClass, modifyAdvertisement)
+    received, subscriptionId = collectAdvertisements()
+    try:
+        payload = getAdvertisementPayload(crownstone)
+        for i in range(0, 3):
+            delegate.parsePayload(*payload)
+            temperature = received[-1].serviceData.payload.temperature
+    finally:
+        BleEventBus.unsubscribe(modifySubscriptionId)
+        BleEventBus.unsubscribe(subscriptionId)
+
+    assert delegate.getCacheStatistics()["hits"] == 2
+    cachedAdvertisement = delegate.cache[(payload[0], payload[4], bytes(payload[3]))]
+    assert cachedAdvertisement.serviceData.payload.temperature == crownstone.temperature
+    assert cachedAdvertisement.serviceData.deviceType is not None
+    assert received[1].serviceData is not received[2].serviceData
+
+
+def test_parsePayload_newServiceDataIsParsed():
+    settings = getSimulatedSettings()
+    crownstone = SimulatedCrownstone(getSimulatedAddress(0), 1, settings)
+    delegate = BleakScanDelegate(settings)
+    received, subscriptionId = collectAdvertisements()
+    try:
+        delegate.parsePayload(*getAdvertisementPayload(crownstone))
+        crownstone.temperature += 1
+        delegate.parsePayload(*getAdvertisementPayload(crownstone))
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
+
+    assert delegate.getCacheStatistics() == {"size": 2, "hits": 0, "misses": 2}
+    assert received[1].serviceData.payload.temperature == received[0].serviceData.payload.temperature + 1
+
+
+def test_parsePayload_keyChangeClearsCache():
+    settings = getSimulatedSettings()
+    crownstone = SimulatedCrownstone(getSimulatedAddress(0), 1, settings)
+    delegate = BleakScanDelegate(settings)
+    received, subscriptionId = collectAdvertisements()
+    try:
+        payload = getAdvertisementPayload(crownstone)
+        delegate.parsePayload(*payload)
+        settings.loadKeys("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "OtherServiceKey!", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+        delegate.parsePayload(*payload)
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
+
+    assert delegate.getCacheStatistics() == {"size": 1, "hits": 0, "misses": 2}
+    assert received[0].serviceData.payload.crownstoneId == 1
+    # Parsed again with the new key, instead of taken from the cache.
+    assert received[1].serviceData is not received[0].serviceData
+
+
+def test_parsePayload_evictsLeastRecentlyUsed():
+    settings = getSimulatedSettings()
+    crownstones = [SimulatedCrownstone(getSimulatedAddress(i), i + 1, settings) for i in range(0, 3)]
+    delegate = BleakScanDelegate(settings, cacheSize=2)
+    payloads = [getAdvertisementPayload(crownstone) for crownstone in crownstones]
+    received, subscriptionId = collectAdvertisements()
+    try:
+        delegate.parsePayload(*payloads[0])
+        delegate.parsePayload(*payloads[1])
+        # Makes the first one the most recently used.
+        delegate.parsePayload(*payloads[0])
+        delegate.parsePayload(*payloads[2])
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
+
+    cachedAddresses = [cacheKey[0] for cacheKey in delegate.cache.keys()]
+    assert cachedAddresses == [payloads[0][0], payloads[2][0]]
+    assert len(received) == 4
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from crownstone_core.Exceptions import CrownstoneBleException
+
+from crownstone_ble.Exceptions import BleError
+from testing.conftest import SIMULATED_KEYS, createSimulatedCore, getSimulatedAddress
+
+
+def test_connect_keepsOtherConnections(simulatedCore):
+    core = simulatedCore
+    addresses = [getSimulatedAddress(i) for i in range(0, 3)]
+
+    async def run():
+        try:
+            for address in addresses:
+                await core.connect(address)
+            assert core.ble.getConnectedAddresses() == addresses
+            assert core.ble.backend.connectCount == 3
+
+            # Already connected, so no new connection is made.
+            await core.connect(addresses[0])
+            assert core.ble.backend.connectCount == 3
+            assert core.ble.defaultAddress == addresses[0]
+
+            # Commands to different Crownstones can run concurrently.
+            await asyncio.gather(*[core.getConnection(address).control.setSwitch(100) for address in addresses])
+            for address in addresses:
+                assert core.ble.backend.getCrownstone(address).switchState == 100
+        finally:
+            await core.shutDown()
+        assert core.ble.getConnectedAddresses() == []
+
+    asyncio.run(run())
+
+
+def test_connect_disconnectsLeastRecentlyUsed():
+    core = createSimulatedCore(maxConnections=2)
+    addresses = [getSimulatedAddress(i) for i in range(0, 3)]
+
+    async def run():
+        try:
+            await core.connect(addresses[0])
+            await core.connect(addresses[1])
+            # Using the first connection makes it the most recently used one.
+            await core.getConnection(addresses[0]).state.getSwitchState()
+            assert core.ble.getConnectedAddresses() == [addresses[1], addresses[0]]
+
+            await core.connect(addresses[2])
+            assert core.ble.getConnectedAddresses() == [addresses[0], addresses[2]]
+            assert not await core.ble.is_connected(addresses[1])
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_connect_keepsBusyConnections():
+    core = createSimulatedCore(maxConnections=2)
+    addresses = [getSimulatedAddress(i) for i in range(0, 3)]
+
+    async def run():
+        try:
+            await core.connect(addresses[0])
+            await core.connect(addresses[1])
+            core.ble.clients[addresses[0].lower()].operationCount += 1
+
+            await core.connect(addresses[2])
+            assert core.ble.getConnectedAddresses() == [addresses[0], addresses[2]]
+
+            core.ble.clients[addresses[2].lower()].operationCount += 1
+            with pytest.raises(CrownstoneBleException) as err:
+                await core.connect(addresses[1])
+            assert err.value.type == BleError.TOO_MANY_CONNECTIONS
+        finally:
+            for client in core.ble.clients.values():
+                client.operationCount = 0
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_setSettings_updatesOpenConnections(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+    newKeys = ["newAdminKeyCrown", "newMemberKeyHome", "newBasicKeyOther"] + SIMULATED_KEYS[3:]
+
+    async def run():
+        try:
+            await core.connect(address)
+            connectionSettings = core.ble.getSettings(address)
+            sessionNonce = connectionSettings.sessionNonce
+            assert sessionNonce is not None
+
+            core.setSettings(*newKeys)
+            assert connectionSettings.adminKey == core.settings.adminKey
+            assert connectionSettings.basicKey == core.settings.basicKey
+            # The session data of the connection is kept.
+            assert connectionSettings.sessionNonce == sessionNonce
+            assert core.settings.sessionNonce is None
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
@@ -0,0 +1,131 @@
+import asyncio
+
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+from crownstone_core.packets.Advertisement import Advertisement
+
+from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.container.ScanDataUtil import fillScanDataFromAdvertisement
+from crownstone_ble.core.modules.DataCoalescer import DataCoalescer
+from crownstone_ble.topics.BleTopics import BleTopics
+
+
+def getSettings() -> EncryptionSettings:
+    settings = EncryptionSettings()
+    settings.loadKeys("aa" * 16, "bb" * 16, "cc" * 16, "dd" * 16, "ee" * 16, "ff" * 16, "11" * 16)
+    return settings
+
+
+def getScanData(crownstone: SimulatedCrownstone, settings: EncryptionSettings):
+    # Parse every time, so each ScanData has its own payload objects, like when scanning.
+    crownstone._advertisementCache = None
+    advertisement = Advertisement(crownstone.address, crownstone.rssi, crownstone.name, list(crownstone.getServiceData()), 0xC001)
+    advertisement.parse(settings.serviceDataKey)
+    return fillScanDataFromAdvertisement(advertisement, True)
+
+
+def collectCoalescedData():
+    emitted = []
+    subscriptionId = BleEventBus.subscribe(BleTopics.coalescedDataAvailable, emitted.append)
+    return emitted, subscriptionId
+
+
+def test_identicalPayloads_emittedOnceWithinInterval():
+    settings = getSettings()
+    crownstone = SimulatedCrownstone("aa:bb:cc:dd:ee:01", 1, settings)
+    emitted, subscriptionId = collectCoalescedData()
+
+    async def run():
+        coalescer = DataCoalescer(interval=0.05)
+        try:
+            BleEventBus.emit(BleTopics.newDataAvailable, getScanData(crownstone, settings))
+            BleEventBus.emit(BleTopics.newDataAvailable, getScanData(crownstone, settings))
+            assert len(emitted) == 1
+            assert len(coalescer.pending) == 1
+
+            await asyncio.sleep(0.1)
+            assert len(emitted) == 2
+            assert len(coalescer.pending) == 0
+        finally:
+            coalescer.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
+
+
+def test_switchStateChange_emittedRightAway():
+    settings = getSettings()
+    crownstone = SimulatedCrownstone("aa:bb:cc:dd:ee:01", 1, settings)
+    emitted, subscriptionId = collectCoalescedData()
+
+    async def run():
+        coalescer = DataCoalescer(interval=10)
+        try:
+            BleEventBus.emit(BleTopics.newDataAvailable, getScanData(crownstone, settings))
+            crownstone.switchState = 100
+            BleEventBus.emit(BleTopics.newDataAvailable, getScanData(crownstone, settings))
+            assert len(emitted) == 2
+            assert emitted[1].payload.switchState.raw == crownstone.getRawSwitchState()
+            assert len(coalescer.pending) == 0
+        finally:
+            coalescer.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
+
+
+def test_stop_flushesPendingData():
+    settings = getSettings()
+    crownstone = SimulatedCrownstone("aa:bb:cc:dd:ee:01", 1, settings)
+    emitted, subscriptionId = collectCoalescedData()
+
+    async def run():
+        coalescer = DataCoalescer(interval=10)
+        BleEventBus.emit(BleTopics.newDataAvailable, getScanData(crownstone, settings))
+        BleEventBus.emit(BleTopics.newDataAvailable, getScanData(crownstone, settings))
+        assert len(emitted) == 1
+        coalescer.stop()
+        assert len(emitted) == 2
+
+        BleEventBus.emit(BleTopics.newDataAvailable, getScanData(crownstone, settings))
+        assert len(emitted) == 2
+
+    try:
+        asyncio.run(run())
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
+
+
+def test_lastEmittedData_expires():
+    settings = getSettings()
+    crownstones = [SimulatedCrownstone(f"aa:bb:cc:dd:ee:0{i + 1}", i + 1, settings) for i in range(0, 2)]
+    emitted, subscriptionId = collectCoalescedData()
+
+    async def run():
+        coalescer = DataCoalescer(interval=10, expiryTime=60)
+        try:
+            coalescer.handleData(getScanData(crownstones[0], settings), now=1000)
+            coalescer.handleData(getScanData(crownstones[1], settings), now=1030)
+            assert len(coalescer.lastEmitted) == 2
+
+            # Only the first Crownstone expired.
+            coalescer.handleData(getScanData(crownstones[1], settings), now=1065)
+            assert list(coalescer.lastEmitted.keys()) == [(crownstones[1].address, 2)]
+            assert list(coalescer.lastReceived.keys()) == [(crownstones[1].address, 2)]
+
+            # Data of an expired Crownstone is new again, so it's emitted right away.
+            emittedCount = len(emitted)
+            coalescer.handleData(getScanData(crownstones[0], settings), now=1066)
+            assert len(emitted) == emittedCount + 1
+            assert len(coalescer.lastEmitted) == 2
+        finally:
+            coalescer.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        BleEventBus.unsubscribe(subscriptionId)
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from crownstone_core.Enums import CrownstoneOperationMode
+
+from crownstone_ble.core.container.ScanData import ScanData
+from crownstone_ble.core.modules.DeviceRegistry import DeviceRegistry
+from testing.conftest import getSimulatedAddress
+
+
+def getScanData(index: int, rssi: int, operationMode = CrownstoneOperationMode.NORMAL, validated: bool = True) -> ScanData:
+    data = ScanData()
+    data.address = getSimulatedAddress(index).lower()
+    data.rssi = rssi
+    data.name = "CRWN"
+    data.operationMode = operationMode
+    data.validated = validated
+    return data
+
+
+@pytest.fixture
+def now(monkeypatch):
+    # getTopByRssi() and getRecords() use the current time for the maxAge filter.
+    now = 1000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    return now
+
+
+def test_getTopByRssi_strongestFirst(now):
+    registry = DeviceRegistry(smoothing=1.0)
+    for index, rssi in enumerate([-80, -50, -70, -60]):
+        registry.update(getScanData(index, rssi), now)
+
+    top = registry.getTopByRssi(3)
+    assert [record.address for record in top] == [getSimulatedAddress(i).lower() for i in [1, 3, 2]]
+    assert registry.getNearest().address == getSimulatedAddress(1).lower()
+
+    # Moving away reorders the records.
+    registry.update(getScanData(1, -90), now)
+    assert registry.getNearest().address == getSimulatedAddress(3).lower()
+    assert len(registry.rssiOrder) == 4
+
+
+def test_getTopByRssi_filters(now):
+    registry = DeviceRegistry(smoothing=1.0)
+    registry.update(getScanData(0, -40, validated=False), now)
+    registry.update(getScanData(1, -50, operationMode=CrownstoneOperationMode.SETUP), now)
+    registry.update(getScanData(2, -60), now - 30)
+    registry.update(getScanData(3, -70), now)
+
+    assert registry.getNearest().address == getSimulatedAddress(0).lower()
+    assert registry.getNearest(validatedOnly=True).address == getSimulatedAddress(2).lower()
+    assert registry.getNearest(setupModeOnly=True).address == getSimulatedAddress(1).lower()
+    assert registry.getNearest(validatedOnly=True, maxAge=10).address == getSimulatedAddress(3).lower()
+    assert registry.getNearest(addressesToExclude={getSimulatedAddress(0).lower()}).address == getSimulatedAddress(2).lower()
+    assert registry.getNearest(rssiAtLeast=-35) is None
+
+
+def test_getTopByRssi_ignoresInvalidRssi(now):
+    registry = DeviceRegistry(smoothing=1.0)
+    registry.update(getScanData(0, -60), now)
+    registry.update(getScanData(0, 127), now + 1)
+    registry.update(getScanData(1, 0), now)
+
+    assert [record.address for record in registry.getTopByRssi(5)] == [getSimulatedAddress(0).lower()]
+    assert registry.get(getSimulatedAddress(0)).rssiAverage == -60
+    assert registry.get(getSimulatedAddress(1)).rssiAverage is None
+
+
+def test_cleanupExpiredRecords_inUpdateOrder(now):
+    registry = DeviceRegistry(recordTimeout=10, smoothing=1.0)
+    registry.update(getScanData(0, -50), now)
+    registry.update(getScanData(1, -60), now + 1)
+    registry.update(getScanData(2, -70), now + 2)
+    registry.update(getScanData(0, -50), now + 3)
+
+    registry.cleanupExpiredRecords(now + 11)
+    assert [record.address for record in registry.getRecords()] == [getSimulatedAddress(i).lower() for i in [2, 0]]
+    assert [address for negativeRssi, address in registry.rssiOrder] == [getSimulatedAddress(i).lower() for i in [0, 2]]
+
+    # Updates clean up expired records too.
+    registry.update(getScanData(3, -80), now + 13)
+    assert [record.address for record in registry.getRecords()] == [getSimulatedAddress(i).lower() for i in [3]]
+    assert len(registry.rssiOrder) == 1
@@ -0,0 +1,150 @@
+import asyncio
+
+from crownstone_core.packets.assetFilter.builders.AssetFilter import AssetFilter
+from crownstone_core.protocol.BluenetTypes import ControlType, ResultValue
+from crownstone_core.protocol.Characteristics import CrownstoneCharacteristics
+
+from crownstone_ble.core.ble_modules.BleHandler import DEFAULT_MTU
+from crownstone_ble.core.ble_modules.ControlHandler import DEFAULT_FILTER_CHUNK_SIZE
+from testing.conftest import getSimulatedAddress
+
+
+def getFilters(count: int = 3) -> list:
+    filters = []
+    for i in range(0, count):
+        assetFilter = AssetFilter(i)
+        assetFilter.filterByMacAddress([f"01:23:45:67:{i:02X}:{j:02X}" for j in range(0, 20)])
+        assetFilter.outputMacRssiReport()
+        filters.append(assetFilter)
+    return filters
+
+
+def test_setFilters_pipelinedMatchesSerial(simulatedCore):
+    core = simulatedCore
+    serialAddress = getSimulatedAddress(0)
+    pipelinedAddress = getSimulatedAddress(1)
+
+    async def run():
+        try:
+            await core.connect(serialAddress)
+            serialVersion = await core.control.setFilters(getFilters(), chunkSize=20)
+            await core.connect(pipelinedAddress)
+            pipelinedVersion = await core.control.setFilters(getFilters(), windowSize=4, chunkSize=20)
+        finally:
+            await core.shutDown()
+
+        serialCrownstone = core.ble.backend.getCrownstone(serialAddress)
+        pipelinedCrownstone = core.ble.backend.getCrownstone(pipelinedAddress)
+        assert pipelinedVersion == serialVersion
+        assert pipelinedCrownstone.filterMasterCrc == serialCrownstone.filterMasterCrc
+        assert pipelinedCrownstone.filters == serialCrownstone.filters
+
+    asyncio.run(run())
+
+
+def test_pipeline_retriesBusyPackets(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+    assetFilter = getFilters(1)[0]
+    packets = core.control._getFilterChunkPackets(assetFilter, 20)
+
+    async def run():
+        try:
+            await core.connect(address)
+            crownstone = core.ble.backend.getCrownstone(address)
+            handleUpload = crownstone.controlHandlers[ControlType.ASSET_FILTER_UPLOAD]
+            uploadCount = 0
+            def handleUploadBusyOnce(payload):
+                nonlocal uploadCount
+                uploadCount += 1
+                if uploadCount == 2:
+                    return ResultValue.BUSY, []
+                return handleUpload(payload)
+            crownstone.controlHandlers[ControlType.ASSET_FILTER_UPLOAD] = handleUploadBusyOnce
+
+            acknowledged = []
+            await core.control._writeControlPacketsPipelined(packets, 4, timeout=0.5, successCallback=lambda index, result: acknowledged.append(index))
+            assert sorted(acknowledged) == list(range(0, len(packets)))
+            assert uploadCount == len(packets) + 1
+            assert crownstone.filters[0] == list(assetFilter.serialize())
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_pipeline_discardsLateResults(simulatedCore):
+    core = simulatedCore
+    core.ble.backend.latency = 0.01
+    address = getSimulatedAddress(0)
+    packets = core.control._getFilterChunkPackets(getFilters(1)[0], 20)
+    assert len(packets) > 4
+
+    async def run():
+        try:
+            await core.connect(address)
+            client = core.ble.clients[address.lower()].client
+            notify = client._notify
+            notifyCount = 0
+            heldResult = None
+            releaseHandle = None
+            def notifyDelayed(characteristicUuid, data):
+                # Hold the result of the third packet, until 0.3 seconds after the last other result, so after the timeout.
+                nonlocal notifyCount, heldResult, releaseHandle
+                notifyCount += 1
+                if notifyCount == 3:
+                    heldResult = (characteristicUuid, data)
+                else:
+                    notify(characteristicUuid, data)
+                if heldResult is not None:
+                    if releaseHandle is not None:
+                        releaseHandle.cancel()
+                    releaseHandle = asyncio.get_event_loop().call_later(0.3, releaseResult)
+            def releaseResult():
+                nonlocal heldResult
+                notify(*heldResult)
+                heldResult = None
+            client._notify = notifyDelayed
+
+            await core.control._writeControlPacketsPipelined(packets, 4, timeout=0.2)
+            client._notify = notify
+
+            # A late result must not end up at the next request.
+            router = core.ble.activeClient.getNotificationRouter(CrownstoneCharacteristics.Result)
+            results = await router.startRequest()
+            try:
+                await asyncio.sleep(0.5)
+                assert results.empty()
+            finally:
+                router.finishRequest()
+
+            summaries = await core.control.getFilterSummaries()
+            assert len(summaries.summaries) == 1
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_getFilterChunkSize_usesBluezMtu(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+
+    async def run():
+        try:
+            await core.connect(address)
+            client = core.ble.clients[address.lower()].client
+            # Like a bleak client: no MTU attribute, the characteristics have the D-Bus properties of BlueZ.
+            del client.mtu_size
+            assert core.ble.getMtu() == DEFAULT_MTU
+            assert core.control.getFilterChunkSize() == DEFAULT_FILTER_CHUNK_SIZE
+
+            for characteristic in client.services.characteristics.values():
+                characteristic.obj = {"UUID": characteristic.uuid, "MTU": 247}
+            assert core.ble.getMtu() == 247
+            chunkSize = core.control.getFilterChunkSize()
+            assert DEFAULT_FILTER_CHUNK_SIZE < chunkSize < 247
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
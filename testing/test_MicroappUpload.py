@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from crownstone_core.Exceptions import CrownstoneException
+from crownstone_core.protocol.BluenetTypes import ControlType, ResultValue
+from crownstone_core.util.BufferWriter import BufferWriter
+from crownstone_core.util.CRC import crc16ccitt
+
+from crownstone_ble.core.modules.MicroappUpload import MicroappUpload
+from testing.conftest import getSimulatedAddress
+
+CHUNK_SIZE = 64
+
+
+def getBinary(size: int = 1024, buildVersion: int = 1) -> bytearray:
+    """
+    :returns: A microapp binary, with a header that passes the validation of the simulated Crownstone.
+    """
+    code = bytearray((i * 7) % 256 for i in range(0, size - 24))
+    writer = BufferWriter()
+    writer.putBytes([0, 1])               # sdk version
+    writer.putUInt16(size)
+    writer.putUInt16(crc16ccitt(list(code)))
+    writer.putUInt16(0x1234)              # checksum of the header
+    writer.putUInt32(buildVersion)
+    writer.putBytes([0] * 12)
+    return bytearray(writer.getBuffer()) + code
+
+
+def recordUploadOffsets(crownstone, failAtUpload: int = None, resultValue: ResultValue = ResultValue.WRONG_PARAMETER) -> list:
+    """
+    Record the offset of each upload command the simulated Crownstone receives.
+    :param failAtUpload:  The upload command, counting from 1, that gets resultValue as result, instead of being handled.
+    """
+    handleUpload = crownstone.controlHandlers[ControlType.MICROAPP_UPLOAD]
+    offsets = []
+    def handleUploadAndRecord(payload):
+        offsets.append(payload[2] | (payload[3] << 8))
+        if len(offsets) == failAtUpload:
+            return resultValue, []
+        return handleUpload(payload)
+    crownstone.controlHandlers[ControlType.MICROAPP_UPLOAD] = handleUploadAndRecord
+    return offsets
+
+
+def test_uploadMicroappResumable_resumesFromCheckpoint(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+    binary = getBinary()
+    upload = MicroappUpload(binary, chunkSize=CHUNK_SIZE)
+
+    async def run():
+        try:
+            await core.connect(address)
+            crownstone = core.ble.backend.getCrownstone(address)
+            offsets = recordUploadOffsets(crownstone, failAtUpload=6)
+            with pytest.raises(CrownstoneException):
+                await core.microapp.uploadMicroappResumable(upload, windowSize=4)
+            # The chunks before the failed one are acknowledged.
+            assert upload.acknowledgedOffset == 5 * CHUNK_SIZE
+            assert not upload.isFinished()
+
+            await core.disconnect(address)
+            await core.connect(address)
+            uploadCount = len(offsets)
+            await core.microapp.uploadMicroappResumable(upload, windowSize=4)
+            resumedOffsets = offsets[uploadCount:]
+            assert resumedOffsets == list(range(5 * CHUNK_SIZE, len(binary), CHUNK_SIZE))
+            assert upload.isFinished()
+            assert crownstone.microapps[0] == binary
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_uploadMicroappResumable_skipsIdenticalApp(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+    binary = getBinary()
+
+    async def run():
+        try:
+            await core.connect(address)
+            crownstone = core.ble.backend.getCrownstone(address)
+            await core.microapp.uploadMicroappResumable(MicroappUpload(binary, chunkSize=CHUNK_SIZE))
+            offsets = recordUploadOffsets(crownstone)
+
+            # Not validated yet, so the app might be incomplete.
+            upload = MicroappUpload(binary, chunkSize=CHUNK_SIZE)
+            await core.microapp.uploadMicroappResumable(upload)
+            assert not upload.skipped
+            assert len(offsets) == len(binary) // CHUNK_SIZE
+
+            await core.microapp.validateMicroapp(0, 0)
+            offsets.clear()
+            upload = MicroappUpload(binary, chunkSize=CHUNK_SIZE)
+            await core.microapp.uploadMicroappResumable(upload)
+            assert upload.skipped and upload.isFinished()
+            assert offsets == []
+
+            # Another build is uploaded.
+            upload = MicroappUpload(getBinary(buildVersion=2), chunkSize=CHUNK_SIZE)
+            await core.microapp.uploadMicroappResumable(upload)
+            assert not upload.skipped
+            assert len(offsets) == len(binary) // CHUNK_SIZE
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_uploadMicroappResumable_checkpointWaitsForRetransmittedChunk(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+    binary = getBinary()
+    upload = MicroappUpload(binary, chunkSize=CHUNK_SIZE)
+    checkpoints = []
+
+    async def run():
+        try:
+            await core.connect(address)
+            crownstone = core.ble.backend.getCrownstone(address)
+            # The third chunk is busy, so it's acknowledged after the chunks that follow it.
+            offsets = recordUploadOffsets(crownstone, failAtUpload=3, resultValue=ResultValue.BUSY)
+            await core.microapp.uploadMicroappResumable(upload, windowSize=4, progressCallback=lambda upload: checkpoints.append(upload.acknowledgedOffset))
+            assert offsets.count(2 * CHUNK_SIZE) == 2
+            assert offsets[-1] == 2 * CHUNK_SIZE
+            assert crownstone.microapps[0] == binary
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+    # The checkpoint stays before the busy chunk, until it's acknowledged.
+    assert checkpoints == [CHUNK_SIZE, 2 * CHUNK_SIZE, len(binary)]
+    assert upload.bytesUploaded == len(binary)
@@ -0,0 +1,35 @@
+import pytest
+
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+from crownstone_core.util.EncryptionHandler import EncryptionHandler
+
+from crownstone_ble.core.bluetooth_delegates.NotificationDelegate import NotificationDelegate, LAST_PACKET_INDEX
+
+
+def getSessionSettings() -> EncryptionSettings:
+    settings = EncryptionSettings()
+    settings.loadKeys("adminKeyForCrown", "memberKeyForHome", "basicKeyForOther", "MyServiceDataKey", "aLocalizationKey", "MyGoodMeshAppKey", "MyGoodMeshNetKey")
+    settings.setSessionNonce([1, 2, 3, 4, 5])
+    settings.setValidationKey([6, 7, 8, 9])
+    return settings
+
+
+def getParts(encrypted, partSize: int = 16) -> list:
+    chunks = [encrypted[i:i + partSize] for i in range(0, len(encrypted), partSize)]
+    return [[LAST_PACKET_INDEX if i == len(chunks) - 1 else i] + list(chunk) for i, chunk in enumerate(chunks)]
+
+
+@pytest.mark.parametrize("partType", [list, bytes, bytearray])
+def test_merge_partTypes(partType):
+    settings = getSessionSettings()
+    payload = list(range(0, 40))
+    encrypted = EncryptionHandler.encrypt(payload, settings)
+    results = []
+    delegate = NotificationDelegate(lambda: results.append(delegate.result), settings)
+
+    for part in getParts(encrypted):
+        delegate.handleNotification(None, partType(part))
+
+    assert len(results) == 1
+    assert list(results[0][:len(payload)]) == payload
+
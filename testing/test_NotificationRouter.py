@@ -0,0 +1,88 @@
+import asyncio
+
+from crownstone_core.packets.debug.SwitchHistoryPacket import SwitchHistoryListPacket
+from crownstone_core.protocol.Characteristics import CrownstoneCharacteristics
+from crownstone_core.protocol.ControlPackets import ControlPacketsGenerator
+from crownstone_core.protocol.SwitchState import SwitchState
+
+from crownstone_ble.core.backends.SimulatedBackend import SimulatedBackend
+from testing.conftest import createSimulatedCore, getSimulatedAddress
+
+
+def test_concurrentRequests_getOwnResults():
+    backend = SimulatedBackend(latency=0.005, notificationInterval=0.002)
+    core = createSimulatedCore(backend=backend)
+    address = getSimulatedAddress(0)
+
+    async def run():
+        try:
+            await core.connect(address)
+            crownstone = backend.getCrownstone(address)
+            crownstone.switchState = 100
+            # Results of different command types, requested at the same time on the same connection.
+            results = await asyncio.gather(
+                core.state.getSwitchState(),
+                core.debug.getUptime(),
+                core.debug.getSwitchHistory(),
+                core.state.getSwitchState(),
+                core.debug.getUptime(),
+            )
+            assert isinstance(results[0], SwitchState) and results[0].raw == crownstone.getRawSwitchState()
+            assert isinstance(results[3], SwitchState) and results[3].raw == crownstone.getRawSwitchState()
+            assert isinstance(results[1], int) and isinstance(results[4], int)
+            assert isinstance(results[2], SwitchHistoryListPacket)
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_requests_subscribeOnce(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+
+    async def run():
+        try:
+            await core.connect(address)
+            client = core.ble.activeClient
+            startNotify = client.client.start_notify
+            subscribeCount = 0
+            async def countStartNotify(*args, **kwargs):
+                nonlocal subscribeCount
+                subscribeCount += 1
+                return await startNotify(*args, **kwargs)
+            client.client.start_notify = countStartNotify
+
+            for i in range(0, 5):
+                await core.state.getSwitchState()
+            assert subscribeCount == 1
+            assert list(client.notificationRouters.keys()) == [CrownstoneCharacteristics.Result]
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_notificationWithoutRequest_isIgnored(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+
+    async def run():
+        try:
+            await core.connect(address)
+            await core.state.getSwitchState()
+            router = core.ble.activeClient.getNotificationRouter(CrownstoneCharacteristics.Result)
+
+            # Write without request, like a result that arrives after its request timed out.
+            await core.control._writeControlPacket(ControlPacketsGenerator.getSwitchCommandPacket(100))
+            await asyncio.sleep(0.01)
+
+            results = await router.startRequest()
+            router.finishRequest()
+            assert results.empty()
+            switchState = await core.state.getSwitchState()
+            assert switchState.raw == core.ble.backend.getCrownstone(address).getRawSwitchState()
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
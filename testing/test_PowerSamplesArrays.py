@@ -0,0 +1,91 @@
+import math
+
+import pytest
+
+from crownstone_core.Exceptions import CrownstoneException
+from crownstone_core.packets.debug.PowerSamplesPacket import PowerSamplesPacket
+from crownstone_core.protocol.BluenetTypes import PowerSamplesType
+from crownstone_core.util.BufferWriter import BufferWriter
+
+from crownstone_ble.core.modules.PowerSamplesArrays import PowerSamplesArrays
+
+numpy = pytest.importorskip("numpy")
+
+FIELDS = ["index", "count", "timestamp", "delayUs", "sampleIntervalUs", "offset"]
+
+
+def getPayload(index: int, samples: list, trailingBytes: int = 0) -> list:
+    """
+    :returns: A power samples result payload, with trailingBytes bytes after the samples.
+    """
+    writer = BufferWriter()
+    writer.putUInt8(PowerSamplesType.NOW_FILTERED)
+    writer.putUInt8(index)
+    writer.putUInt16(len(samples))
+    writer.putUInt32(1600000000 + index)
+    writer.putUInt16(100 + index)
+    writer.putUInt16(200)
+    writer.putBytes([0, 0])
+    writer.putInt16(-3 + index)
+    writer.putFloat(0.5 + index)
+    for sample in samples:
+        writer.putInt16(sample)
+    writer.putBytes([0xAB] * trailingBytes)
+    return writer.getBuffer()
+
+
+def assertMatchesPackets(arrays: PowerSamplesArrays, payloads: list):
+    assert len(arrays) == len(payloads)
+    for row, payload in enumerate(payloads):
+        packet = PowerSamplesPacket(payload)
+        assert arrays.samplesType[row] == packet.samplesType.value
+        for field in FIELDS:
+            assert getattr(arrays, field)[row] == getattr(packet, field), field
+        assert arrays.multiplier[row] == pytest.approx(packet.multiplier)
+        assert list(arrays.samples[row, 0:packet.count]) == packet.samples
+        assert list(arrays.samples[row, packet.count:]) == [0] * (arrays.samples.shape[1] - packet.count)
+        values = [(sample - packet.offset) * packet.multiplier for sample in packet.samples]
+        assert list(arrays.values[row, 0:packet.count]) == pytest.approx(values)
+        assert all(math.isnan(value) for value in arrays.values[row, packet.count:])
+
+
+def test_fromPayloads_matchesPackets():
+    payloads = [
+        getPayload(0, [1, -2, 3, 400]),
+        getPayload(1, [5, 6]),
+        getPayload(2, [-7, 8, 9, 10]),
+        getPayload(3, []),
+    ]
+    arrays = PowerSamplesArrays.fromPayloads(payloads, "AA:BB:CC:DD:EE:01")
+    assert arrays.samples.shape == (4, 4)
+    assert list(arrays.addresses) == ["AA:BB:CC:DD:EE:01"] * 4
+    assertMatchesPackets(arrays, payloads)
+
+
+def test_fromPayloads_ignoresTrailingBytes():
+    payloads = [
+        getPayload(0, [1, 2, 3], trailingBytes=4),
+        getPayload(1, [4, 5], trailingBytes=1),
+        getPayload(2, [6, 7, 8]),
+    ]
+    arrays = PowerSamplesArrays.fromPayloads(payloads)
+    # The trailing bytes are not taken as samples.
+    assert arrays.samples.shape == (3, 3)
+    assert list(arrays.count) == [3, 2, 3]
+    assertMatchesPackets(arrays, payloads)
+
+
+def test_fromPayloads_rejectsTooShortPayloads():
+    payload = getPayload(0, [1, 2, 3])
+    with pytest.raises(CrownstoneException):
+        PowerSamplesArrays.fromPayloads([payload[0:-2]])
+    with pytest.raises(CrownstoneException):
+        PowerSamplesArrays.fromPayloads([payload[0:10]])
+
+
+def test_concatenate_padsShorterCaptures():
+    payloadsA = [getPayload(0, [1, 2, 3, 4])]
+    payloadsB = [getPayload(1, [5]), getPayload(2, [6, 7])]
+    arrays = PowerSamplesArrays.concatenate([PowerSamplesArrays.fromPayloads(payloadsA, "A"), PowerSamplesArrays.fromPayloads(payloadsB, "B")])
+    assert list(arrays.addresses) == ["A", "B", "B"]
+    assertMatchesPackets(arrays, payloadsA + payloadsB)
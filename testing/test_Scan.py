@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from crownstone_ble.core.BleEventBus import BleEventBus
+from crownstone_ble.topics.SystemBleTopics import SystemBleTopics
+from testing.conftest import createSimulatedCore
+
+
+def test_scan_abortsInEachEventLoop():
+    # Like a module level CrownstoneBle, created before any event loop runs.
+    core = createSimulatedCore()
+
+    async def scanAndAbort():
+        startTime = time.monotonic()
+        scanTask = asyncio.ensure_future(core.startScanning(scanDuration=5))
+        await asyncio.sleep(0.05)
+        BleEventBus.emit(SystemBleTopics.abortScanning, True)
+        await scanTask
+        assert time.monotonic() - startTime < 1
+        assert not core.ble.scanningActive
+        assert core.ble.scanAbortedEvents == set()
+
+    async def shutDown():
+        await core.shutDown()
+
+    asyncio.run(scanAndAbort())
+    asyncio.run(scanAndAbort())
+    asyncio.run(shutDown())
+
+
+def test_abortScan_endsConcurrentScans(simulatedCore):
+    core = simulatedCore
+
+    async def run():
+        try:
+            scanTasks = [asyncio.ensure_future(core.startScanning(scanDuration=5)) for i in range(0, 2)]
+            await asyncio.sleep(0.05)
+            core.ble.abortScan()
+            await asyncio.wait_for(asyncio.gather(*scanTasks), 1)
+            assert not core.ble.scanningActive
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_scan_stopsScannerRightAway(simulatedCore):
+    core = simulatedCore
+
+    async def run():
+        try:
+            await core.getCrownstonesByScanning(scanDuration=0.05)
+            assert not core.ble.scanningActive
+
+            # Lingering is opt-in.
+            core.setScanLingerTime(0.2)
+            await core.getCrownstonesByScanning(scanDuration=0.05)
+            assert core.ble.scanningActive
+            await asyncio.sleep(0.3)
+            assert not core.ble.scanningActive
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_stopScanning_stopsScannerOfOtherConsumers(simulatedCore):
+    core = simulatedCore
+
+    async def run():
+        try:
+            await core.startBackgroundScanning()
+            scanTask = asyncio.ensure_future(core.startScanning(scanDuration=5))
+            await asyncio.sleep(0.05)
+            await core.stopScanning(onlyOwnScan=True)
+            await asyncio.wait_for(scanTask, 1)
+            assert core.ble.scanningActive
+
+            await core.stopScanning()
+            assert not core.ble.scanningActive
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
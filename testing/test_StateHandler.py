@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+from crownstone_core.protocol.BluenetTypes import StateType
+
+from testing.conftest import getSimulatedAddress
+
+STATE_TYPES = [StateType.SWITCH_STATE, StateType.POWER_USAGE, StateType.TEMPERATURE, StateType.PWM_ALLOWED, StateType.SWITCH_LOCKED, StateType.ERROR_BITMASK]
+
+
+def setCrownstoneState(crownstone, index: int):
+    crownstone.switchState = 50 + index
+    crownstone.temperature = -5 + index
+    crownstone.dimmingAllowed = True
+    crownstone.switchLocked = index % 2 == 1
+    crownstone.errorBitmask = 1 << index
+
+
+async def getSingleStates(state) -> dict:
+    """
+    :returns: The state values of the STATE_TYPES, with a get command per state.
+    """
+    return {
+        StateType.SWITCH_STATE:  (await state.getSwitchState()).raw,
+        StateType.POWER_USAGE:   await state.getPowerUsage(),
+        StateType.TEMPERATURE:   await state.getChipTemperature(),
+        StateType.PWM_ALLOWED:   await state.getDimmingAllowed(),
+        StateType.SWITCH_LOCKED: await state.getSwitchLocked(),
+        StateType.ERROR_BITMASK: (await state.getErrors()).bitMask,
+    }
+
+
+def getComparableValues(snapshot) -> dict:
+    values = dict(snapshot.values)
+    values[StateType.SWITCH_STATE] = values[StateType.SWITCH_STATE].raw
+    values[StateType.ERROR_BITMASK] = values[StateType.ERROR_BITMASK].bitMask
+    return values
+
+
+def test_getStates_matchesSingleGetters(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+
+    async def run():
+        try:
+            await core.connect(address)
+            setCrownstoneState(core.ble.backend.getCrownstone(address), 3)
+            expectedValues = await getSingleStates(core.state)
+            for windowSize in [1, 4]:
+                snapshot = await core.state.getStates(STATE_TYPES + [StateType.SWITCH_STATE], windowSize=windowSize)
+                assert snapshot.address == address
+                assert snapshot.errors == {}
+                assert list(snapshot.values.keys()) == STATE_TYPES
+                assert getComparableValues(snapshot) == expectedValues
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_getStates_putsFailedStateInErrors(simulatedCore):
+    core = simulatedCore
+    address = getSimulatedAddress(0)
+
+    async def run():
+        try:
+            await core.connect(address)
+            # The simulated Crownstone doesn't have this state.
+            snapshot = await core.state.getStates([StateType.SWITCH_STATE, StateType.SCAN_FILTER, StateType.TEMPERATURE])
+            assert list(snapshot.errors.keys()) == [StateType.SCAN_FILTER]
+            assert list(snapshot.values.keys()) == [StateType.SWITCH_STATE, StateType.TEMPERATURE]
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+
+
+def test_collectStates_matchesSingleGetters(simulatedCore, tmp_path):
+    core = simulatedCore
+    addresses = [getSimulatedAddress(i) for i in range(0, 3)]
+    outputFile = str(tmp_path / "states.ndjson")
+
+    async def run():
+        try:
+            expectedValues = {}
+            for i, address in enumerate(addresses):
+                setCrownstoneState(core.ble.backend.getCrownstone(address), i)
+                await core.connect(address)
+                expectedValues[address] = await getSingleStates(core.getConnection(address).state)
+                await core.disconnect(address)
+
+            snapshots = await core.collectStates(addresses, STATE_TYPES + [StateType.SCAN_FILTER], outputFile=outputFile, concurrency=2)
+            assert [snapshot.address for snapshot in snapshots] == addresses
+            for snapshot in snapshots:
+                assert getComparableValues(snapshot) == expectedValues[snapshot.address]
+                assert list(snapshot.errors.keys()) == [StateType.SCAN_FILTER]
+        finally:
+            await core.shutDown()
+
+    asyncio.run(run())
+    with open(outputFile) as fileHandle:
+        lines = [json.loads(line) for line in fileHandle]
+    assert sorted(line["address"] for line in lines) == addresses
+    assert all(list(line["errors"].keys()) == ["SCAN_FILTER"] for line in lines)
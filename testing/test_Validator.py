@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from crownstone_core.core.modules.EncryptionSettings import EncryptionSettings
+
+from crownstone_ble.core.backends.SimulatedCrownstone import SimulatedCrownstone
+from crownstone_ble.core.bluetooth_delegates.BleakScanDelegate import parseAdvertisement
+from crownstone_ble.core.modules.Validator import Validator
+from testing.conftest import getAdvertisementPayload, getSimulatedAddress, getSimulatedSettings
+
+
+class FakeClock:
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "time", clock.time)
+    return clock
+
+
+def getCrownstones(settings, count: int) -> list:
+    return [SimulatedCrownstone(getSimulatedAddress(i), i + 1, settings) for i in range(0, count)]
+
+
+def getAdvertisement(crownstone: SimulatedCrownstone, settings: EncryptionSettings):
+    return parseAdvertisement(*getAdvertisementPayload(crownstone), settings.serviceDataKey)
+
+
+def test_cleanupExpiredTrackers_inUpdateOrder(clock):
+    settings = getSimulatedSettings()
+    crownstones = getCrownstones(settings, 3)
+    addresses = [crownstone.address.lower() for crownstone in crownstones]
+    validator = Validator()
+
+    for crownstone in crownstones:
+        validator.checkAdvertisement(getAdvertisement(crownstone, settings))
+        clock.now += 1
+    # The first Crownstone is updated again, so it's now the last to expire.
+    validator.checkAdvertisement(getAdvertisement(crownstones[0], settings))
+    assert list(validator.trackedCrownstones.keys()) == [addresses[1], addresses[2], addresses[0]]
+
+    timeoutDuration = validator.trackedCrownstones[addresses[0]].timeoutDuration
+    validator.cleanupExpiredTrackers(1000.0 + 1 + timeoutDuration)
+    assert list(validator.trackedCrownstones.keys()) == [addresses[2], addresses[0]]
+
+    validator.cleanupExpiredTrackers(1000.0 + 2 + timeoutDuration)
+    assert list(validator.trackedCrownstones.keys()) == [addresses[0]]
+
+    validator.cleanupExpiredTrackers(1000.0 + 3 + timeoutDuration)
+    assert list(validator.trackedCrownstones.keys()) == []
+
+
+def test_checkAdvertisement_cleansUpExpiredTrackers(clock):
+    settings = getSimulatedSettings()
+    crownstones = getCrownstones(settings, 2)
+    validator = Validator()
+
+    validator.checkAdvertisement(getAdvertisement(crownstones[0], settings))
+    clock.now += validator.trackedCrownstones[crownstones[0].address.lower()].timeoutDuration
+    validator.checkAdvertisement(getAdvertisement(crownstones[1], settings))
+    assert list(validator.trackedCrownstones.keys()) == [crownstones[1].address.lower()]
+
+
+def test_checkAdvertisement_validatesCrownstoneId(clock):
+    settings = getSimulatedSettings()
+    crownstone = getCrownstones(settings, 1)[0]
+    validator = Validator()
+
+    # Each advertisement needs a new unique identifier, which changes every second.
+    for i in range(0, 3):
+        validator.checkAdvertisement(getAdvertisement(crownstone, settings))
+        assert validator.getCrownstoneId(crownstone.address) is None
+        clock.now += 1
+    validator.checkAdvertisement(getAdvertisement(crownstone, settings))
+    assert validator.getCrownstoneId(crownstone.address) == crownstone.crownstoneId